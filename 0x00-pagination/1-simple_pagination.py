@@ -6,8 +6,11 @@ This script defines a function for calculating start and end indexes for a
 given pagination scenario. It also provides a Server class for paginating
 a database of popular baby names and retrieving pages of data from the dataset.
 """
-import csv
-from typing import List, Tuple
+import threading
+import time
+from typing import List, Optional, Tuple
+from metrics import Metrics, instrumented
+from storage import Dataset, open_dataset
 
 
 def index_range(page: int, page_size: int) -> Tuple[int, int]:
@@ -37,22 +40,36 @@ def index_range(page: int, page_size: int) -> Tuple[int, int]:
 class Server:
     """Server class to paginate a database of popular baby names.
     """
+    # A CSV file, or a list or glob pattern of shard files.
     DATA_FILE = "Popular_Baby_Names.csv"
 
-    def __init__(self):
-        self.__dataset = None
-
-    def dataset(self) -> List[List]:
-        """Cached dataset
+    def __init__(self, backend: str = "memory", warm: bool = False,
+                 metrics: Optional[Metrics] = None):
+        self.backend = backend
+        self.metrics = metrics
+        self.__dataset: Optional[Dataset] = None
+        self.__lock = threading.Lock()
+        if warm:
+            threading.Thread(target=self.dataset, daemon=True).start()
+
+    def dataset(self) -> Dataset:
+        """Cached dataset, loaded by a single thread on first use
         """
-        if self.__dataset is None:
-            with open(self.DATA_FILE) as f:
-                reader = csv.reader(f)
-                dataset = [row for row in reader]
-            self.__dataset = dataset[1:]
-
-        return self.__dataset
-
+        dataset = self.__dataset
+        if dataset is None:
+            with self.__lock:
+                dataset = self.__dataset
+                if dataset is None:
+                    start = time.perf_counter()
+                    dataset = self.__dataset = open_dataset(self.DATA_FILE,
+                                                            self.backend)
+                    if self.metrics is not None:
+                        self.metrics.dataset_loaded(
+                            dataset, time.perf_counter() - start)
+
+        return dataset
+
+    @instrumented
     def get_page(self, page: int = 1, page_size: int = 10) -> List[List]:
         """Get a page of data from the dataset.
 
@@ -6,9 +6,29 @@ This script defines a Server class for paginating a database
 of popular baby names and provides a method to retrieve hypermedia
 information for a specified page and page size.
 """
-import csv
+import functools
+import json
 import math
-from typing import List, Dict, Tuple
+import threading
+import time
+from typing import (
+    Callable, Iterator, List, Dict, Optional, Sequence, Tuple, Union,
+)
+from bitmap_index import Bitmap, BitmapIndex
+from columnar_dataset import project, slice_rows, take_rows
+from compressed_dataset import codec_for
+from dataset_version import DatasetVersion
+from external_sort import ExternalSortIndex
+from json_rows import JsonColumns, JsonRows
+from metrics import Metrics, instrumented
+from page_cache import PageCache, fields_key, filters_key, make_etag
+from prefix_index import PrefixIndex
+from row_estimate import estimate_rows, read_head
+from sort_index import SortIndex
+from storage import LAZY_BACKENDS, Dataset, is_sharded
+
+# Sorted views of a dataset, kept on disk unless its rows are in memory.
+AnySortIndex = Union[SortIndex, ExternalSortIndex]
 
 
 class Server:
@@ -18,24 +38,211 @@ class Server:
     for a specified page and page size.
     """
 
+    # A CSV file, or a list or glob pattern of shard files.
     DATA_FILE = "Popular_Baby_Names.csv"
+    CACHE_SIZE = 256
+    # Seconds between checks for appended rows; None disables them.
+    REFRESH_INTERVAL = 1.0
+    # Deepest row a fast start reads from the file before the load is done.
+    FAST_START_ROWS = 10000
+
+    def __init__(self, backend: str = "memory", warm: bool = False,
+                 metrics: Optional[Metrics] = None, fast_start: bool = False):
+        """
+        Initializes a new Server instance.
+
+        Args:
+            backend (str): The dataset storage backend, "memory" to parse
+            the CSV file up front or "mmap" to decode pages lazily.
+            warm (bool): Whether to start loading the dataset in a
+            background thread right away.
+            metrics (Metrics): Where to record load and request metrics;
+            nothing is measured when omitted.
+            fast_start (bool): Whether unfiltered ``get_hyper`` calls made
+            while the dataset loads are answered right away, from the
+            head of the file and an estimated ``total_pages``.
+        """
+        self.backend = backend
+        self.metrics = metrics
+        self.fast_start = fast_start
+        self.__lock = threading.RLock()
+        self.__current: Optional[DatasetVersion] = None
+        self.__loading = False
+        self.__estimate: Optional[Tuple[int, bool]] = None
+        self.__next_check = 0.0
+        self.__version = 0
+        self.__cache = PageCache(self.CACHE_SIZE)
+        if warm:
+            self.__load_in_background()
+
+    def __load_in_background(self) -> None:
+        """
+        Start loading the dataset in a background thread, once.
+        """
+        with self.__lock:
+            if self.__loading:
+                return
+            self.__loading = True
+        threading.Thread(target=self.dataset, daemon=True).start()
+
+    def ready(self) -> bool:
+        """
+        Tell whether the dataset has been loaded.
+
+        Returns:
+            bool: True once pages are served from the loaded dataset.
+        """
+        return self.__current is not None
+
+    def stale(self) -> bool:
+        """
+        Tell whether the next request may load or check the data file.
+
+        Returns:
+            bool: True when no version is loaded or a check for changes
+            is due, so a request could block on file I/O and parsing.
+        """
+        return self.published() is None
+
+    def published(self) -> Optional[DatasetVersion]:
+        """
+        Return the published dataset version if reading it needs no I/O.
+
+        Page methods passed the version as ``current`` read it as is,
+        without the load or the check for changes ``_current`` may do.
 
-    def __init__(self):
-        self.__dataset = None
+        Returns:
+            Optional[DatasetVersion]: The version ``_current`` would return
+            right away, or None when it would load the dataset or check the
+            data file first.
+        """
+        current = self.__current
+        if current is None or self.__check_due():
+            return None
+        return current
+
+    def __check_due(self) -> bool:
+        """
+        Tell whether the data file is due to be checked for changes.
+        """
+        return self.REFRESH_INTERVAL is not None and \
+            time.monotonic() >= self.__next_check
+
+    def _current(self) -> DatasetVersion:
+        """
+        Return the published dataset version, loading it on first use.
+
+        Concurrent first calls are single-flight: one thread loads the
+        dataset while the others wait for it. Afterwards, at most every
+        ``REFRESH_INTERVAL`` seconds, one caller checks the data file for
+        changes while the others keep using the published version.
+        """
+        current = self.__current
+        if current is None:
+            with self.__lock:
+                current = self.__current
+                if current is None:
+                    start = time.perf_counter()
+                    current = self.__current = DatasetVersion.load(
+                        self.DATA_FILE, self.backend, self.__version)
+                    self.__schedule_check()
+                    self.__loaded(current, start, "full")
+                return current
+        if self.__check_due() and self.__lock.acquire(blocking=False):
+            try:
+                self.refresh()
+                current = self.__current or current
+            finally:
+                self.__lock.release()
+        return current
+
+    def current(self) -> DatasetVersion:
+        """
+        Return the published dataset version, loading it on first use.
 
-    def dataset(self) -> List[List]:
+        Passing it to ``etag``, ``count`` and the page methods makes them
+        all read the same version, even if a newer one is published
+        between the calls.
+
+        Returns:
+            DatasetVersion: The published version.
+        """
+        return self._current()
+
+    def __loaded(self, current: DatasetVersion, start: float,
+                 kind: str) -> None:
+        """
+        Record the load of a dataset version started at ``start``.
+        """
+        if self.metrics is not None:
+            self.metrics.dataset_loaded(current.dataset,
+                                        time.perf_counter() - start, kind,
+                                        current.number)
+
+    def __schedule_check(self) -> None:
+        """
+        Set when the data file is next checked for changes.
+        """
+        if self.REFRESH_INTERVAL is not None:
+            self.__next_check = time.monotonic() + self.REFRESH_INTERVAL
+
+    def dataset(self) -> Dataset:
         """
         Retrieves the dataset from the CSV file and caches it.
 
         Returns:
-            List[List]: The dataset as a list of rows.
+            Dataset: The dataset's rows.
+        """
+        return self._current().dataset
+
+    def version(self) -> int:
+        """
+        Return the dataset version, bumped every time new data is published.
+
+        Returns:
+            int: The current dataset version.
+        """
+        return self.__version
+
+    def refresh(self) -> bool:
+        """
+        Publish a new version of the dataset if the data file changed.
+
+        Rows appended to the file are parsed on their own and added after
+        the loaded ones; any other change reloads the file. The new version
+        replaces the old one in a single step, and requests already running
+        finish on the version they started with.
+
+        Returns:
+            bool: Whether a new version was published.
+        """
+        with self.__lock:
+            self.__schedule_check()
+            current = self.__current
+            if current is None:
+                return False
+            start = time.perf_counter()
+            following = current.next(self.DATA_FILE, self.backend)
+            if following is None:
+                return False
+            self.__loaded(following, start, "append"
+                          if following.base is current.base else "full")
+            self.__current = following
+            self.__version = following.number
+            self.__cache.clear()
+            return True
+
+    def reload(self) -> None:
+        """
+        Drop the loaded dataset, its indexes and cached pages.
+
+        The next request loads the data file again under a new version,
+        which also changes the ETag of every page.
         """
-        if self.__dataset is None:
-            with open(self.DATA_FILE) as f:
-                reader = csv.reader(f)
-                dataset = [row for row in reader]
-            self.__dataset = dataset[1:]
-        return self.__dataset
+        with self.__lock:
+            self.__current = None
+            self.__version += 1
+            self.__cache.clear()
 
     def index_range(self, page: int, page_size: int) -> Tuple[int, int]:
         """
@@ -55,44 +262,501 @@ class Server:
         end = start + page_size
         return start, end
 
-    def get_page(self, page: int = 1, page_size: int = 10) -> List[List]:
+    def bitmap_index(self) -> BitmapIndex:
+        """
+        Build the bitmap indexes of the filterable columns and cache them.
+
+        Returns:
+            BitmapIndex: Bitmaps for Year of Birth, Gender and Ethnicity.
+        """
+        return self._current().index(BitmapIndex)
+
+    def sort_index(self) -> AnySortIndex:
+        """
+        Return the sorted views of the dataset, creating them on first use.
+
+        Backends that decode rows lazily (``LAZY_BACKENDS``) and sharded
+        sources sort on disk with an ExternalSortIndex, which has the same
+        interface, so sorting never decodes the whole dataset into memory.
+
+        Returns:
+            AnySortIndex: Sort permutations for Count, Rank and the first
+            name.
+        """
+        return self._sort_index(self._current())
+
+    def _sort_index(self, current: DatasetVersion) -> AnySortIndex:
+        """
+        Return the sort index of a dataset version.
+        """
+        if self._lazy():
+            return current.index(ExternalSortIndex)
+        return current.index(SortIndex)
+
+    def _lazy(self) -> bool:
+        """
+        Whether rows are decoded on demand rather than held in memory, as
+        for ``LAZY_BACKENDS`` and sharded sources.
+        """
+        return self.backend in LAZY_BACKENDS or is_sharded(self.DATA_FILE)
+
+    def _matches(self, current: DatasetVersion,
+                 filters: Optional[Dict] = None) -> Optional[Bitmap]:
+        """
+        Return the rows matching ``filters``, or None when unfiltered.
+        """
+        if not filters:
+            return None
+        return current.index(BitmapIndex).match(filters)
+
+    def _positions(
+            self, current: DatasetVersion, filters: Optional[Dict] = None,
+            order_by: Optional[str] = None) -> Tuple[Optional[Callable], int]:
+        """
+        Resolve ``filters`` and ``order_by`` into row positions.
+
+        Returns:
+            Tuple[Optional[Callable], int]: A function returning the
+            positions of the rows ranked ``start`` to ``end - 1`` in the
+            view, or None when the view is the dataset itself, and the
+            view's row count.
+        """
+        matches = self._matches(current, filters)
+        if order_by and matches is not None:
+            return (self._sort_index(current).filtered(order_by, matches),
+                    len(matches))
+        if order_by:
+            return (functools.partial(
+                self._sort_index(current).select_range, order_by),
+                len(current.dataset))
+        if matches is not None:
+            return matches.select_range, len(matches)
+        return None, len(current.dataset)
+
+    def _view(self, filters: Optional[Dict] = None,
+              order_by: Optional[str] = None,
+              current: Optional[DatasetVersion] = None,
+              columns: Optional[Sequence[int]] = None) -> Tuple[Callable, int]:
+        """
+        Resolve ``filters`` and ``order_by`` once for any number of pages.
+
+        Every page of the view comes from the same dataset version,
+        ``current`` or the published one. Rows are cut down to
+        ``columns``, from ``fields_key``, when given; columnar datasets
+        then decode only those columns.
+
+        Returns:
+            Tuple[Callable, int]: A function returning the rows ranked
+            ``start`` to ``end - 1`` in the view, and the view's row count.
+        """
+        current = current or self._current()
+        data = current.dataset
+        if order_by and self._lazy() and \
+                self._matches(current, filters) is None:
+            # Read the ordered rows straight from the sorted file.
+            index = current.index(ExternalSortIndex)
+            return (lambda start, end: project(
+                index.rows(order_by, start, end), columns), len(data))
+        select, total = self._positions(current, filters, order_by)
+        if select is None:
+            return (lambda start, end: slice_rows(data, start, end, columns)
+                    if start <= len(data) else []), total
+        ranked: Callable[[int, int], List[int]] = select
+        return (lambda start, end: take_rows(data, ranked(start, end),
+                                             columns), total)
+
+    def count(self, filters: Optional[Dict] = None,
+              current: Optional[DatasetVersion] = None) -> int:
+        """
+        Count the rows matching ``filters``, without building any page.
+
+        Args:
+            filters (Dict): Optional column to value filters.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
+
+        Returns:
+            int: The number of matching rows, all rows when unfiltered.
+        """
+        _, total = self._positions(current or self._current(), filters)
+        return total
+
+    @instrumented
+    def get_page(self, page: int = 1, page_size: int = 10,
+                 filters: Optional[Dict] = None,
+                 order_by: Optional[str] = None,
+                 fields: Optional[Sequence[str]] = None,
+                 current: Optional[DatasetVersion] = None) -> List[List]:
         """
         Retrieve a page of data from the dataset.
 
         Args:
             page (int): The page number (1-indexed).
             page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters, e.g.
+            ``{"year": 2016, "gender": "FEMALE"}``, on Year of Birth,
+            Gender and Ethnicity.
+            order_by (str): Optional ordering on "count", "rank" or
+            "name", prefixed with "-" for descending order. File order is
+            used when omitted.
+            fields (Sequence[str]): Optional column projection, e.g.
+            ``["name", "count"]``; rows then hold just those columns, in
+            that order. Columnar datasets decode no other column.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
 
         Returns:
             List[List]: The requested page of data from the dataset.
         """
         start, end = self.index_range(page, page_size)
-        data = self.dataset()
-        if start > len(data):
-            return []
-        return data[start:end]
+        rows, _ = self._view(filters, order_by, current, fields_key(fields))
+        return rows(start, end)
 
-    def get_hyper(self, page: int = 1, page_size: int = 10) -> Dict:
+    @instrumented
+    def get_hyper(self, page: int = 1, page_size: int = 10,
+                  filters: Optional[Dict] = None,
+                  order_by: Optional[str] = None,
+                  fields: Optional[Sequence[str]] = None,
+                  current: Optional[DatasetVersion] = None) -> Dict:
         """
         Retrieve hypermedia information about a page.
 
         Args:
             page (int): The page number (1-indexed).
             page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters, as accepted
+            by ``get_page``; ``total_pages`` then counts matching rows only.
+            order_by (str): Optional ordering, as accepted by ``get_page``.
+            fields (Sequence[str]): Optional column projection, as
+            accepted by ``get_page``.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
 
         Returns:
             Dict: Information about the page, including page size, page number,
-            data, next page, previous page, and total pages.
+            data, next page, previous page, total pages, and the version of
+            the dataset it was read from. In fast-start mode, pages served
+            before the load is done may carry ``'approximate': True``, see
+            ``fast_hyper``.
+        """
+        start, end = self.index_range(page, page_size)
+        page_info = None if current else self.fast_hyper(
+            page, page_size, filters, order_by, fields)
+        if page_info is not None:
+            return page_info
+        current = current or self._current()
+        columns = fields_key(fields)
+        key = (page, page_size, filters_key(filters), order_by or None,
+               columns, current.number)
+        page_info = self.__cache.get(key)
+        if page_info is None:
+            rows, total = self._view(filters, order_by, current, columns)
+            page_info = self._hyper(page, page_size, rows(start, end), total,
+                                    current.number)
+            self.__cache.put(key, page_info)
+        return page_info
+
+    def fast_hyper(self, page: int, page_size: int,
+                   filters: Optional[Dict] = None,
+                   order_by: Optional[str] = None,
+                   fields: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """
+        Answer ``get_hyper`` in fast-start mode, without waiting for the
+        dataset to load.
+
+        The page is parsed from the head of the data file. Unless the
+        file is small enough to be counted outright, ``total_pages`` is
+        estimated from the file size and sampled line lengths and the
+        response carries ``'approximate': True``. The load is started in
+        the background; once it is done, exact responses take over.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering.
+            fields (Sequence[str]): Optional column projection.
+
+        Returns:
+            Optional[Dict]: The page information, or None when the
+            dataset is loaded, fast start is off, the page is filtered,
+            ordered or deeper than ``FAST_START_ROWS``, or the data source
+            is not a plain CSV file.
+        """
+        source = self.DATA_FILE
+        start, end = self.index_range(page, page_size)
+        columns = fields_key(fields)
+        if not self.fast_start or self.__current is not None or filters or \
+                order_by or end > self.FAST_START_ROWS or \
+                is_sharded(source) or codec_for(source):
+            return None
+        self.__load_in_background()
+        rows, complete = read_head(source, end)
+        rows = project(rows, columns)
+        if complete:
+            return self._hyper(page, page_size, rows[start:], len(rows),
+                               self.__version)
+        if self.__estimate is None:
+            self.__estimate = estimate_rows(source)
+        total, exact = self.__estimate
+        if exact:
+            return self._hyper(page, page_size, rows[start:], total,
+                               self.__version)
+        # The head is longer than the page, so the file holds more rows.
+        page_info = self._hyper(page, page_size, rows[start:],
+                                max(total, end + 1), self.__version)
+        page_info['approximate'] = True
+        return page_info
+
+    @instrumented
+    def get_hyper_bytes(self, page: int = 1, page_size: int = 10,
+                        filters: Optional[Dict] = None,
+                        order_by: Optional[str] = None,
+                        fields: Optional[Sequence[str]] = None,
+                        current: Optional[DatasetVersion] = None) -> bytes:
+        """
+        Retrieve hypermedia information about a page, encoded as JSON.
+
+        The result is the UTF-8 encoding of ``json.dumps`` applied to the
+        ``get_hyper`` response, but it is assembled from rows encoded once
+        per dataset version: a page of consecutive rows is a single slice
+        of pre-encoded bytes, any other page a join of slices. Projected
+        pages join the pre-encoded values of their columns. Backends that
+        decode rows lazily (``LAZY_BACKENDS``) and sharded sources encode
+        just the rows of the page instead, so the whole dataset is never
+        decoded; so do fast-start responses.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering.
+            fields (Sequence[str]): Optional column projection.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
+
+        Returns:
+            bytes: The JSON document.
+        """
+        start, end = self.index_range(page, page_size)
+        page_info = None if current else self.fast_hyper(
+            page, page_size, filters, order_by, fields)
+        if page_info is not None:
+            return json.dumps(page_info).encode("utf-8")
+        current = current or self._current()
+        columns = fields_key(fields)
+        if self._lazy():
+            view, total = self._view(filters, order_by, current, columns)
+            rows = view(start, end)
+            count = len(rows)
+            data = json.dumps(rows).encode("utf-8")[1:-1]
+        else:
+            select, total = self._positions(current, filters, order_by)
+            if select is None:
+                positions = range(start, max(min(end, total), start))
+            else:
+                positions = select(start, end)
+            count = len(positions)
+            if columns is not None:
+                data = current.index(JsonColumns).join(columns, positions)
+            elif select is None:
+                data = current.index(JsonRows).span(start, end)
+            else:
+                data = current.index(JsonRows).join(positions)
+        page_info = self._hyper(page, page_size, [], total, current.number)
+        page_info['page_size'] = count
+        return b"{" + b", ".join(
+            json.dumps(key).encode() + b": " + (
+                b"[" + data + b"]" if key == 'data'
+                else json.dumps(value).encode())
+            for key, value in page_info.items()) + b"}"
+
+    def etag(self, page: int = 1, page_size: int = 10,
+             filters: Optional[Dict] = None, order_by: Optional[str] = None,
+             fields: Optional[Sequence[str]] = None,
+             current: Optional[DatasetVersion] = None) -> str:
+        """
+        Return the strong ETag of the ``get_hyper`` response for the same
+        arguments, without building the page.
+
+        The tag depends on the data file's size and mtime, the dataset
+        version and the request, so HTTP callers can answer a matching
+        If-None-Match with 304 Not Modified.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering.
+            fields (Sequence[str]): Optional column projection.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
+
+        Returns:
+            str: The quoted entity tag.
+        """
+        self.index_range(page, page_size)
+        current = current or self._current()
+        return make_etag(current.stamp, current.number, page, page_size,
+                         filters_key(filters), order_by or None,
+                         fields_key(fields))
+
+    def iter_rows(self, page: int = 1, page_size: int = 10,
+                  filters: Optional[Dict] = None,
+                  order_by: Optional[str] = None,
+                  batch: int = 1000, fields: Optional[Sequence[str]] = None,
+                  current: Optional[DatasetVersion] = None) -> Iterator[List]:
+        """
+        Iterate over the rows of a page, materializing at most
+        ``batch`` of them at a time.
+
+        This lets callers stream very large pages without holding the
+        whole page in memory. Parameters are checked, and filters and
+        ordering resolved, before the iterator is returned.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering.
+            batch (int): The number of rows decoded per step.
+            fields (Sequence[str]): Optional column projection.
+            current (DatasetVersion): The dataset version to read, from
+            ``current()``; the published one when omitted.
+
+        Returns:
+            Iterator[List]: The rows of the page, in order.
         """
-        page_data = self.get_page(page, page_size)
         start, end = self.index_range(page, page_size)
-        total_pages = math.ceil(len(self.__dataset) / page_size)
+        rows, total = self._view(filters, order_by, current,
+                                 fields_key(fields))
+        return (row for offset in range(start, min(end, total), batch)
+                for row in rows(offset, min(offset + batch, end)))
+
+    def get_pages(self, requests: List[Tuple[int, int]],
+                  filters: Optional[Dict] = None,
+                  order_by: Optional[str] = None,
+                  fields: Optional[Sequence[str]] = None) -> List[List[List]]:
+        """
+        Retrieve several pages in one call.
+
+        Filters and ordering are resolved once for the whole batch, so
+        each extra page only costs its own slice.
+
+        Args:
+            requests (List[Tuple[int, int]]): ``(page, page_size)`` pairs,
+            in any order and possibly non-contiguous.
+            filters (Dict): Optional filters applied to every page.
+            order_by (str): Optional ordering applied to every page.
+            fields (Sequence[str]): Optional column projection applied to
+            every page.
+
+        Returns:
+            List[List[List]]: The pages, in the order requested.
+        """
+        ranges = [self.index_range(page, size) for page, size in requests]
+        rows, _ = self._view(filters, order_by, columns=fields_key(fields))
+        return [rows(start, end) for start, end in ranges]
+
+    def get_hypers(self, requests: List[Tuple[int, int]],
+                   filters: Optional[Dict] = None,
+                   order_by: Optional[str] = None,
+                   fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Retrieve hypermedia information about several pages in one call.
+
+        Filters, ordering, the row count and ``total_pages`` (per distinct
+        page size) are computed once for the whole batch, and only for
+        pages missing from the page cache, which every page then fills.
+
+        Args:
+            requests (List[Tuple[int, int]]): ``(page, page_size)`` pairs,
+            in any order and possibly non-contiguous.
+            filters (Dict): Optional filters applied to every page.
+            order_by (str): Optional ordering applied to every page.
+            fields (Sequence[str]): Optional column projection applied to
+            every page.
+
+        Returns:
+            List[Dict]: The hypermedia pages, in the order requested.
+        """
+        for page, size in requests:
+            self.index_range(page, size)
+        current = self._current()
+        columns = fields_key(fields)
+        request_key = (filters_key(filters), order_by or None, columns,
+                       current.number)
+        view = None
+        total_pages = {}
+        hypers = []
+        for page, size in requests:
+            key = (page, size) + request_key
+            page_info = self.__cache.get(key)
+            if page_info is None:
+                if view is None:
+                    view = self._view(filters, order_by, current, columns)
+                rows, total = view
+                if size not in total_pages:
+                    total_pages[size] = math.ceil(total / size)
+                start, end = (page - 1) * size, page * size
+                page_info = self._hyper(page, size, rows(start, end), total,
+                                        current.number, total_pages[size])
+                self.__cache.put(key, page_info)
+            hypers.append(page_info)
+        return hypers
+
+    def _hyper(self, page: int, page_size: int, page_data: List[List],
+               total: int, version: int,
+               total_pages: Optional[int] = None) -> Dict:
+        """
+        Wrap a page of ``total`` rows in its hypermedia information.
+        """
+        start, end = (page - 1) * page_size, page * page_size
+        if total_pages is None:
+            total_pages = math.ceil(total / page_size)
         page_info = {
             'page_size': len(page_data),
             'page': page,
             'data': page_data,
-            'next_page': page + 1 if end < len(self.__dataset) else None,
+            'next_page': page + 1 if end < total else None,
             'prev_page': page - 1 if start > 0 else None,
             'total_pages': total_pages,
+            'version': version,
         }
         return page_info
+
+    def prefix_index(self) -> PrefixIndex:
+        """
+        Build the first name prefix index and cache it.
+
+        Returns:
+            PrefixIndex: The case-insensitive index of first names.
+        """
+        return self._current().index(PrefixIndex)
+
+    @instrumented
+    def search(self, prefix: str, page: int = 1,
+               page_size: int = 10) -> Dict:
+        """
+        Retrieve a hypermedia page of the rows whose first name starts with
+        ``prefix``, ignoring case.
+
+        Matches are grouped by name in alphabetical order, then listed in
+        dataset order, and ``total_pages`` counts matching rows only.
+
+        Args:
+            prefix (str): The beginning of the first names to find.
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+
+        Returns:
+            Dict: Information about the page, as returned by ``get_hyper``.
+        """
+        assert isinstance(prefix, str)
+        start, end = self.index_range(page, page_size)
+        current = self._current()
+        index = current.index(PrefixIndex)
+        data = current.dataset
+        page_data = [data[i] for i in index.select_range(prefix, start, end)]
+        return self._hyper(page, page_size, page_data, index.count(prefix),
+                           current.number)
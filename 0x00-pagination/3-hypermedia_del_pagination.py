@@ -6,8 +6,14 @@ This script defines a Server class for paginating a database
 of popular baby names and provides a method to retrieve hypermedia
 information for a specified page and page size.
 """
-import csv
-from typing import List, Dict
+import threading
+import time
+from typing import List, Dict, MutableMapping, Optional, Tuple
+from cursor import decode_cursor, encode_cursor
+from live_index import LiveIndex, LiveRows
+from metrics import Metrics, instrumented
+from page_cache import PageCache, make_etag
+from storage import Dataset, fingerprint, open_dataset
 
 
 class Server:
@@ -17,51 +23,170 @@ class Server:
     for a specified page and page size.
     """
 
+    # A CSV file, or a list or glob pattern of shard files.
     DATA_FILE = "Popular_Baby_Names.csv"
+    CACHE_SIZE = 256
 
-    def __init__(self):
+    def __init__(self, backend: str = "memory", warm: bool = False,
+                 metrics: Optional[Metrics] = None):
         """
         Initializes a new Server instance.
+
+        Args:
+            backend (str): The dataset storage backend, "memory" to parse
+            the CSV file up front or "mmap" to decode pages lazily.
+            warm (bool): Whether to start building the indexed dataset in
+            a background thread right away.
+            metrics (Metrics): Where to record load and request metrics;
+            nothing is measured when omitted.
         """
-        self.__dataset = None
-        self.__indexed_dataset = None
+        self.backend = backend
+        self.metrics = metrics
+        self.__lock = threading.RLock()
+        self.__dataset: Optional[Dataset] = None
+        self.__indexed_dataset: Optional[LiveRows] = None
+        self.__live: Optional[LiveIndex] = None
+        self.__version = 0
+        self.__fingerprint: Optional[Tuple] = None
+        self.__cache = PageCache(self.CACHE_SIZE)
+        if warm:
+            threading.Thread(target=self.indexed_dataset, daemon=True).start()
 
-    def dataset(self) -> List[List]:
+    def dataset(self) -> Dataset:
         """
         Retrieve the dataset from the CSV file and cache it.
 
+        Concurrent first calls are single-flight: one thread loads the
+        dataset while the others wait for it.
+
         Returns:
-            List[List]: The dataset as a list of rows.
+            Dataset: The dataset's rows.
         """
-        if self.__dataset is None:
-            with open(self.DATA_FILE) as f:
-                reader = csv.reader(f)
-                dataset = [row for row in reader]
-            self.__dataset = dataset[1:]
+        dataset = self.__dataset
+        if dataset is None:
+            with self.__lock:
+                dataset = self.__dataset
+                if dataset is None:
+                    start = time.perf_counter()
+                    self.__fingerprint = fingerprint(self.DATA_FILE)
+                    dataset = self.__dataset = open_dataset(self.DATA_FILE,
+                                                            self.backend)
+                    if self.metrics is not None:
+                        self.metrics.dataset_loaded(
+                            dataset, time.perf_counter() - start)
 
-        return self.__dataset
+        return dataset
 
-    def indexed_dataset(self) -> Dict[int, List]:
+    def indexed_dataset(self) -> MutableMapping[int, List]:
         """
         Create an indexed dataset for efficient pagination.
 
+        The rows are not copied: they stay in the dataset, columnar or on
+        disk, and are read a page at a time; only deletions and inserts
+        are kept in memory.
+
         Returns:
-            Dict[int, List]: The dataset indexed by sorting position,
-            starting at 0.
-        """
-        if self.__indexed_dataset is None:
-            dataset = self.dataset()
-            self.__indexed_dataset = {
-                i: dataset[i]
-                for i in range(len(dataset))
-            }
+            MutableMapping[int, List]: The dataset indexed by sorting
+            position, starting at 0.
+        """
+        return self._indexed()[1]
+
+    def _indexed(self) -> Tuple[LiveIndex, LiveRows]:
+        """
+        Return the index of live keys and the rows they key, building both
+        on first use.
+        """
+        indexed_dataset = self.__indexed_dataset
+        if indexed_dataset is None:
+            with self.__lock:
+                indexed_dataset = self.__indexed_dataset
+                if indexed_dataset is None:
+                    dataset = self.dataset()
+                    # Set first: a built dataset implies a built index.
+                    self.__live = LiveIndex(len(dataset))
+                    indexed_dataset = self.__indexed_dataset = \
+                        LiveRows(dataset)
+
+        live = self.__live
+        assert live is not None
+        return live, indexed_dataset
 
-        return self.__indexed_dataset
+    def delete(self, index: int) -> List:
+        """
+        Delete a row from the indexed dataset.
+
+        Args:
+            index (int): The key of the row to delete.
+
+        Returns:
+            List: The deleted row.
+
+        Raises:
+            KeyError: If no live row has this key.
+        """
+        live, indexed_dataset = self._indexed()
+        with self.__lock:
+            if not live.delete(index):
+                raise KeyError(index)
+            self.__version += 1
+            self.__cache.clear()
+            return indexed_dataset.pop(index)
+
+    def insert(self, row: List) -> int:
+        """
+        Append a row to the indexed dataset.
+
+        Args:
+            row (List): The row to add.
+
+        Returns:
+            int: The key assigned to the new row, after every existing key.
+        """
+        live, indexed_dataset = self._indexed()
+        with self.__lock:
+            index = live.append()
+            indexed_dataset[index] = row
+            self.__version += 1
+            self.__cache.clear()
+            return index
+
+    def version(self) -> int:
+        """
+        Return the dataset version, bumped by every insert and delete.
+
+        Returns:
+            int: The current dataset version.
+        """
+        return self.__version
+
+    def etag(self, index: int = 0, page_size: int = 10) -> str:
+        """
+        Return the strong ETag of the ``get_hyper_index`` response for the
+        same arguments, without building the page.
+
+        Args:
+            index (int): The starting index for the page.
+            page_size (int): The number of items per page.
+
+        Returns:
+            str: The quoted entity tag, which changes with every insert or
+            delete.
+        """
+        self.indexed_dataset()
+        return make_etag(self.__fingerprint, self.__version, "index",
+                         index, page_size)
 
-    def get_hyper_index(self, index: int = None, page_size: int = 10) -> Dict:
+    @instrumented
+    def get_hyper_index(self, index: Optional[int] = None,
+                        page_size: int = 10) -> Dict:
         """
         Retrieve hypermedia information about a page based on the index.
 
+        The page holds the first ``page_size`` live rows whose key is at
+        least ``index``, so deleted rows never shorten it, and
+        ``next_index`` is the key of the first live row after the page, or
+        None once the end of the dataset is reached.
+
         Args:
             index (int): The starting index for the page.
             page_size (int): The number of items per page.
@@ -70,23 +195,110 @@ class Server:
             Dict: Information about the page, including index, next index,
             page size, and data.
         """
-        assert isinstance(index, int) and index >= 0
-        assert isinstance(page_size, int) and page_size > 0
-
-        indexed_dataset = self.indexed_dataset()
         if index is None:
             index = 0
-        next_index = index + page_size
-        data = []
-        for i in range(index, next_index):
-            if i in indexed_dataset:
-                data.append(indexed_dataset[i])
-
-        page_info = {
-            "index": index,
-            "next_index": next_index,
-            "page_size": page_size,
-            "data": data,
-        }
+        live, indexed_dataset = self._indexed()
+        assert isinstance(index, int) and 0 <= index < live.capacity
+        assert isinstance(page_size, int) and page_size > 0
+
+        cache_key = (index, page_size, self.__version)
+        page_info = self.__cache.get(cache_key)
+        if page_info is not None:
+            return page_info
+
+        with self.__lock:
+            keys = live.page(index, page_size)
+            data = indexed_dataset.select(keys)
+            next_index = live.next_live(keys[-1] + 1) if keys \
+                else None
+            page_info = {
+                "index": index,
+                "next_index": next_index,
+                "page_size": len(data),
+                "data": data,
+            }
+            self.__cache.put((index, page_size, self.__version), page_info)
 
         return page_info
+
+    def tagged_hyper_index(self, index: Optional[int] = None,
+                           page_size: int = 10) -> Tuple[Dict, str]:
+        """
+        Retrieve a ``get_hyper_index`` response together with its ETag.
+
+        Both are read under the lock inserts and deletes take, so the tag
+        always matches the rows returned.
+
+        Args:
+            index (int): The starting index for the page.
+            page_size (int): The number of items per page.
+
+        Returns:
+            Tuple[Dict, str]: The response and its quoted entity tag.
+        """
+        self.indexed_dataset()
+        with self.__lock:
+            page_info = self.get_hyper_index(index, page_size)
+            return page_info, self.etag(index or 0, page_size)
+
+    @instrumented
+    def get_cursor_page(self, cursor: Optional[str] = None,
+                        page_size: int = 10, direction: str = "next") -> Dict:
+        """
+        Retrieve a page relative to an opaque keyset cursor.
+
+        A "next" page holds the live rows right after the cursor key and a
+        "prev" page the live rows right before it. Without a cursor, "next"
+        starts at the first row and "prev" ends at the last one. The
+        response's ``next_cursor`` should be passed back with direction
+        "next" and its ``prev_cursor`` with direction "prev"; either is
+        None when there are no rows in that direction. Lookups cost
+        O(log n + page_size) however deep the page is, and pages stay
+        stable while rows are inserted or deleted around them.
+
+        Args:
+            cursor (str): A cursor from a previous response, or None.
+            page_size (int): The number of items per page.
+            direction (str): "next" or "prev".
+
+        Returns:
+            Dict: The page data, its size, the next and previous cursors
+            and the dataset version.
+
+        Raises:
+            ValueError: If the cursor is malformed or was not signed by
+            this service.
+        """
+        assert isinstance(page_size, int) and page_size > 0
+        assert direction in ("next", "prev")
+
+        live, indexed_dataset = self._indexed()
+        key = decode_cursor(cursor)[0] if cursor is not None else None
+
+        with self.__lock:
+            if key is None:
+                key = -1 if direction == "next" else live.capacity
+            if direction == "next":
+                keys = live.page(key + 1, page_size)
+            else:
+                before = live.rank(key)
+                first = live.select(max(before - page_size, 0))
+                keys = live.page(first, min(page_size, before)) \
+                    if first is not None else []
+
+            version = self.__version
+            next_cursor = prev_cursor = None
+            if keys:
+                if live.next_live(keys[-1] + 1) is not None:
+                    next_cursor = encode_cursor(keys[-1], version)
+                if live.rank(keys[0]) > 0:
+                    prev_cursor = encode_cursor(keys[0], version)
+            data = indexed_dataset.select(keys)
+
+        return {
+            "page_size": len(keys),
+            "data": data,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "version": version,
+        }
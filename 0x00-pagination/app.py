@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+HTTP pagination service
+
+This module serves the pagination servers over HTTP with the standard
+library's threading HTTP server:
+
+    GET /page?page=1&page_size=10          -> get_page
+    GET /hyper?page=1&page_size=10         -> get_hyper
+    GET /hyper_index?index=0&page_size=10  -> get_hyper_index
+    GET /metrics                           -> Prometheus metrics
+
+``/page`` and ``/hyper`` also accept ``year``, ``gender`` and ``ethnicity``
+filters, an ``order_by`` parameter and a ``fields`` projection such as
+``fields=name,count``. Responses carry RFC 5988 ``Link``
+headers to the neighbouring pages, and hypermedia responses carry strong
+ETags honoured through If-None-Match. Adding ``format=ndjson`` (or sending
+``Accept: application/x-ndjson``) streams the rows of a page as
+newline-delimited JSON, flushed in chunks as they are produced, with the
+page metadata moved to headers.
+
+With ``--fast-start``, first pages requested while the dataset is still
+loading are read from the head of the file, with an estimated
+``total_pages`` flagged ``approximate``, and are not cached.
+
+Usage:
+    python3 app.py --port 5000 --backend memory
+"""
+import argparse
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from metrics import Metrics
+
+HyperServer = __import__('2-hypermedia_pagination').Server
+IndexServer = __import__('3-hypermedia_del_pagination').Server
+
+FILTER_PARAMS = ("year", "gender", "ethnicity")
+NDJSON = "application/x-ndjson"
+# Rows encoded per chunk when streaming NDJSON.
+STREAM_BATCH = 500
+
+
+class PaginationHandler(BaseHTTPRequestHandler):
+    """
+    Request handler exposing the pagination servers.
+
+    The servers are class attributes shared by every request thread; they
+    are set up by ``make_server``.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle delay the body.
+    disable_nagle_algorithm = True
+    # Type checkers can't import the task modules, whose names aren't
+    # identifiers, so the servers are typed Any.
+    hyper_server: Any = None
+    index_server: Any = None
+    metrics: Optional[Metrics] = None
+
+    def do_GET(self) -> None:
+        """
+        Route a GET request to its endpoint.
+        """
+        url = urlsplit(self.path)
+        self.query = {key: values[-1]
+                      for key, values in parse_qs(url.query).items()}
+        routes: Dict[str, Callable[[str], None]] = {
+            "/page": self.handle_page,
+            "/hyper": self.handle_hyper,
+            "/hyper_index": self.handle_hyper_index,
+            "/metrics": self.handle_metrics,
+        }
+        route = routes.get(url.path.rstrip("/") or "/")
+        if route is None:
+            self.send_json(404, {"error": "Not found"})
+            return
+        try:
+            route(url.path)
+        except (AssertionError, ValueError, KeyError) as exc:
+            self.send_json(400, {"error": str(exc) or "Invalid parameters"})
+
+    def int_param(self, name: str, default: int) -> int:
+        """
+        Read an integer query parameter.
+        """
+        value = self.query.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError("{} must be an integer.".format(name))
+
+    def filters(self) -> Optional[Dict]:
+        """
+        Collect the filter query parameters.
+        """
+        filters = {name: self.query[name]
+                   for name in FILTER_PARAMS if name in self.query}
+        return filters or None
+
+    def fields(self) -> Optional[List[str]]:
+        """
+        Read the comma-separated ``fields`` projection parameter.
+        """
+        fields = [name.strip() for name in
+                  self.query.get("fields", "").split(",") if name.strip()]
+        return fields or None
+
+    def wants_ndjson(self) -> bool:
+        """
+        Tell whether the client asked for a streamed NDJSON response.
+        """
+        return self.query.get("format") == "ndjson" or \
+            NDJSON in self.headers.get("Accept", "")
+
+    def link(self, path: str, **params) -> str:
+        """
+        Build the URL of a neighbouring page, keeping the other parameters.
+        """
+        query = dict(self.query)
+        query.update({key: str(value) for key, value in params.items()})
+        return "{}?{}".format(path, urlencode(query))
+
+    def links(self, path: str, rels: Mapping[str, Optional[Dict]]) -> str:
+        """
+        Format an RFC 5988 Link header from relation names to parameters;
+        relations without parameters are left out.
+        """
+        return ", ".join('<{}>; rel="{}"'.format(self.link(path, **params),
+                                                 rel)
+                         for rel, params in rels.items() if params)
+
+    def handle_page(self, path: str) -> None:
+        """
+        Serve ``get_page``.
+        """
+        self.handle_hyper(path, bare=True)
+
+    def handle_hyper(self, path: str, bare: bool = False) -> None:
+        """
+        Serve ``get_hyper``, or ``get_page`` when ``bare`` is set.
+        """
+        server = self.hyper_server
+        page = self.int_param("page", 1)
+        page_size = self.int_param("page_size", 10)
+        filters = self.filters()
+        order_by = self.query.get("order_by")
+        fields = self.fields()
+
+        ndjson = self.wants_ndjson()
+        page_info = None if ndjson else server.fast_hyper(
+            page, page_size, filters, order_by, fields)
+        if page_info is not None:
+            # Served before the dataset is loaded; not worth revalidating.
+            headers = {
+                "Cache-Control": "no-store",
+                "Link": self.links(path, self.page_rels(
+                    page, page_size, page_info["total_pages"])),
+            }
+            self.send_json(200, page_info["data"] if bare else page_info,
+                           headers)
+            return
+
+        # The tag, links and body all come from the same dataset version.
+        current = server.current()
+        # Each representation of a page gets its own strong ETag.
+        variant = "ndjson" if ndjson else "page" if bare else "hyper"
+        etag = server.etag(page, page_size, filters, order_by, fields,
+                           current)
+        etag = '{}-{}"'.format(etag[:-1], variant)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_empty(304, {"ETag": etag, "Vary": "Accept"})
+            return
+
+        total_pages = math.ceil(server.count(filters, current) / page_size)
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept",
+            "Link": self.links(path, self.page_rels(page, page_size,
+                                                    total_pages)),
+        }
+        if ndjson:
+            rows = server.iter_rows(page, page_size, filters, order_by,
+                                    fields=fields, current=current)
+            headers["X-Total-Pages"] = str(total_pages)
+            self.send_ndjson(rows, headers)
+        elif bare:
+            self.send_json(200, server.get_page(
+                page, page_size, filters, order_by, fields, current),
+                headers)
+        else:
+            self.send_json(200, server.get_hyper_bytes(
+                page, page_size, filters, order_by, fields, current),
+                headers)
+
+    @staticmethod
+    def page_rels(page: int, page_size: int,
+                  total_pages: int) -> Dict[str, Optional[Dict]]:
+        """
+        Return the parameters of the first, prev, next and last pages.
+        """
+        last = max(total_pages, 1)
+        return {
+            "first": {"page": 1, "page_size": page_size},
+            "prev": {"page": page - 1, "page_size": page_size}
+            if page > 1 else None,
+            "next": {"page": page + 1, "page_size": page_size}
+            if page < total_pages else None,
+            "last": {"page": last, "page_size": page_size},
+        }
+
+    def handle_hyper_index(self, path: str) -> None:
+        """
+        Serve ``get_hyper_index``.
+        """
+        server = self.index_server
+        index = self.int_param("index", 0)
+        page_size = self.int_param("page_size", 10)
+
+        ndjson = self.wants_ndjson()
+        variant = "ndjson" if ndjson else "hyper"
+        etag = server.etag(index, page_size)
+        etag = '{}-{}"'.format(etag[:-1], variant)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_empty(304, {"ETag": etag, "Vary": "Accept"})
+            return
+
+        # Rows may be inserted or deleted meanwhile: tag the page returned.
+        hyper, etag = server.tagged_hyper_index(index, page_size)
+        etag = '{}-{}"'.format(etag[:-1], variant)
+        rels = {"first": {"index": 0, "page_size": page_size}}
+        if hyper["next_index"] is not None:
+            rels["next"] = {"index": hyper["next_index"],
+                            "page_size": page_size}
+        headers = {"ETag": etag, "Vary": "Accept",
+                   "Link": self.links(path, rels)}
+        if ndjson:
+            self.send_ndjson(hyper["data"], headers)
+        else:
+            self.send_json(200, hyper, headers)
+
+    def handle_metrics(self, path: str) -> None:
+        """
+        Serve the metrics of both servers in the Prometheus text format.
+        """
+        if self.metrics is None:
+            self.send_json(404, {"error": "Metrics are disabled"})
+            return
+        payload = self.metrics.render().encode("utf-8")
+        self.send_headers(200, {
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+            "Content-Length": str(len(payload)),
+        })
+        self.wfile.write(payload)
+
+    def send_headers(self, status: int, headers: Dict[str, str]) -> None:
+        """
+        Send the status line and headers, skipping empty values.
+        """
+        self.send_response(status)
+        for name, value in headers.items():
+            if value:
+                self.send_header(name, value)
+        self.end_headers()
+
+    def send_empty(self, status: int, headers: Dict[str, str]) -> None:
+        """
+        Send a response without a body.
+        """
+        self.send_headers(status, dict(headers, **{"Content-Length": "0"}))
+
+    def send_json(self, status: int, body: object,
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send a JSON document, given as an object or already encoded.
+        """
+        payload = body if isinstance(body, bytes) else \
+            json.dumps(body).encode("utf-8")
+        self.send_headers(status, dict(headers or {}, **{
+            "Content-Type": "application/json",
+            "Content-Length": str(len(payload)),
+        }))
+        self.wfile.write(payload)
+
+    def send_ndjson(self, rows: Iterable[List],
+                    headers: Dict[str, str]) -> None:
+        """
+        Stream rows as NDJSON with chunked transfer encoding.
+
+        Rows are encoded and flushed ``STREAM_BATCH`` at a time, so the
+        full page is never encoded in memory.
+        """
+        self.send_headers(200, dict(headers, **{
+            "Content-Type": NDJSON,
+            "Transfer-Encoding": "chunked",
+        }))
+        batch = []
+        for row in rows:
+            batch.append(json.dumps(row))
+            if len(batch) == STREAM_BATCH:
+                self.write_chunk(batch)
+                batch = []
+        self.write_chunk(batch)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, lines: List[str]) -> None:
+        """
+        Write NDJSON lines as one HTTP chunk.
+        """
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Silence the per-request access log.
+        """
+
+
+class PaginationHTTPServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server with a listen backlog sized for bursts of clients.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(host: str = "127.0.0.1", port: int = 5000,
+                backend: str = "memory", metrics: bool = True,
+                fast_start: bool = False) -> PaginationHTTPServer:
+    """
+    Create the HTTP server and its pagination servers.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on, 0 for any free port.
+        backend (str): The dataset storage backend.
+        metrics (bool): Whether to measure the servers and serve the
+        results on ``/metrics``, labeled by server.
+        fast_start (bool): Whether first pages are answered from the head
+        of the data file while the dataset loads.
+
+    Returns:
+        PaginationHTTPServer: The server, ready for ``serve_forever``.
+    """
+    registry = Metrics() if metrics else None
+    hyper_metrics = registry and registry.labeled(server="hyper")
+    index_metrics = registry and registry.labeled(server="index")
+    handler = type("Handler", (PaginationHandler,), {
+        "hyper_server": HyperServer(backend, warm=True,
+                                    metrics=hyper_metrics,
+                                    fast_start=fast_start),
+        "index_server": IndexServer(backend, warm=True,
+                                    metrics=index_metrics),
+        "metrics": registry,
+    })
+    return PaginationHTTPServer((host, port), handler)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the HTTP service until interrupted.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="HTTP pagination service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--no-metrics", dest="metrics",
+                        action="store_false")
+    parser.add_argument("--fast-start", action="store_true")
+    args = parser.parse_args(argv)
+
+    httpd = make_server(args.host, args.port, args.backend, args.metrics,
+                        args.fast_start)
+    print("Serving on http://{}:{}".format(*httpd.server_address[:2]))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Asynchronous hypermedia pagination
+
+This module defines an AsyncServer that exposes the hypermedia pagination
+Server to asyncio code. The dataset is loaded once in a worker thread and
+every coroutine that needs it awaits that same load, so a cold start never
+blocks the event loop. Pages that may need blocking work (lazy backends,
+index builds) are also computed off the loop.
+"""
+import asyncio
+from concurrent.futures import Executor
+
+from storage import Dataset
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+Server = __import__('2-hypermedia_pagination').Server
+
+
+class AsyncServer:
+    """
+    asyncio front-end for the hypermedia pagination Server.
+    """
+
+    # Backends whose pages are plain in-memory slices once loaded.
+    INLINE_BACKENDS = frozenset(("memory", "csv", "shared"))
+
+    def __init__(self, server: Any = None,
+                 executor: Optional[Executor] = None):
+        """
+        Initializes a new AsyncServer instance.
+
+        Args:
+            server (Server): The synchronous server to wrap, a default
+            Server when omitted; typed Any as type checkers can't import
+            the task module.
+            executor (Executor): Where blocking work runs, the event loop's
+            default executor when omitted.
+        """
+        self.server = server if server is not None else Server()
+        self.executor = executor
+        self.__load: Optional[asyncio.Future] = None
+
+    def _run(self, func, *args) -> asyncio.Future:
+        """
+        Run a blocking call in the executor.
+        """
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, func, *args)
+
+    def warm(self) -> asyncio.Future:
+        """
+        Start loading the dataset in the background, if not started yet.
+
+        Returns:
+            asyncio.Future: The shared load, resolving to the dataset.
+        """
+        if self.__load is None or (self.__load.done() and
+                                   self.__load.exception() is not None):
+            self.__load = self._run(self.server.dataset)
+        return self.__load
+
+    async def dataset(self) -> Dataset:
+        """
+        Await the dataset, loading it off the event loop on first use.
+
+        Concurrent callers share a single load; cancelling one of them
+        does not cancel the load for the others.
+
+        Returns:
+            Dataset: The dataset's rows.
+        """
+        return await asyncio.shield(self.warm())
+
+    async def _call(self, method, page: int, page_size: int,
+                    filters: Optional[Dict], order_by: Optional[str],
+                    fields: Optional[Sequence[str]]) -> Any:
+        """
+        Call a page method of the server once the dataset is loaded.
+
+        Unfiltered, unordered pages of in-memory backends are plain slices
+        and run inline, on the version ``Server.published`` returns, so
+        they never check the data file; anything that may hit the disk,
+        build an index, or refresh or reload the dataset runs in the
+        executor.
+        """
+        await self.dataset()
+        args = (page, page_size, filters, order_by, fields)
+        current = self.server.published()
+        if current is not None and \
+                self.server.backend in self.INLINE_BACKENDS and \
+                not filters and not order_by:
+            return method(*args, current=current)
+        return await self._run(method, *args)
+
+    async def get_page(self, page: int = 1, page_size: int = 10,
+                       filters: Optional[Dict] = None,
+                       order_by: Optional[str] = None,
+                       fields: Optional[Sequence[str]] = None) -> List[List]:
+        """
+        Retrieve a page of data from the dataset.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering, e.g. "-count".
+            fields (Sequence[str]): Optional column projection.
+
+        Returns:
+            List[List]: The requested page of data from the dataset.
+        """
+        return await self._call(self.server.get_page, page, page_size,
+                                filters, order_by, fields)
+
+    async def get_hyper(self, page: int = 1, page_size: int = 10,
+                        filters: Optional[Dict] = None,
+                        order_by: Optional[str] = None,
+                        fields: Optional[Sequence[str]] = None) -> Dict:
+        """
+        Retrieve hypermedia information about a page.
+
+        Args:
+            page (int): The page number (1-indexed).
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering, e.g. "-count".
+            fields (Sequence[str]): Optional column projection.
+
+        Returns:
+            Dict: Information about the page, as returned by
+            ``Server.get_hyper``.
+        """
+        return await self._call(self.server.get_hyper, page, page_size,
+                                filters, order_by, fields)
+
+    async def iter_pages(
+            self, page_size: int = 10, filters: Optional[Dict] = None,
+            order_by: Optional[str] = None, start: int = 1,
+            fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[List[List]]:
+        """
+        Stream consecutive pages with ``async for``.
+
+        Args:
+            page_size (int): The number of items per page.
+            filters (Dict): Optional column to value filters.
+            order_by (str): Optional ordering, e.g. "-count".
+            start (int): The first page number to yield.
+            fields (Sequence[str]): Optional column projection.
+
+        Yields:
+            List[List]: Each non-empty page, in order.
+        """
+        page = start
+        while True:
+            data = await self.get_page(page, page_size, filters, order_by,
+                                       fields)
+            if not data:
+                return
+            yield data
+            page += 1
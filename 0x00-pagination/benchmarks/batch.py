@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Batch pagination benchmark
+
+This script compares fetching N hypermedia pages with N separate
+``get_hyper`` calls against a single ``get_hypers`` call, for batch sizes
+of 1, 10 and 100, and reports the cost per page. Each scenario runs
+unfiltered and with a filter plus an ordering, where the batched call
+saves the most by resolving them once. The page cache is disabled so
+both sides build every page.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/batch.py --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Type checkers can't import the task module, whose name isn't an
+# identifier, so the server class is typed Any.
+Server: Any = __import__('2-hypermedia_pagination').Server
+
+SCENARIOS = {
+    "plain": (None, None),
+    "filtered+ordered": ({"year": 2016, "gender": "FEMALE"}, "-count"),
+}
+
+
+class UncachedServer(Server):
+    """
+    Server without the page cache, so every call builds its page.
+    """
+
+    CACHE_SIZE = 0
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """
+    Return the fastest of ``repeat`` timed runs of ``func``, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per batch size and scenario.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    server = UncachedServer(args.backend)
+    rng = random.Random(0)
+    print("{:<18} {:>5} {:>14} {:>14} {:>8}".format(
+        "scenario", "batch", "single us/pg", "batch us/pg", "speedup"))
+    for name, (filters, order_by) in SCENARIOS.items():
+        server.get_hyper(1, args.page_size, filters, order_by)
+        for size in (1, 10, 100):
+            requests = [(rng.randint(1, 50), args.page_size)
+                        for _ in range(size)]
+            single = best_of(args.repeat, lambda: [
+                server.get_hyper(page, page_size, filters, order_by)
+                for page, page_size in requests])
+            batch = best_of(args.repeat, lambda: server.get_hypers(
+                requests, filters, order_by))
+            print("{:<18} {:>5} {:>14.1f} {:>14.1f} {:>7.1f}x".format(
+                name, size, single / size * 1e6, batch / size * 1e6,
+                single / batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cold-start concurrency check for the pagination servers
+
+This script points many threads at a cold Server at the same moment and
+counts how many times the dataset gets loaded. With single-flight loading
+the count must be exactly one whatever the number of threads; the script
+exits with a non-zero status otherwise.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/cold_start.py --threads 64 --backend csv
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset_version  # noqa: E402
+import storage  # noqa: E402
+
+MODULES = {
+    "1": "1-simple_pagination",
+    "2": "2-hypermedia_pagination",
+    "3": "3-hypermedia_del_pagination",
+}
+
+
+def run(module_name: str, threads: int, backend: str, warm: bool) -> int:
+    """
+    Hit a cold server from ``threads`` threads and count dataset loads.
+
+    Args:
+        module_name (str): The task module whose Server is exercised.
+        threads (int): The number of concurrent requests.
+        backend (str): The dataset storage backend.
+        warm (bool): Whether the server warms up in the background.
+
+    Returns:
+        int: The number of times the dataset was loaded.
+    """
+    # Typed Any: the task modules' names aren't identifiers, so type
+    # checkers can't import them.
+    module: Any = __import__(module_name)
+    loads = []
+    open_dataset = storage.open_dataset
+    # Every module that imported the loader by name, the versioned
+    # datasets of Server 2 included.
+    patched = [m for m in (module, dataset_version, storage)
+               if getattr(m, "open_dataset", None) is open_dataset]
+
+    def counting_open(*args, **kwargs):
+        """
+        Record the load, then delegate to the real loader.
+        """
+        loads.append(threading.get_ident())
+        return open_dataset(*args, **kwargs)
+
+    for patched_module in patched:
+        patched_module.open_dataset = counting_open
+    try:
+        server = module.Server(backend, warm=warm)
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def request() -> None:
+            """
+            Wait for every thread, then ask for a page.
+            """
+            barrier.wait()
+            try:
+                if hasattr(server, "get_hyper_index"):
+                    server.get_hyper_index(0, 10)
+                else:
+                    server.get_page(1, 10)
+            except Exception as exc:
+                errors.append(exc)
+
+        workers = [threading.Thread(target=request) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        for patched_module in patched:
+            patched_module.open_dataset = open_dataset
+
+    print("{}: {} threads, {} load(s), {} error(s), {:.3f}s".format(
+        module_name, threads, len(loads), len(errors), elapsed))
+    return len(loads) + len(errors) * threads
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the check for every server module.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--backend", default="csv")
+    parser.add_argument("--warm", action="store_true")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in MODULES.values():
+        if run(name, args.threads, args.backend, args.warm) != 1:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compressed dataset benchmark
+
+This script writes block-compressed copies of the dataset with every codec
+and compares their size on disk and the cost of random page reads against
+the uncompressed, memory-mapped CSV file. A fresh dataset is opened for
+each read so the block cache does not hide the decompression cost.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/compressed.py --rows-per-block 512
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compressed_dataset import (  # noqa: E402
+    CODECS, ROWS_PER_BLOCK, CompressedDataset, write,
+)
+from lazy_dataset import MmapDataset  # noqa: E402
+
+DATA_FILE = "Popular_Baby_Names.csv"
+
+
+def time_pages(open_dataset, pages: List[int], page_size: int) -> float:
+    """
+    Return the mean seconds per page read, opening a dataset per read.
+    """
+    start = time.perf_counter()
+    for page in pages:
+        dataset = open_dataset()
+        dataset[page * page_size:(page + 1) * page_size]
+        dataset.close()
+    return (time.perf_counter() - start) / len(pages)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per storage format.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows-per-block", type=int,
+                        default=ROWS_PER_BLOCK)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    plain = MmapDataset(DATA_FILE)
+    pages = [rng.randrange(len(plain) // args.page_size)
+             for _ in range(args.reads)]
+    plain.close()
+
+    print("{:<6} {:>10} {:>7} {:>10}".format(
+        "format", "bytes", "ratio", "us/page"))
+    size = os.path.getsize(DATA_FILE)
+    print("{:<6} {:>10} {:>7.2f} {:>10.1f}".format(
+        "csv", size, 1.0, time_pages(lambda: MmapDataset(DATA_FILE), pages,
+                                     args.page_size) * 1e6))
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec, (suffix, _, _) in sorted(CODECS.items()):
+            target = write(DATA_FILE, os.path.join(tmp, DATA_FILE + suffix),
+                           codec, args.rows_per_block)
+            packed = os.path.getsize(target)
+            print("{:<6} {:>10} {:>7.2f} {:>10.1f}".format(
+                codec, packed, size / packed,
+                time_pages(lambda: CompressedDataset(target), pages,
+                           args.page_size) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+External sort benchmark
+
+This script orders a synthetic dataset (see synthetic_dataset.py) by a
+column twice: with SortIndex, which sorts every row position in memory,
+and with ExternalSortIndex under several memory budgets. For each it
+reports the time to build the sorted view, the peak Python memory
+allocated while building it again under tracemalloc, and the time to
+read a page from the middle of the view. Both read the dataset through
+the mmap backend, so the dataset itself is not counted.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/external_sorter.py --rows 1000000 --order-by name
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_dataset  # noqa: E402
+from external_sort import ExternalSortIndex  # noqa: E402
+from lazy_dataset import MmapDataset  # noqa: E402
+from sort_index import SortIndex, parse_order  # noqa: E402
+
+
+T = TypeVar("T")
+
+
+def measure(build: Callable[[], T]) -> Tuple[T, float, int]:
+    """
+    Run ``build`` timed, then again traced.
+
+    Returns:
+        Tuple[T, float, int]: The result of the timed run, its
+        duration, and the peak allocation of the traced run.
+    """
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per sorter.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--order-by", default="name")
+    parser.add_argument("--budgets", type=int, nargs="+",
+                        default=[4 << 20, 16 << 20, 64 << 20])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.csv")
+        synthetic_dataset.write(path, args.rows)
+        dataset = MmapDataset(path)
+        column, _ = parse_order(args.order_by)
+        middle = len(dataset) // 2
+        print("{} rows, ordered by {}".format(len(dataset), args.order_by))
+        print("{:<18} {:>9} {:>10} {:>12}".format(
+            "sorter", "build s", "peak MB", "page us"))
+
+        def in_memory() -> SortIndex:
+            index = SortIndex(dataset)
+            index.permutation(column)
+            return index
+
+        index, elapsed, peak = measure(in_memory)
+        start = time.perf_counter()
+        [dataset[i] for i in index.select_range(args.order_by, middle,
+                                                middle + 100)]
+        page = time.perf_counter() - start
+        print("{:<18} {:>9.2f} {:>10.1f} {:>12.1f}".format(
+            "in memory", elapsed, peak / 2 ** 20, page * 1e6))
+        del index
+
+        for budget in args.budgets:
+            def build() -> ExternalSortIndex:
+                index = ExternalSortIndex(dataset, budget, directory)
+                index.sorted_file(column)
+                return index
+
+            external, elapsed, peak = measure(build)
+            start = time.perf_counter()
+            external.rows(args.order_by, middle, middle + 100)
+            page = time.perf_counter() - start
+            print("{:<18} {:>9.2f} {:>10.1f} {:>12.1f}".format(
+                "external {}MB".format(budget >> 20), elapsed,
+                peak / 2 ** 20, page * 1e6))
+            del external
+
+
+if __name__ == "__main__":
+    main()
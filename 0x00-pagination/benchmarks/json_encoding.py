@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+JSON serialization benchmark
+
+This script compares encoding a hypermedia page with
+``json.dumps(server.get_hyper(...))`` against ``server.get_hyper_bytes``,
+which joins rows encoded once per dataset version, for several page
+sizes, unfiltered and with a filter plus an ordering. The page cache is
+disabled so both sides fetch the page every time.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/json_encoding.py --repeat 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Type checkers can't import the task module, whose name isn't an
+# identifier, so the server class is typed Any.
+Server: Any = __import__('2-hypermedia_pagination').Server
+
+SCENARIOS = {
+    "plain": (None, None),
+    "filtered+ordered": ({"year": 2016, "gender": "FEMALE"}, "-count"),
+}
+
+
+class UncachedServer(Server):
+    """
+    Server without the page cache, so every call builds its page.
+    """
+
+    CACHE_SIZE = 0
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """
+    Return the fastest of ``repeat`` timed runs of ``func``, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per page size and scenario.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    server = UncachedServer(args.backend)
+    start = time.perf_counter()
+    server.get_hyper_bytes()
+    print("encoded {} rows in {:.3f}s".format(
+        len(server.dataset()), time.perf_counter() - start))
+    print("{:<18} {:>6} {:>12} {:>12} {:>8}".format(
+        "scenario", "size", "dumps us", "bytes us", "speedup"))
+    for name, (filters, order_by) in SCENARIOS.items():
+        for size in (10, 100, 1000):
+            def dumps() -> bytes:
+                return json.dumps(server.get_hyper(
+                    3, size, filters, order_by)).encode("utf-8")
+
+            def joined() -> bytes:
+                return server.get_hyper_bytes(3, size, filters, order_by)
+
+            assert dumps() == joined()
+            before = best_of(args.repeat, dumps)
+            after = best_of(args.repeat, joined)
+            print("{:<18} {:>6} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+                name, size, before * 1e6, after * 1e6, before / after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+HTTP load test
+
+This script runs concurrent clients against the HTTP pagination service
+and reports throughput and p50/p99 latency per endpoint. Without --url, a
+local server is started in a background thread on a free port.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/load_test.py --clients 8 --requests 200
+    python3 benchmarks/load_test.py --url http://127.0.0.1:5000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+app = __import__('app')
+
+SCENARIOS = {
+    "page": "/page?page={page}&page_size=20",
+    "hyper": "/hyper?page={page}&page_size=20",
+    "hyper filtered": "/hyper?page={page}&page_size=20"
+                      "&year=2016&gender=FEMALE&order_by=-count",
+    "hyper_index": "/hyper_index?index={index}&page_size=20",
+    "ndjson 5000": "/hyper?page={small}&page_size=5000&format=ndjson",
+}
+
+
+def percentile(timings: List[float], fraction: float) -> float:
+    """
+    Return the nearest-rank percentile of sorted timings.
+    """
+    rank = max(int(round(fraction * len(timings))) - 1, 0)
+    return timings[min(rank, len(timings) - 1)]
+
+
+def fetch(url: str) -> float:
+    """
+    GET a URL, read the whole body, and return the elapsed seconds.
+    """
+    start = time.perf_counter()
+    with urlopen(Request(url)) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run(base: str, name: str, path: str, clients: int, requests: int,
+        rng: random.Random) -> None:
+    """
+    Issue ``requests`` GETs from ``clients`` threads and print a summary.
+    """
+    urls = [base + path.format(page=rng.randint(1, 500),
+                               index=rng.randint(0, 10000),
+                               small=rng.randint(1, 3))
+            for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        timings = sorted(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    print("{:<16} {:>9.0f} {:>10.2f} {:>10.2f}".format(
+        name, requests / elapsed, percentile(timings, 0.5) * 1e3,
+        percentile(timings, 0.99) * 1e3))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the load test and print one line per scenario.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="test a running server instead")
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    httpd = None
+    base = args.url
+    if base is None:
+        httpd = app.make_server("127.0.0.1", 0, args.backend)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base = "http://{}:{}".format(*httpd.server_address[:2])
+    base = base.rstrip("/")
+
+    rng = random.Random(0)
+    try:
+        for path in SCENARIOS.values():
+            fetch(base + path.format(page=1, index=0, small=1))
+        print("{:<16} {:>9} {:>10} {:>10}".format(
+            "scenario", "req/s", "p50 ms", "p99 ms"))
+        for name, path in SCENARIOS.items():
+            run(base, name, path, args.clients, args.requests, rng)
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
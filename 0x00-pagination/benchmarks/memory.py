@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the pagination dataset stores
+
+This script loads Popular_Baby_Names.csv (optionally repeated ``--scale``
+times to approximate a larger production copy) into the original
+list-of-lists layout and into ColumnarDataset, and reports the memory each
+layout holds once loading is done, as measured by tracemalloc.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/memory.py --scale 50
+"""
+import argparse
+import csv
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar_dataset import ColumnarDataset  # noqa: E402
+
+
+def read_rows(path: str, scale: int):
+    """
+    Yield the data rows of a CSV file, ``scale`` times over.
+
+    Args:
+        path (str): The CSV file to read.
+        scale (int): How many times the file is replayed.
+    """
+    for _ in range(scale):
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                yield row
+
+
+def measure(build: Callable[[], object]) -> int:
+    """
+    Return the number of bytes still allocated by the object ``build`` makes.
+
+    Args:
+        build (Callable[[], object]): A zero-argument loader.
+
+    Returns:
+        int: The retained allocation size in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return after - before
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print a small report.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--file", default="Popular_Baby_Names.csv")
+    parser.add_argument("--scale", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rows = sum(1 for _ in read_rows(args.file, args.scale))
+    lists = measure(lambda: list(read_rows(args.file, args.scale)))
+    columnar = measure(
+        lambda: ColumnarDataset.from_rows(read_rows(args.file, args.scale)))
+
+    print("rows:             {:>12,}".format(rows))
+    print("list of lists:    {:>12,} bytes ({:.1f} B/row)".format(
+        lists, lists / rows))
+    print("ColumnarDataset:  {:>12,} bytes ({:.1f} B/row)".format(
+        columnar, columnar / rows))
+    print("reduction:        {:>12.1f}x".format(lists / columnar))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Instrumentation overhead benchmark
+
+This script times cached ``get_hyper`` calls, the cheapest page method
+call there is, on a server without a metrics registry, with one, and
+with one that also forwards every update to a hook. The difference is
+the per-call cost of the instrumentation.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/metrics_overhead.py --calls 20000
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Metrics  # noqa: E402
+
+Server = __import__('2-hypermedia_pagination').Server
+
+
+def per_call(server, calls: int) -> float:
+    """
+    Return the mean duration of a cached ``get_hyper`` call, in seconds.
+    """
+    server.get_hyper(3, 20)
+    start = time.perf_counter()
+    for _ in range(calls):
+        server.get_hyper(3, 20)
+    return (time.perf_counter() - start) / calls
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per configuration.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backend", default="memory")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    hooked = Metrics()
+    hooked.add_hook(lambda name, value, labels: None)
+    servers = {
+        "disabled": Server(args.backend),
+        "metrics": Server(args.backend, metrics=Metrics()),
+        "metrics+hook": Server(args.backend, metrics=hooked),
+    }
+    baseline = None
+    print("{:<14} {:>9} {:>10}".format("config", "us/call", "overhead"))
+    for name, server in servers.items():
+        elapsed = per_call(server, args.calls)
+        baseline = baseline or elapsed
+        print("{:<14} {:>9.2f} {:>9.2f}us".format(
+            name, elapsed * 1e6, (elapsed - baseline) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
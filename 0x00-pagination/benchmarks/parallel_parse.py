@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Parallel parsing benchmark
+
+This script compares the single-process loader (``ColumnarDataset.from_csv``)
+with the process pool loader at 1, 2, 4 and 8 workers. The dataset is
+replicated ``--scale`` times into a temporary file first, so the timings
+reflect a production-sized file rather than process start-up costs.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/parallel_parse.py --scale 20 --repeat 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parallel_loader  # noqa: E402
+from columnar_dataset import ColumnarDataset  # noqa: E402
+
+DATA_FILE = "Popular_Baby_Names.csv"
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """
+    Return the fastest of ``repeat`` timed runs of ``func``, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per loader.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with open(DATA_FILE, "rb") as f:
+        header = f.readline()
+        body = f.read()
+    with tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+        tmp.write(header)
+        for _ in range(args.scale):
+            tmp.write(body)
+        tmp.flush()
+
+        rows = len(ColumnarDataset.from_csv(tmp.name))
+        print("{} rows, {} bytes, {} CPUs".format(
+            rows, os.path.getsize(tmp.name), os.cpu_count()))
+        baseline = best_of(args.repeat,
+                           lambda: ColumnarDataset.from_csv(tmp.name))
+        print("{:<10} {:>9} {:>8}".format("loader", "seconds", "speedup"))
+        print("{:<10} {:>9.3f} {:>7.2f}x".format("from_csv", baseline, 1.0))
+        for workers in (1, 2, 4, 8):
+            elapsed = best_of(args.repeat, lambda: parallel_loader.load(
+                tmp.name, workers))
+            print("{:<10} {:>9.3f} {:>7.2f}x".format(
+                "{} worker{}".format(workers, "s" if workers > 1 else ""),
+                elapsed, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
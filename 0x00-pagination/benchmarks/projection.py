@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Column projection benchmark
+
+This script widens the baby names CSV with extra columns and compares
+reading whole rows against a narrow ``fields`` projection (name and count
+by default) through ``get_page``, ``get_hyper`` and ``get_hyper_bytes``,
+for several page sizes. The memory backend keeps the dataset in columns
+and decodes only the projected ones; row backends such as mmap decode
+whole rows and cut them down. The page cache is disabled so every call
+builds its page.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/projection.py --extra-columns 24 --backends memory mmap
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Server = __import__('2-hypermedia_pagination').Server
+
+
+def widen(source: str, path: str, extra: int) -> None:
+    """
+    Copy a CSV file to ``path`` with ``extra`` columns appended to each row.
+    """
+    with open(source, newline="") as f, open(path, "w", newline="") as out:
+        reader = csv.reader(f)
+        writer = csv.writer(out)
+        header = next(reader)
+        writer.writerow(header + ["Extra {}".format(i) for i in range(extra)])
+        for n, row in enumerate(reader):
+            writer.writerow(row + [str(n * (i + 7) % 9973)
+                                   for i in range(extra)])
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """
+    Return the fastest of ``repeat`` timed runs of ``func``, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmark and print one line per backend, method and page size.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data-file", default=Server.DATA_FILE)
+    parser.add_argument("--extra-columns", type=int, default=24)
+    parser.add_argument("--fields", default="name,count")
+    parser.add_argument("--backends", nargs="+", default=["memory", "mmap"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    fields = args.fields.split(",")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wide.csv")
+        widen(args.data_file, path, args.extra_columns)
+        print("{} columns, projected to {}".format(
+            6 + args.extra_columns, args.fields))
+        print("{:<8} {:<16} {:>6} {:>12} {:>12} {:>8}".format(
+            "backend", "method", "size", "all us", "fields us", "speedup"))
+        for backend in args.backends:
+            server = type("UncachedServer", (Server,), {
+                "DATA_FILE": path,
+                "CACHE_SIZE": 0,
+                "REFRESH_INTERVAL": None,
+            })(backend)
+            server.get_hyper_bytes()
+            for method in ("get_page", "get_hyper", "get_hyper_bytes"):
+                call = getattr(server, method)
+                for size in (100, 1000, 10000):
+                    def whole() -> object:
+                        return call(2, size)
+
+                    def narrow() -> object:
+                        return call(2, size, fields=fields)
+
+                    before = best_of(args.repeat, whole)
+                    after = best_of(args.repeat, narrow)
+                    print("{:<8} {:<16} {:>6} {:>12.1f} {:>12.1f} "
+                          "{:>7.1f}x".format(backend, method, size,
+                                             before * 1e6, after * 1e6,
+                                             before / after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Pagination benchmark suite
+
+This script generates synthetic baby names datasets at several scales
+(see synthetic_dataset.py) and measures, for every storage backend and
+page method (``get_page``, ``get_hyper`` and ``get_hyper_index``):
+
+- the time to load the dataset, cold (sidecar files removed) and warm;
+- the peak RSS of the process serving the method;
+- the latency of the method for several page sizes and page depths, a
+  depth being the position of the page as a fraction of the dataset.
+
+Each measurement runs in a fresh process, so load times and peak RSS are
+not skewed by earlier runs. Page caches are disabled, so every call does
+its work. Results are written to a JSON file; ``--baseline`` compares
+them to an earlier one.
+
+Usage (from the 0x00-pagination directory):
+    python3 benchmarks/suite.py --rows 100000 1000000 --output results.json
+    python3 benchmarks/suite.py --rows 100000 --baseline results.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_dataset  # noqa: E402
+
+METHODS = {
+    # method: (module, start argument of the page)
+    "get_page": ("1-simple_pagination", "page"),
+    "get_hyper": ("2-hypermedia_pagination", "page"),
+    "get_hyper_index": ("3-hypermedia_del_pagination", "index"),
+}
+
+
+def server_for(method: str, path: str):
+    """
+    Return an uncached server for ``method`` that serves ``path``.
+    """
+    Server = __import__(METHODS[method][0]).Server
+    return type("BenchmarkServer", (Server,), {
+        "DATA_FILE": path,
+        "CACHE_SIZE": 0,
+        "REFRESH_INTERVAL": None,
+    })
+
+
+def peak_rss() -> int:
+    """
+    Return the peak resident set size of this process, in bytes.
+
+    ``ru_maxrss`` survives ``exec`` on Linux, so a worker would report
+    the peak of the suite process that forked it; the ``VmHWM`` of the
+    process's own address space is used instead where available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(spec: Dict) -> Dict:
+    """
+    Load a dataset and time a page method; runs in a worker process.
+
+    Args:
+        spec (Dict): The data file, backend, method, page sizes, depths
+        and repeat count.
+
+    Returns:
+        Dict: The load time, peak RSS and latencies.
+    """
+    method = spec["method"]
+    server = server_for(method, spec["path"])(spec["backend"])
+    start = time.perf_counter()
+    rows = len(server.indexed_dataset() if method == "get_hyper_index"
+               else server.dataset())
+    result: Dict[str, Any] = {
+        "load_seconds": time.perf_counter() - start, "rows": rows}
+    call = getattr(server, method)
+    latencies = []
+    for page_size in spec["page_sizes"]:
+        pages = max(-(-rows // page_size), 1)
+        for depth in spec["depths"]:
+            page = 1 + int(depth * (pages - 1))
+            start_arg = (page - 1) * page_size \
+                if METHODS[method][1] == "index" else page
+            timings = []
+            for _ in range(spec["repeat"]):
+                before = time.perf_counter()
+                call(start_arg, page_size)
+                timings.append(time.perf_counter() - before)
+            timings.sort()
+            latencies.append({
+                "page_size": page_size,
+                "depth": depth,
+                "page": page,
+                "p50_us": statistics.median(timings) * 1e6,
+                "p95_us": timings[int(0.95 * (len(timings) - 1))] * 1e6,
+                "mean_us": statistics.mean(timings) * 1e6,
+            })
+    result["latency"] = latencies
+    result["peak_rss_bytes"] = peak_rss()
+    return result
+
+
+def run_worker(spec: Dict) -> Dict:
+    """
+    Run ``measure`` in a fresh Python process.
+    """
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker",
+         json.dumps(spec)],
+        check=True, stdout=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(output.stdout.decode("utf-8"))
+
+
+def remove_sidecars(path: str) -> None:
+    """
+    Delete the index and snapshot files built next to a data file.
+    """
+    for sidecar in glob.glob(glob.escape(path) + ".*"):
+        os.remove(sidecar)
+
+
+def data_file(directory: str, rows: int, seed: int) -> str:
+    """
+    Return a synthetic dataset of ``rows`` rows, generating it if needed.
+    """
+    path = os.path.join(directory, "synthetic_{}_{}.csv".format(rows, seed))
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        synthetic_dataset.write(path, rows, seed=seed)
+        print("generated {} in {:.1f}s".format(
+            path, time.perf_counter() - start), file=sys.stderr)
+    return path
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> None:
+    """
+    Print how the p50 latencies and load times changed from a baseline.
+    """
+    def key(entry: Dict) -> tuple:
+        return entry["rows"], entry["backend"], entry["method"]
+
+    previous = {key(entry): entry for entry in baseline}
+    print("{:<34} {:>12} {:>12} {:>8}".format(
+        "benchmark", "baseline", "current", "change"))
+    for entry in results:
+        before = previous.get(key(entry))
+        if before is None:
+            continue
+        name = "{} {} {}".format(*key(entry))
+        pairs = [("load", before["warm_load_seconds"] * 1e6,
+                  entry["warm_load_seconds"] * 1e6)]
+        old = {(p["page_size"], p["depth"]): p for p in before["latency"]}
+        for point in entry["latency"]:
+            match = old.get((point["page_size"], point["depth"]))
+            if match is not None:
+                pairs.append(("{}@{}".format(point["page_size"],
+                                             point["depth"]),
+                              match["p50_us"], point["p50_us"]))
+        for label, was, now in pairs:
+            print("{:<34} {:>10.1f}us {:>10.1f}us {:>+7.1f}%".format(
+                name + " " + label, was, now, (now / was - 1) * 100))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the suite and write the results.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--backends", nargs="+", default=["memory", "mmap"])
+    parser.add_argument("--methods", nargs="+", choices=sorted(METHODS),
+                        default=sorted(METHODS))
+    parser.add_argument("--page-sizes", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--depths", type=float, nargs="+",
+                        default=[0.0, 0.5, 1.0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir",
+                        help="keep the generated datasets here for reuse")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results to compare to")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        json.dump(measure(json.loads(args.worker)), sys.stdout)
+        return
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix="pagination-")
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    try:
+        for rows in args.rows:
+            path = data_file(directory, rows, args.seed)
+            for backend in args.backends:
+                for method in args.methods:
+                    spec = {"path": path, "backend": backend,
+                            "method": method, "page_sizes": args.page_sizes,
+                            "depths": args.depths, "repeat": args.repeat}
+                    remove_sidecars(path)
+                    cold = run_worker(dict(spec, page_sizes=[]))
+                    warm = run_worker(spec)
+                    results.append({
+                        "rows": rows,
+                        "backend": backend,
+                        "method": method,
+                        "file_bytes": os.path.getsize(path),
+                        "cold_load_seconds": cold["load_seconds"],
+                        "warm_load_seconds": warm["load_seconds"],
+                        "peak_rss_bytes": warm["peak_rss_bytes"],
+                        "latency": warm["latency"],
+                    })
+                    print("{:>10} {:<8} {:<16} load {:.3f}s cold, {:.3f}s "
+                          "warm, peak RSS {:.1f} MB".format(
+                              rows, backend, method,
+                              cold["load_seconds"], warm["load_seconds"],
+                              warm["peak_rss_bytes"] / 2 ** 20))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(directory)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {name: value for name, value in vars(args).items()
+                     if name not in ("worker", "baseline", "output")},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("wrote", args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Bitmap secondary indexes
+
+This module defines compressed bitmaps of row positions and an index that
+keeps one bitmap per distinct value of the low-cardinality dataset columns
+(Year of Birth, Gender, Ethnicity). Filtering a page then means
+intersecting a few bitmaps and picking bits out of the result, instead of
+scanning every row. Rows appended to a dataset are indexed on their own
+and their bits added to the bitmaps already built.
+"""
+import copy
+from array import array
+from bisect import bisect_right
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple,
+    Union,
+)
+
+from columnar_dataset import (
+    HEADER, ColumnarDataset, DictColumn, resolve_field, scan_column,
+)
+
+
+# Maps the "0" and "1" digits of ``bin()`` to mask bytes.
+_BIT_BYTES = bytes.maketrans(b"01", b"\x00\x01")
+
+
+class Bitmap:
+    """
+    A set of row positions stored as fixed-size chunks of bits.
+
+    Each chunk is a Python int holding ``CHUNK_BITS`` bits and empty chunks
+    are not stored at all, so sparse bitmaps stay small. Per-chunk
+    cardinalities are kept in a cumulative array to locate the n-th member
+    with a binary search.
+    """
+
+    CHUNK_BITS = 4096
+
+    def __init__(self, chunks: Optional[Dict[int, int]] = None):
+        """
+        Initializes the bitmap from its non-empty chunks.
+
+        Args:
+            chunks (Dict[int, int]): Chunk number to chunk bits.
+        """
+        chunks = chunks or {}
+        self.keys = sorted(chunks)
+        self.words = [chunks[key] for key in self.keys]
+        self.cumulative = array('q', [0])
+        total = 0
+        for word in self.words:
+            total += bin(word).count("1")
+            self.cumulative.append(total)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Bitmap':
+        """
+        Build a bitmap from a dense little-endian bitset.
+
+        Args:
+            data (bytes): Bit ``i`` of the set is bit ``i % 8`` of
+            ``data[i // 8]``.
+
+        Returns:
+            Bitmap: The compressed bitmap.
+        """
+        step = cls.CHUNK_BITS // 8
+        chunks = {}
+        for key, offset in enumerate(range(0, len(data), step)):
+            word = int.from_bytes(data[offset:offset + step], "little")
+            if word:
+                chunks[key] = word
+        return cls(chunks)
+
+    @classmethod
+    def from_positions(cls, positions: Iterable[int]) -> 'Bitmap':
+        """
+        Build a bitmap from row positions.
+
+        Args:
+            positions (Iterable[int]): The positions, in any order.
+
+        Returns:
+            Bitmap: The compressed bitmap.
+        """
+        chunks: Dict[int, int] = {}
+        for position in positions:
+            key, bit = divmod(position, cls.CHUNK_BITS)
+            chunks[key] = chunks.get(key, 0) | 1 << bit
+        return cls(chunks)
+
+    @classmethod
+    def full(cls, size: int) -> 'Bitmap':
+        """
+        Build a bitmap holding every position in ``range(size)``.
+
+        Args:
+            size (int): The number of positions.
+
+        Returns:
+            Bitmap: The full bitmap.
+        """
+        chunks = {}
+        for key in range(0, size, cls.CHUNK_BITS):
+            bits = min(cls.CHUNK_BITS, size - key)
+            chunks[key // cls.CHUNK_BITS] = (1 << bits) - 1
+        return cls(chunks)
+
+    def __len__(self) -> int:
+        """
+        Return the number of positions in the bitmap.
+        """
+        return self.cumulative[-1]
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        """
+        Return the intersection of two bitmaps.
+        """
+        mine = dict(zip(self.keys, self.words))
+        chunks = {}
+        for key, word in zip(other.keys, other.words):
+            both = mine.get(key, 0) & word
+            if both:
+                chunks[key] = both
+        return Bitmap(chunks)
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        """
+        Return the union of two bitmaps.
+        """
+        chunks = dict(zip(self.keys, self.words))
+        for key, word in zip(other.keys, other.words):
+            chunks[key] = chunks.get(key, 0) | word
+        return Bitmap(chunks)
+
+    def __contains__(self, position: int) -> bool:
+        """
+        Tell whether ``position`` is in the bitmap.
+        """
+        key, bit = divmod(position, self.CHUNK_BITS)
+        i = bisect_right(self.keys, key) - 1
+        return i >= 0 and self.keys[i] == key and \
+            bool(self.words[i] >> bit & 1)
+
+    def _chunk_positions(self, i: int, skip: int = 0) -> Iterator[int]:
+        """
+        Yield the positions of chunk ``i`` after skipping the first ``skip``.
+        """
+        word = self.words[i]
+        for _ in range(skip):
+            word &= word - 1
+        base = self.keys[i] * self.CHUNK_BITS
+        while word:
+            low = word & -word
+            yield base + low.bit_length() - 1
+            word ^= low
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterate over the positions in ascending order.
+        """
+        for i in range(len(self.words)):
+            yield from self._chunk_positions(i)
+
+    def mask(self, size: int) -> bytearray:
+        """
+        Expand the bitmap into one byte per position, 1 for members.
+
+        Chunks are expanded with string operations rather than bit by
+        bit, so the mask costs about as much as copying ``size`` bytes.
+
+        Args:
+            size (int): The number of positions covered.
+
+        Returns:
+            bytearray: The membership mask.
+        """
+        mask = bytearray(size)
+        for key, word in zip(self.keys, self.words):
+            bits = bin(word)[:1:-1].encode("ascii").translate(_BIT_BYTES)
+            start = key * self.CHUNK_BITS
+            end = min(start + len(bits), size)
+            if end > start:
+                mask[start:end] = bits[:end - start]
+        return mask
+
+    def select_range(self, start: int, stop: int) -> List[int]:
+        """
+        Return the members ranked ``start`` to ``stop - 1`` in order.
+
+        Args:
+            start (int): The rank of the first member wanted.
+            stop (int): The rank after the last member wanted.
+
+        Returns:
+            List[int]: The selected row positions.
+        """
+        stop = min(stop, len(self))
+        positions: List[int] = []
+        if start >= stop:
+            return positions
+        i = bisect_right(self.cumulative, start) - 1
+        skip = start - self.cumulative[i]
+        while len(positions) < stop - start:
+            for position in self._chunk_positions(i, skip):
+                positions.append(position)
+                if len(positions) == stop - start:
+                    break
+            i += 1
+            skip = 0
+        return positions
+
+
+def _column_values(dataset,
+                   column: int) -> Iterable[Tuple[int, Union[int, str]]]:
+    """
+    Yield ``(row position, value)`` pairs for a column of a dataset.
+
+    Columnar datasets are read straight from their column buffers; other
+    datasets are decoded page by page.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        source = dataset.columns[column]
+        if isinstance(source, DictColumn):
+            return enumerate(source.codes)
+        return enumerate(source.values)
+    return enumerate(scan_column(dataset, column))
+
+
+def _decoder(dataset, column: int) -> Callable[[Any], str]:
+    """
+    Return the function mapping the values ``_column_values`` yields for a
+    column to their CSV text.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        source = dataset.columns[column]
+        if isinstance(source, DictColumn):
+            return source.values.__getitem__
+    return str
+
+
+class BitmapIndex:
+    """
+    One bitmap per distinct value of selected dataset columns.
+
+    Filters are dictionaries mapping a column (CSV name or alias such as
+    "year") to the value wanted; values are compared with their CSV text,
+    so ``{"year": 2016}`` and ``{"year": "2016"}`` are equivalent.
+    """
+
+    COLUMNS = ("Year of Birth", "Gender", "Ethnicity")
+
+    def __init__(self, dataset, columns: Sequence[str] = COLUMNS):
+        """
+        Build the bitmaps of the given columns of a dataset.
+
+        Args:
+            dataset: A ColumnarDataset, or any dataset supporting ``len()``
+            and slicing.
+            columns (Sequence[str]): The columns to index.
+        """
+        self.header = tuple(getattr(dataset, "header", HEADER))
+        self.size = len(dataset)
+        self.bitmaps = {}
+        for name in columns:
+            column = resolve_field(name, self.header)
+            self.bitmaps[column] = self._build(dataset, column)
+
+    def _build(self, dataset, column: int) -> Dict[str, Bitmap]:
+        """
+        Build the bitmaps of one column.
+        """
+        nbytes = (self.size + 7) // 8
+        buffers: Dict[Union[int, str], bytearray] = {}
+        for i, value in _column_values(dataset, column):
+            buf = buffers.get(value)
+            if buf is None:
+                buf = buffers[value] = bytearray(nbytes)
+            buf[i >> 3] |= 1 << (i & 7)
+
+        decode = _decoder(dataset, column)
+        return {decode(value): Bitmap.from_bytes(buf)
+                for value, buf in buffers.items()}
+
+    def appended(self, dataset, tail: ColumnarDataset) -> 'BitmapIndex':
+        """
+        Return the index of ``dataset``: the rows of this index followed by
+        the rows of ``tail``.
+
+        Only the rows of ``tail`` are read; their bits are added to copies
+        of this index's bitmaps, which are left unchanged.
+
+        Args:
+            dataset: The rows of this index followed by those of ``tail``.
+            tail (ColumnarDataset): The appended rows.
+
+        Returns:
+            BitmapIndex: The index of ``dataset``.
+        """
+        index = copy.copy(self)
+        index.size = len(dataset)
+        index.bitmaps = {}
+        for column, bitmaps in self.bitmaps.items():
+            added: Dict[Union[int, str], List[int]] = {}
+            for i, value in _column_values(tail, column):
+                added.setdefault(value, []).append(self.size + i)
+            merged = dict(bitmaps)
+            decode = _decoder(tail, column)
+            for value, positions in added.items():
+                text = decode(value)
+                bitmap = Bitmap.from_positions(positions)
+                merged[text] = bitmap if text not in merged else \
+                    merged[text] | bitmap
+            index.bitmaps[column] = merged
+        return index
+
+    def match(self, filters: Dict) -> Bitmap:
+        """
+        Return the rows matching every filter.
+
+        Args:
+            filters (Dict): Column name or alias to expected value.
+
+        Returns:
+            Bitmap: The positions of the matching rows.
+
+        Raises:
+            ValueError: If a filter targets a column that is not indexed.
+        """
+        result: Optional[Bitmap] = None
+        for name, value in sorted(filters.items(),
+                                  key=lambda item: str(item[0])):
+            column = resolve_field(name, self.header)
+            if column not in self.bitmaps:
+                raise ValueError("Column {!r} is not indexed.".format(name))
+            bitmap = self.bitmaps[column].get(str(value), Bitmap())
+            result = bitmap if result is None else result & bitmap
+            if not len(result):
+                break
+        return result if result is not None else Bitmap.full(self.size)
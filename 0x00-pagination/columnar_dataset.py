@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Columnar Dataset
+
+This module defines a compact, column-oriented store for the popular baby
+names dataset. Integer columns are kept in typed arrays and the low
+cardinality text columns are dictionary-encoded, so a row costs a few bytes
+instead of a Python list holding six string objects. Rows are only turned
+back into lists when a page of them is requested.
+"""
+import csv
+from array import array
+from operator import itemgetter
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List,
+    Optional, Sequence, Union,
+)
+
+if TYPE_CHECKING:
+    from typing_extensions import Protocol
+else:
+    # typing.Protocol needs Python 3.8; only type checkers use it here.
+    Protocol = object
+
+
+HEADER = (
+    "Year of Birth", "Gender", "Ethnicity",
+    "Child's First Name", "Count", "Rank",
+)
+INT_COLUMNS = frozenset(("Year of Birth", "Count", "Rank"))
+ALIASES = {
+    "year": "Year of Birth",
+    "gender": "Gender",
+    "ethnicity": "Ethnicity",
+    "name": "Child's First Name",
+    "count": "Count",
+    "rank": "Rank",
+}
+
+
+class Dataset(Protocol):
+    """
+    What the pagination servers need of a dataset: its number of rows, and
+    its rows by position or slice, each a list of CSV values.
+
+    Every storage backend's dataset has this shape, as does a plain list
+    of rows.
+    """
+
+    def __len__(self) -> int:
+        ...
+
+    def __getitem__(self, key: Any) -> Any:
+        ...
+
+
+def resolve_field(name: str, header: Sequence[str] = HEADER) -> int:
+    """
+    Return the position of a column given its CSV name or short alias.
+
+    Args:
+        name (str): A CSV column name, or a key of ``ALIASES``.
+        header (Sequence[str]): The CSV column names.
+
+    Returns:
+        int: The position of the column in ``header``.
+
+    Raises:
+        ValueError: If the name matches no column.
+    """
+    try:
+        return list(header).index(ALIASES.get(name, name))
+    except ValueError:
+        raise ValueError("Unknown dataset field: {!r}".format(name))
+
+
+def resolve_fields(fields: Sequence[str],
+                   header: Sequence[str] = HEADER) -> List[int]:
+    """
+    Return the positions of the columns named in a projection.
+
+    Args:
+        fields (Sequence[str]): CSV column names or aliases, in output
+        order.
+        header (Sequence[str]): The CSV column names.
+
+    Returns:
+        List[int]: The column positions, in the order of ``fields``.
+
+    Raises:
+        ValueError: If a name matches no column.
+    """
+    return [resolve_field(name, header) for name in fields]
+
+
+def take_rows(dataset, positions: Sequence[int],
+              columns: Optional[Sequence[int]] = None) -> List[List[str]]:
+    """
+    Return the rows of any dataset at ``positions``, optionally projected.
+
+    A ColumnarDataset decodes only the requested columns; other datasets
+    decode whole rows, which are then cut down.
+
+    Args:
+        dataset: A dataset supporting ``len()`` and indexing.
+        positions (Sequence[int]): Row positions, in output order.
+        columns (Sequence[int]): The columns wanted, all when omitted.
+
+    Returns:
+        List[List[str]]: The rows.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        return dataset.take(positions, columns)
+    return project([dataset[i] for i in positions], columns)
+
+
+def slice_rows(dataset, start: int, end: int,
+               columns: Optional[Sequence[int]] = None) -> List[List[str]]:
+    """
+    Return the rows of any dataset in ``[start, end)``, optionally
+    projected.
+
+    Args:
+        dataset: A dataset supporting ``len()`` and slicing.
+        start (int): The first row position.
+        end (int): The position after the last row.
+        columns (Sequence[int]): The columns wanted, all when omitted.
+
+    Returns:
+        List[List[str]]: The rows.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        return dataset.rows(start, end, columns)
+    return project(dataset[start:end], columns)
+
+
+def project(rows: List[List[str]],
+            columns: Optional[Sequence[int]] = None) -> List[List[str]]:
+    """
+    Cut decoded rows down to some of their columns.
+
+    Args:
+        rows (List[List[str]]): Whole rows.
+        columns (Sequence[int]): The columns wanted, all when omitted.
+
+    Returns:
+        List[List[str]]: The projected rows, or ``rows`` itself when no
+        projection is asked for.
+    """
+    if columns is None:
+        return rows
+    if len(columns) == 1:
+        column = columns[0]
+        return [[row[column]] for row in rows]
+    return list(map(list, map(itemgetter(*columns), rows)))
+
+
+def scan_column(dataset, column: int, batch: int = 65536) -> Iterator[str]:
+    """
+    Yield the values of one column of any dataset, in row order.
+
+    Rows are decoded ``batch`` at a time through slicing, so this works for
+    row-oriented datasets that cannot expose their columns directly.
+
+    Args:
+        dataset: A dataset supporting ``len()`` and slicing.
+        column (int): The position of the column.
+        batch (int): The number of rows decoded per slice.
+    """
+    for start in range(0, len(dataset), batch):
+        for row in dataset[start:start + batch]:
+            yield row[column]
+
+
+# The integers of a column: an array, or for columns mapped from a
+# snapshot a read-only memoryview. Only arrays are ever written to, which
+# a Union can't tell the type checker, so the buffer is typed Any.
+IntBuffer = Any
+
+
+class IntColumn:
+    """
+    A column of signed integers backed by a typed array.
+    """
+
+    def __init__(self, values: Optional[IntBuffer] = None):
+        """
+        Initializes the column, optionally from existing values.
+
+        Args:
+            values (IntBuffer): Initial values, an ``array('i')`` or a
+            memoryview cast to ``'i'``.
+        """
+        self.values: IntBuffer = values if values is not None else array('i')
+
+    def append(self, value: str) -> None:
+        """
+        Parse a CSV cell and append it to the column.
+
+        Args:
+            value (str): The textual integer read from the CSV file.
+        """
+        self.values.append(int(value))
+
+    def extend(self, other: 'IntColumn') -> None:
+        """
+        Append every value of another integer column.
+
+        Args:
+            other (IntColumn): The column to copy values from.
+        """
+        self.values.extend(other.values)
+
+    def get(self, i: int) -> str:
+        """
+        Decode a single cell back into its CSV representation.
+
+        Args:
+            i (int): The row position.
+
+        Returns:
+            str: The cell value as it appeared in the CSV file.
+        """
+        return str(self.values[i])
+
+    def take(self, positions: Sequence[int]) -> List[str]:
+        """
+        Decode the cells at ``positions`` in one pass.
+
+        Args:
+            positions (Sequence[int]): Row positions, in output order.
+
+        Returns:
+            List[str]: The cell values.
+        """
+        return list(map(str, map(self.values.__getitem__, positions)))
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows held by the column.
+        """
+        return len(self.values)
+
+    def nbytes(self) -> int:
+        """
+        Return the number of bytes used by the column buffer.
+        """
+        return len(self.values) * self.values.itemsize
+
+
+class DictColumn:
+    """
+    A dictionary-encoded text column.
+
+    Each distinct string is stored once in ``values`` and rows only keep a
+    small integer code. The code array starts as unsigned bytes and is
+    widened automatically when the dictionary outgrows it.
+    """
+
+    WIDTHS = (('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF))
+
+    def __init__(self, values: Optional[List[str]] = None,
+                 codes: Optional[IntBuffer] = None):
+        """
+        Initializes the column, optionally from an existing dictionary.
+
+        Args:
+            values (List[str]): The distinct strings, indexed by code.
+            codes (IntBuffer): The per-row codes into ``values``.
+        """
+        self.values = values if values is not None else []
+        self.codes: IntBuffer = codes if codes is not None else array('B')
+        self.lookup: Optional[Dict[str, int]] = None
+
+    def encode(self, value: str) -> int:
+        """
+        Return the code for a value, adding it to the dictionary if needed.
+
+        Args:
+            value (str): The text to encode.
+
+        Returns:
+            int: The code assigned to ``value``.
+        """
+        if self.lookup is None:
+            # Built on first write only, so read-only columns attached from
+            # a snapshot never pay for it.
+            self.lookup = {v: code for code, v in enumerate(self.values)}
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[value] = code
+            self._widen(code)
+        return code
+
+    def _widen(self, code: int) -> None:
+        """
+        Grow the code array type so that it can hold ``code``.
+        """
+        for typecode, limit in self.WIDTHS:
+            if code <= limit:
+                if self.codes.typecode != typecode and \
+                        self.codes.itemsize < array(typecode).itemsize:
+                    self.codes = array(typecode, self.codes)
+                return
+
+    def append(self, value: str) -> None:
+        """
+        Encode a CSV cell and append it to the column.
+
+        Args:
+            value (str): The text read from the CSV file.
+        """
+        code = self.encode(value)
+        self.codes.append(code)
+
+    def extend(self, other: 'DictColumn') -> None:
+        """
+        Append every cell of another dictionary-encoded column.
+
+        The other column's codes are translated into this column's
+        dictionary, which gains any value it did not hold yet.
+
+        Args:
+            other (DictColumn): The column to copy cells from.
+        """
+        table = [self.encode(value) for value in other.values]
+        if table == list(range(len(table))) and \
+                self.codes.typecode == other.codes.typecode:
+            self.codes.extend(other.codes)
+        else:
+            self.codes.extend(array(self.codes.typecode,
+                                    map(table.__getitem__, other.codes)))
+
+    def get(self, i: int) -> str:
+        """
+        Decode a single cell.
+
+        Args:
+            i (int): The row position.
+
+        Returns:
+            str: The original text of the cell.
+        """
+        return self.values[self.codes[i]]
+
+    def take(self, positions: Sequence[int]) -> List[str]:
+        """
+        Decode the cells at ``positions`` in one pass.
+
+        Args:
+            positions (Sequence[int]): Row positions, in output order.
+
+        Returns:
+            List[str]: The cell texts.
+        """
+        return list(map(self.values.__getitem__,
+                        map(self.codes.__getitem__, positions)))
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows held by the column.
+        """
+        return len(self.codes)
+
+    def nbytes(self) -> int:
+        """
+        Return the approximate number of bytes used by the column.
+        """
+        return len(self.codes) * self.codes.itemsize + \
+            sum(len(value) for value in self.values)
+
+
+Column = Union[IntColumn, DictColumn]
+
+
+class ColumnarDataset:
+    """
+    Column-oriented, read-mostly store for the baby names dataset.
+
+    The object behaves like the list of rows it replaces: it supports
+    ``len()``, integer indexing and slicing, and each row comes back as a
+    ``List[str]`` identical to what ``csv.reader`` would have produced.
+    """
+
+    def __init__(self, header: Sequence[str] = HEADER,
+                 columns: Optional[List[Column]] = None):
+        """
+        Initializes an empty dataset, or wraps existing columns.
+
+        Args:
+            header (Sequence[str]): The CSV column names.
+            columns (List[Column]): Prebuilt columns matching ``header``.
+        """
+        self.header = tuple(header)
+        if columns is None:
+            columns = [
+                IntColumn() if name in INT_COLUMNS else DictColumn()
+                for name in self.header
+            ]
+        self.columns = columns
+        # Auxiliary arrays (such as sort permutations) persisted with the
+        # dataset in its snapshot, keyed by name.
+        self.extras: Dict[str, IntBuffer] = {}
+        # Called without arguments to persist extras added after loading;
+        # set when the dataset comes from a snapshot.
+        self.persist_extras: Optional[Callable[[], None]] = None
+        # The ``source_key`` of the CSV file the dataset was built from; set
+        # when the dataset is loaded from or saved to a snapshot.
+        self.source: Optional[Dict] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[str]],
+                  header: Sequence[str] = HEADER) -> 'ColumnarDataset':
+        """
+        Build a dataset from an iterable of CSV rows.
+
+        Args:
+            rows (Iterable[Sequence[str]]): Rows without the header line.
+            header (Sequence[str]): The CSV column names.
+
+        Returns:
+            ColumnarDataset: The encoded dataset.
+        """
+        dataset = cls(header)
+        dataset.extend(rows)
+        return dataset
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'ColumnarDataset':
+        """
+        Parse a CSV file into a columnar dataset.
+
+        Args:
+            path (str): The path of the CSV file, header line included.
+
+        Returns:
+            ColumnarDataset: The encoded dataset.
+        """
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, HEADER)
+            return cls.from_rows(reader, header)
+
+    def extend_columns(self, other: 'ColumnarDataset') -> None:
+        """
+        Append the rows of another dataset with the same header.
+
+        Args:
+            other (ColumnarDataset): The dataset to copy rows from.
+        """
+        for column, source in zip(self.columns, other.columns):
+            if isinstance(column, IntColumn) and \
+                    isinstance(source, IntColumn):
+                column.extend(source)
+            elif isinstance(column, DictColumn) and \
+                    isinstance(source, DictColumn):
+                column.extend(source)
+            else:
+                raise ValueError("Cannot extend a column with a column of "
+                                 "another kind.")
+
+    def extend(self, rows: Iterable[Sequence[str]]) -> None:
+        """
+        Append rows to the dataset.
+
+        Args:
+            rows (Iterable[Sequence[str]]): Rows without the header line.
+        """
+        appenders = [column.append for column in self.columns]
+        for row in rows:
+            for append, value in zip(appenders, row):
+                append(value)
+
+    def row(self, i: int) -> List[str]:
+        """
+        Materialize a single row.
+
+        Args:
+            i (int): The row position.
+
+        Returns:
+            List[str]: The row as read from the CSV file.
+        """
+        return [column.get(i) for column in self.columns]
+
+    def rows(self, start: int, end: int,
+             columns: Optional[Sequence[int]] = None) -> List[List[str]]:
+        """
+        Materialize the rows in ``[start, end)``.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+            columns (Sequence[int]): The positions of the columns to
+            decode, in output order; all columns when omitted.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        end = min(end, len(self))
+        return self.take(range(start, end), columns)
+
+    def take(self, positions: Sequence[int],
+             columns: Optional[Sequence[int]] = None) -> List[List[str]]:
+        """
+        Materialize the rows at ``positions``, optionally projected.
+
+        Cells are decoded a column at a time and only the requested
+        columns are read, so narrow projections cost proportionally less.
+
+        Args:
+            positions (Sequence[int]): Row positions, in output order.
+            columns (Sequence[int]): The positions of the columns to
+            decode, in output order; all columns when omitted.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        sources = self.columns if columns is None \
+            else [self.columns[c] for c in columns]
+        return list(map(list, zip(*[column.take(positions)
+                                    for column in sources])))
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows in the dataset.
+        """
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, key: Union[int, slice]):
+        """
+        Return a row, or a list of rows for a slice.
+
+        Args:
+            key (Union[int, slice]): A row position or a slice of positions.
+
+        Returns:
+            The materialized row or rows.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.rows(start, stop)
+            return [self.row(i) for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("dataset index out of range")
+        return self.row(key)
+
+    def __iter__(self):
+        """
+        Iterate over the materialized rows.
+        """
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def nbytes(self) -> int:
+        """
+        Return the approximate number of bytes held by the column buffers.
+        """
+        return sum(column.nbytes() for column in self.columns)
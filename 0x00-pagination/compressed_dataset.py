@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Block-compressed dataset
+
+This module reads the baby names CSV from a gzip, bz2 or xz file written as
+a series of independently compressed blocks. Each block is a complete
+compressed member holding whole rows, so the file stays readable by the
+standard tools (``zcat``, ``bzcat``, ``xzcat``) while a page only needs
+the blocks that cover its rows decompressed.
+
+A block index sidecar next to the compressed file records where every
+block starts and which rows it holds. It is rebuilt by scanning the file
+when missing or stale; any multi-member file can be indexed this way, but
+a file compressed as a single member is a single block.
+
+Usage, to write a block-compressed copy of a CSV file:
+    python3 compressed_dataset.py Popular_Baby_Names.csv --codec xz
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+# codec name: (file suffix, compress, streaming decompressor factory)
+CODECS: Dict[str, Tuple[str, Callable, Callable]] = {
+    "gzip": (".gz", gzip.compress,
+             lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+    "bz2": (".bz2", bz2.compress, bz2.BZ2Decompressor),
+    "xz": (".xz", lzma.compress, lzma.LZMADecompressor),
+}
+ROWS_PER_BLOCK = 1024
+READ_SIZE = 1 << 20
+
+
+def codec_for(path: str) -> Union[str, None]:
+    """
+    Return the codec of a compressed file from its suffix.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        Union[str, None]: A key of ``CODECS``, or None for other files.
+    """
+    for name, (suffix, _, _) in CODECS.items():
+        if path.endswith(suffix):
+            return name
+    return None
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """
+    Decompress every member found in ``data``.
+
+    Args:
+        codec (str): A key of ``CODECS``.
+        data (bytes): One or more complete compressed members.
+
+    Returns:
+        bytes: The concatenated uncompressed contents.
+    """
+    factory = CODECS[codec][2]
+    parts = []
+    while data:
+        decompressor = factory()
+        parts.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            raise ValueError("Truncated {} block.".format(codec))
+        data = decompressor.unused_data
+    return b"".join(parts)
+
+
+class BlockIndex:
+    """
+    Positions of the compressed blocks of a file.
+
+    Block ``b`` spans bytes ``offsets[b]:offsets[b + 1]`` of the file and
+    holds data rows ``first_rows[b]:first_rows[b + 1]``. The header line is
+    the first line of block 0 and is not counted as a row.
+    """
+
+    MAGIC = b"PGBX"
+    VERSION = 1
+    SUFFIX = ".bidx"
+    # magic, format version, source size, source mtime (ns), block count
+    HEADER = struct.Struct("<4sIqqq")
+
+    def __init__(self, offsets: Union[array, memoryview],
+                 first_rows: Union[array, memoryview]):
+        """
+        Initializes the index.
+
+        Args:
+            offsets (Union[array, memoryview]): Block start offsets followed
+            by the file size.
+            first_rows (Union[array, memoryview]): The first row of every
+            block followed by the row count.
+        """
+        self.offsets = offsets
+        self.first_rows = first_rows
+
+    def __len__(self) -> int:
+        """
+        Return the number of blocks.
+        """
+        return len(self.offsets) - 1
+
+    @property
+    def rows(self) -> int:
+        """
+        Return the number of indexed data rows.
+        """
+        return self.first_rows[-1]
+
+    def block_of(self, row: int) -> int:
+        """
+        Return the block holding a data row.
+
+        Args:
+            row (int): A row position, ``0 <= row < self.rows``.
+
+        Returns:
+            int: The block number.
+        """
+        return bisect_right(self.first_rows, row, 0, len(self)) - 1
+
+    @classmethod
+    def build(cls, path: str, codec: Optional[str] = None) -> 'BlockIndex':
+        """
+        Scan a compressed file member by member and index its blocks.
+
+        Members are decompressed in a streaming fashion and their lines
+        counted, so memory use stays bounded. A member that does not end
+        on a line boundary is merged with the next one into one block.
+
+        Args:
+            path (str): The compressed file.
+            codec (str): A key of ``CODECS``, guessed from the suffix when
+            omitted.
+
+        Returns:
+            BlockIndex: The index of the file's blocks.
+        """
+        codec = codec or codec_for(path)
+        if codec is None or codec not in CODECS:
+            raise ValueError("Unknown compression for {!r}.".format(path))
+        factory = CODECS[codec][2]
+        offsets = array('q', [0])
+        first_rows = array('q', [0])
+        lines = 0
+        last = b"\n"
+        # File offset of the start of ``data``.
+        position = 0
+        decompressor = factory()
+        with open(path, "rb") as f:
+            data = f.read(READ_SIZE)
+            while data:
+                chunk = decompressor.decompress(data)
+                if chunk:
+                    lines += chunk.count(b"\n")
+                    last = chunk[-1:]
+                if not decompressor.eof:
+                    position += len(data)
+                    data = f.read(READ_SIZE)
+                    continue
+                unused = decompressor.unused_data
+                position += len(data) - len(unused)
+                if last == b"\n":
+                    offsets.append(position)
+                    first_rows.append(max(lines - 1, 0))
+                decompressor = factory()
+                data = unused or f.read(READ_SIZE)
+        if position != offsets[-1]:
+            if last != b"\n":
+                lines += 1
+            offsets.append(position)
+            first_rows.append(max(lines - 1, 0))
+        return cls(offsets, first_rows)
+
+    @classmethod
+    def sidecar_path(cls, path: str) -> str:
+        """
+        Return the path of the sidecar index of a compressed file.
+
+        Args:
+            path (str): The compressed file path.
+
+        Returns:
+            str: The sidecar file path.
+        """
+        return path + cls.SUFFIX
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to the sidecar file of a compressed file.
+
+        Args:
+            path (str): The compressed file the index describes.
+        """
+        stat = os.stat(path)
+        target = self.sidecar_path(path)
+        tmp = "{}.{}.tmp".format(target, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_size,
+                                     stat.st_mtime_ns, len(self)))
+            array('q', self.offsets).tofile(f)
+            array('q', self.first_rows).tofile(f)
+        os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path: str) -> Union['BlockIndex', None]:
+        """
+        Memory-map the sidecar index of a compressed file if still valid.
+
+        Args:
+            path (str): The compressed file path.
+
+        Returns:
+            BlockIndex: The index, or None when the sidecar is missing or
+            was built for a different version of the file.
+        """
+        stat = os.stat(path)
+        try:
+            f = open(cls.sidecar_path(path), "rb")
+        except OSError:
+            return None
+        with f:
+            header = f.read(cls.HEADER.size)
+            if len(header) != cls.HEADER.size:
+                return None
+            magic, version, size, mtime, blocks = cls.HEADER.unpack(header)
+            if (magic, version, size, mtime) != \
+                    (cls.MAGIC, cls.VERSION, stat.st_size, stat.st_mtime_ns):
+                return None
+            expected = cls.HEADER.size + 2 * (blocks + 1) * 8
+            if os.fstat(f.fileno()).st_size != expected:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)[cls.HEADER.size:].cast('q')
+        return cls(view[:blocks + 1], view[blocks + 1:])
+
+    @classmethod
+    def load_or_build(cls, path: str) -> 'BlockIndex':
+        """
+        Load the sidecar index of a compressed file, rebuilding it if stale.
+
+        Args:
+            path (str): The compressed file path.
+
+        Returns:
+            BlockIndex: A valid index for the current file contents.
+        """
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        return index
+
+
+def write(source: str, target: Optional[str] = None, codec: str = "gzip",
+          rows_per_block: int = ROWS_PER_BLOCK) -> str:
+    """
+    Write a block-compressed copy of a CSV file, with its block index.
+
+    The header line is a block of its own, followed by blocks of
+    ``rows_per_block`` rows.
+
+    Args:
+        source (str): The CSV file to compress.
+        target (str): The output path, ``source`` plus the codec's suffix
+        when omitted.
+        codec (str): A key of ``CODECS``.
+        rows_per_block (int): The number of rows per block; smaller blocks
+        make pages cheaper to decode but compress less well.
+
+    Returns:
+        str: The path of the written file.
+    """
+    suffix, compress, _ = CODECS[codec]
+    target = target or source + suffix
+    tmp = "{}.{}.tmp".format(target, os.getpid())
+    offsets = array('q', [0])
+    first_rows = array('q', [0])
+    with open(source, "rb") as src, open(tmp, "wb") as out:
+        def add(lines: List[bytes], rows: int) -> None:
+            out.write(compress(b"".join(lines)))
+            offsets.append(out.tell())
+            first_rows.append(first_rows[-1] + rows)
+
+        add([src.readline()], 0)
+        block = []
+        for line in src:
+            block.append(line if line.endswith(b"\n") else line + b"\n")
+            if len(block) == rows_per_block:
+                add(block, len(block))
+                block = []
+        if block:
+            add(block, len(block))
+    os.replace(tmp, target)
+    BlockIndex(offsets, first_rows).save(target)
+    return target
+
+
+class CompressedDataset:
+    """
+    A read-only dataset decoding rows from a block-compressed CSV file.
+
+    Decoded blocks are kept in a small LRU cache, so consecutive pages of
+    the same block decompress it once.
+    """
+
+    BLOCK_CACHE = 8
+
+    def __init__(self, path: str, index: Optional[BlockIndex] = None,
+                 codec: Optional[str] = None):
+        """
+        Initializes the dataset over a compressed CSV file.
+
+        Args:
+            path (str): The compressed file path.
+            index (BlockIndex): A prebuilt block index; loaded from (or
+            saved to) the sidecar file when omitted.
+            codec (str): A key of ``CODECS``, guessed from the suffix when
+            omitted.
+        """
+        codec = codec or codec_for(path)
+        if codec is None or codec not in CODECS:
+            raise ValueError("Unknown compression for {!r}.".format(path))
+        self.path = path
+        self.codec = codec
+        if index is None:
+            index = BlockIndex.load_or_build(path)
+        self.index = index
+        self.__fd = os.open(path, os.O_RDONLY)
+        self.__blocks: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+        self.header: Tuple[str, ...] = ()
+        if len(index):
+            self.block(0)
+
+    def block(self, number: int) -> List[List[str]]:
+        """
+        Return the decoded data rows of a block.
+
+        Args:
+            number (int): The block number.
+
+        Returns:
+            List[List[str]]: The rows, without the header line.
+        """
+        with self.__lock:
+            rows = self.__blocks.get(number)
+            if rows is not None:
+                self.__blocks.move_to_end(number)
+                return rows
+        offsets = self.index.offsets
+        start, end = offsets[number], offsets[number + 1]
+        text = decompress(self.codec, os.pread(self.__fd, end - start, start))
+        rows = list(csv.reader(io.StringIO(text.decode("utf-8"),
+                                           newline="")))
+        if number == 0 and rows:
+            self.header = tuple(rows.pop(0))
+        with self.__lock:
+            self.__blocks[number] = rows
+            while len(self.__blocks) > self.BLOCK_CACHE:
+                self.__blocks.popitem(last=False)
+        return rows
+
+    def rows(self, start: int, end: int) -> List[List[str]]:
+        """
+        Decode the rows in ``[start, end)``, touching only their blocks.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return []
+        first_rows = self.index.first_rows
+        result = []
+        number = self.index.block_of(start)
+        while start < end:
+            base = first_rows[number]
+            stop = min(end, first_rows[number + 1])
+            if stop > start:
+                result.extend(self.block(number)[start - base:stop - base])
+                start = stop
+            number += 1
+        return result
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows in the dataset.
+        """
+        return self.index.rows
+
+    def __getitem__(self, key: Union[int, slice]):
+        """
+        Return a row, or a list of rows for a slice.
+
+        Args:
+            key (Union[int, slice]): A row position or a slice of positions.
+
+        Returns:
+            The decoded row or rows.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.rows(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("dataset index out of range")
+        return self.rows(key, key + 1)[0]
+
+    def __iter__(self):
+        """
+        Iterate over the decoded rows, one block at a time.
+        """
+        for number in range(len(self.index)):
+            yield from self.block(number)
+
+    def close(self) -> None:
+        """
+        Release the underlying file.
+        """
+        os.close(self.__fd)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Write a block-compressed copy of a CSV file.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Block-compress a CSV file")
+    parser.add_argument("source")
+    parser.add_argument("--output")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="gzip")
+    parser.add_argument("--rows-per-block", type=int, default=ROWS_PER_BLOCK)
+    args = parser.parse_args(argv)
+    target = write(args.source, args.output, args.codec, args.rows_per_block)
+    print("{}: {} bytes".format(target, os.path.getsize(target)))
+
+
+if __name__ == "__main__":
+    main()
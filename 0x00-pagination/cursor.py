@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Opaque pagination cursors
+
+This module encodes keyset pagination cursors as signed, URL-safe tokens.
+A cursor carries the key of the row a page stopped at and the dataset
+version it was issued for; an HMAC-SHA256 tag stops clients from forging
+or editing cursors, and the encoding keeps their content opaque.
+
+The signing secret comes from the PAGINATION_CURSOR_SECRET environment
+variable, so that every worker behind a load balancer accepts the cursors
+the others issued. Without it a random per-process secret is used.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import struct
+from typing import Tuple
+
+
+DEFAULT_SECRET = os.environ.get("PAGINATION_CURSOR_SECRET", "").encode() \
+    or os.urandom(32)
+# format version, row key, dataset version
+PAYLOAD = struct.Struct("<Bqq")
+FORMAT = 1
+TAG_SIZE = 16
+
+
+def _sign(payload: bytes, secret: bytes) -> bytes:
+    """
+    Return the truncated HMAC tag of a payload.
+    """
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+def encode_cursor(key: int, version: int,
+                  secret: bytes = DEFAULT_SECRET) -> str:
+    """
+    Build a signed cursor token.
+
+    Args:
+        key (int): The row key the cursor points at.
+        version (int): The dataset version the cursor was issued for.
+        secret (bytes): The signing secret.
+
+    Returns:
+        str: The URL-safe token.
+    """
+    payload = PAYLOAD.pack(FORMAT, key, version)
+    token = base64.urlsafe_b64encode(payload + _sign(payload, secret))
+    return token.rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str,
+                  secret: bytes = DEFAULT_SECRET) -> Tuple[int, int]:
+    """
+    Verify a cursor token and return its content.
+
+    Args:
+        token (str): A token made by ``encode_cursor``.
+        secret (bytes): The signing secret.
+
+    Returns:
+        Tuple[int, int]: The row key and the dataset version.
+
+    Raises:
+        ValueError: If the token is malformed or its signature is wrong.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("Malformed pagination cursor.")
+    payload, tag = raw[:PAYLOAD.size], raw[PAYLOAD.size:]
+    if len(payload) != PAYLOAD.size or \
+            not hmac.compare_digest(tag, _sign(payload, secret)):
+        raise ValueError("Invalid pagination cursor.")
+    fmt, key, version = PAYLOAD.unpack(payload)
+    if fmt != FORMAT:
+        raise ValueError("Unsupported pagination cursor format.")
+    return key, version
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Versioned, append-aware datasets
+
+This module tracks the dataset loaded from a data file as a series of
+immutable versions. When the file has only grown since a version was
+loaded, the next version is built by parsing just the appended tail and
+laying it after the rows already loaded, and the indexes of the loaded
+rows are extended with the tail instead of being rebuilt; any other
+change reloads the file. A version never changes once published, so a
+reader holding one keeps a consistent view while newer versions replace
+it.
+"""
+import csv
+import io
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from columnar_dataset import HEADER, ColumnarDataset, Dataset
+from compressed_dataset import codec_for
+from sharded_dataset import ConcatDataset, Source, fingerprint, is_sharded
+from storage import open_dataset
+
+# Bytes before the end of the parsed data that must be unchanged for a
+# change to count as an append.
+SAMPLE_SIZE = 64
+
+
+def read_tail(path: str, offset: int) -> Tuple[List[List[str]], int]:
+    """
+    Parse the complete lines written to a CSV file after ``offset``.
+
+    A last line still missing its newline is left for a later read.
+
+    Args:
+        path (str): The CSV file.
+        offset (int): Where the new data starts, at a line boundary.
+
+    Returns:
+        Tuple[List[List[str]], int]: The new rows and the offset after the
+        last complete line.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    cut = data.rfind(b"\n") + 1
+    text = data[:cut].decode("utf-8")
+    rows = [row for row in csv.reader(io.StringIO(text, newline="")) if row]
+    return rows, offset + cut
+
+
+def read_sample(path: str, end: int) -> bytes:
+    """
+    Return the bytes that precede ``end`` in a file.
+    """
+    start = max(end - SAMPLE_SIZE, 0)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+class DatasetVersion:
+    """
+    One published version of a dataset and the indexes built over it.
+
+    The rows are the ``base`` dataset loaded from the source, followed by
+    the ``tail`` of rows appended to it since, if any. A version with a
+    tail keeps the ``origin`` version that loaded the base, whose indexes
+    it extends with the tail rows.
+    """
+
+    def __init__(self, number: int, base: Dataset, stamp: Tuple,
+                 end: Optional[int] = None,
+                 sample: bytes = b"", tail: Optional[ColumnarDataset] = None,
+                 origin: Optional['DatasetVersion'] = None):
+        """
+        Initializes a version.
+
+        Args:
+            number (int): The version number.
+            base (Dataset): The rows loaded in full.
+            stamp (Tuple): The source fingerprint the rows match.
+            end (int): The byte offset after the last parsed line, or None
+            when the source cannot be extended in place.
+            sample (bytes): The bytes just before ``end``.
+            tail (ColumnarDataset): The rows parsed from appended lines.
+            origin (DatasetVersion): The version holding just ``base``.
+        """
+        self.number = number
+        self.base = base
+        self.tail = tail
+        self.origin = origin
+        self.dataset: Dataset = base if tail is None else \
+            ConcatDataset([base, tail])
+        self.stamp = stamp
+        self.end = end
+        self.sample = sample
+        self.indexes: Dict[Callable, object] = {}
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def load(cls, source: Source, backend: str = "memory",
+             number: int = 0) -> 'DatasetVersion':
+        """
+        Load a data source in full.
+
+        The source is stat'ed before and after loading, and loaded again
+        if it changed meanwhile, so the recorded fingerprint and end offset
+        always match the rows.
+
+        Args:
+            source (Source): A CSV file, a compressed copy, or shards.
+            backend (str): The storage backend.
+            number (int): The version number.
+
+        Returns:
+            DatasetVersion: The loaded version.
+        """
+        while True:
+            stamp = fingerprint(source)
+            dataset = open_dataset(source, backend)
+            if fingerprint(source) == stamp:
+                break
+        if isinstance(source, str) and not is_sharded(source) and \
+                not codec_for(source):
+            return cls(number, dataset, stamp, stamp[0],
+                       read_sample(source, stamp[0]))
+        return cls(number, dataset, stamp)
+
+    def index(self, factory: Callable):
+        """
+        Return an index over this version, building it once on first use.
+
+        Index classes with an ``appended`` method are built over the base
+        rows once, by the origin version, and each later version extends
+        that index with its tail rows rather than scanning every row.
+
+        Args:
+            factory (Callable): The index class, called with the dataset.
+
+        Returns:
+            The index.
+        """
+        index = self.indexes.get(factory)
+        if index is None:
+            with self.__lock:
+                index = self.indexes.get(factory)
+                if index is None:
+                    index = self.__build(factory)
+                    self.indexes[factory] = index
+        return index
+
+    def __build(self, factory: Callable):
+        """
+        Build an index over this version.
+        """
+        if self.origin is None or self.tail is None or \
+                not hasattr(factory, "appended"):
+            return factory(self.dataset)
+        return self.origin.index(factory).appended(self.dataset, self.tail)
+
+    def next(self, source: Source,
+             backend: str = "memory") -> Union['DatasetVersion', None]:
+        """
+        Build the version following this one if the source changed.
+
+        Appended lines are parsed on their own and added after the current
+        rows; the source is reloaded in full when it shrank, was rewritten
+        (even in place, at the same size), or cannot be extended in place.
+
+        Args:
+            source (Source): The data source this version was loaded from.
+            backend (str): The storage backend.
+
+        Returns:
+            Union[DatasetVersion, None]: The new version, or None when
+            there is nothing new to publish yet.
+        """
+        stamp = fingerprint(source)
+        if stamp == self.stamp:
+            return None
+        if self.end is None or not isinstance(source, str) or \
+                stamp[0] <= self.end or \
+                not self.sample.endswith(b"\n") or \
+                read_sample(source, self.end) != self.sample:
+            return self.load(source, backend, self.number + 1)
+        rows, end = read_tail(source, self.end)
+        if not rows:
+            return None
+        if self.tail is not None:
+            rows = list(self.tail) + rows
+        tail = ColumnarDataset.from_rows(
+            rows, getattr(self.base, "header", HEADER))
+        return DatasetVersion(self.number + 1, self.base, stamp, end,
+                              read_sample(source, end), tail,
+                              self.origin or self)
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+External merge sort for ordered pagination
+
+This module sorts a dataset by a column without holding it in memory. Rows
+are read in order and collected into runs of at most a memory budget's
+worth of rows; each run is sorted and spilled to a temporary file, and the
+runs are then merged k ways into a sorted CSV file, in several passes when
+there are more runs than ``MAX_FAN_IN``. The sorted file is served by an
+MmapDataset through its row offset index, so any page of the ordered view
+is one contiguous read.
+
+The merge also writes the sort permutation (the original position of
+every sorted row) and its inverse, the rank of every original row, as
+files of 64-bit integers that are memory-mapped when used. The ranks let
+a subset of rows, such as the rows matching a filter, be sorted in memory
+proportional to the subset.
+
+The order is the one SortIndex uses: ascending by the column's sort key,
+ties kept in file order, descending views walking the ascending order
+backwards.
+
+Usage, to write a copy of a CSV file sorted by a column:
+    python3 external_sort.py Popular_Baby_Names.csv --order-by count
+"""
+import argparse
+import csv
+import heapq
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
+from array import array
+from typing import (
+    Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple,
+)
+
+from bitmap_index import Bitmap
+from columnar_dataset import HEADER
+from lazy_dataset import MmapDataset
+from sort_index import SPARSE, parse_order, value_key, walk
+
+# Bytes of rows held in memory per run while sorting.
+SORT_MEMORY = int(os.environ.get("PAGINATION_SORT_MEMORY", str(64 << 20)))
+# Where sorted files are kept; the system default when unset.
+SORT_DIR = os.environ.get("PAGINATION_SORT_DIR") or None
+# Runs merged at once; more runs are merged in several passes.
+MAX_FAN_IN = 64
+# Estimated bytes held by a buffered row beyond its text: the record
+# tuple, the row list, the key and the string headers.
+ROW_OVERHEAD = 700
+# Rows read from the dataset per slice.
+BATCH = 4096
+
+# (sort key, original position, row)
+Record = Tuple[object, int, List[str]]
+
+
+def write_run(records: Iterable[Record], path: str, batch: int) -> None:
+    """
+    Write sorted records to a run file, ``batch`` records per pickle.
+
+    The merge holds one batch of every run it reads in memory, so the
+    batch size bounds its memory use.
+
+    Args:
+        records (Iterable[Record]): The records, in order.
+        path (str): The run file to create.
+        batch (int): The number of records pickled together.
+    """
+    with open(path, "wb") as f:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == batch:
+                pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+                chunk = []
+        if chunk:
+            pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+
+
+def read_run(path: str) -> Iterator[Record]:
+    """
+    Yield the records of a run file, a batch at a time.
+
+    Args:
+        path (str): The run file.
+    """
+    with open(path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def sorted_runs(rows: Iterable[List[str]], key: Callable[[str], object],
+                column: int, directory: str,
+                memory: Optional[int] = None) -> Tuple[List[str], int]:
+    """
+    Split rows into sorted run files that each fit a memory budget.
+
+    Runs are pickled in batches small enough for ``MAX_FAN_IN`` of them
+    to fit the budget together.
+
+    Args:
+        rows (Iterable[List[str]]): The rows, in original order.
+        key (Callable[[str], object]): Maps a column value to its sort key.
+        column (int): The position of the column to sort by.
+        directory (str): Where to write the run files.
+        memory (int): The bytes of rows buffered per run, ``SORT_MEMORY``
+        when omitted.
+
+    Returns:
+        Tuple[List[str], int]: The run file paths, in original row order,
+        and the number of records per batch.
+    """
+    memory = memory or SORT_MEMORY
+    runs: List[str] = []
+    records: List[Record] = []
+    used = 0
+    batch = None
+    for position, row in enumerate(rows):
+        records.append((key(row[column]), position, row))
+        used += ROW_OVERHEAD + sum(map(len, row))
+        if used >= memory:
+            batch = batch or max(memory * len(records) // used // MAX_FAN_IN,
+                                 1)
+            records.sort()
+            runs.append(os.path.join(directory, "run-{}".format(len(runs))))
+            write_run(records, runs[-1], batch)
+            records = []
+            used = 0
+    batch = batch or max(len(records), 1)
+    if records or not runs:
+        records.sort()
+        runs.append(os.path.join(directory, "run-{}".format(len(runs))))
+        write_run(records, runs[-1], batch)
+    return runs, batch
+
+
+def merge_runs(runs: List[str], directory: str, batch: int,
+               fan_in: int = MAX_FAN_IN) -> Iterator[Record]:
+    """
+    Merge sorted run files into a single sorted stream.
+
+    While there are more than ``fan_in`` runs, groups of ``fan_in`` runs
+    are merged into new run files, which are then merged in turn. Run
+    files are deleted once merged.
+
+    Args:
+        runs (List[str]): The run file paths.
+        directory (str): Where to write intermediate runs.
+        batch (int): The records per batch of intermediate runs.
+        fan_in (int): The most runs read at once.
+
+    Yields:
+        Record: The records, in sort order.
+    """
+    level = 0
+    while len(runs) > fan_in:
+        merged: List[str] = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            path = os.path.join(directory, "merge-{}-{}".format(
+                level, len(merged)))
+            write_run(heapq.merge(*map(read_run, group)), path, batch)
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+        level += 1
+    yield from heapq.merge(*map(read_run, runs))
+    for run in runs:
+        os.remove(run)
+
+
+def sort_rows(rows: Iterable[List[str]], column: int, target: str,
+              header: Sequence[str] = HEADER, memory: Optional[int] = None,
+              directory: Optional[str] = None) -> int:
+    """
+    Write rows sorted by a column to a CSV file, with their permutation.
+
+    Besides ``target``, this writes ``target + ".perm"``, the original
+    position of every sorted row, and ``target + ".rank"``, the sorted
+    rank of every original row, both as native 64-bit integers.
+
+    Args:
+        rows (Iterable[List[str]]): The rows, in original order.
+        column (int): The position of the column to sort by.
+        target (str): The sorted CSV file to write, header line included.
+        header (Sequence[str]): The CSV column names.
+        memory (int): The bytes of rows buffered per run.
+        directory (str): Where to spill runs, next to ``target`` when
+        omitted.
+
+    Returns:
+        int: The number of rows written.
+    """
+    spill = tempfile.mkdtemp(prefix="runs-",
+                             dir=directory or os.path.dirname(target) or ".")
+    try:
+        runs, batch = sorted_runs(rows, value_key(header, column), column,
+                                  spill, memory)
+        permutation = array('q')
+        count = 0
+        with open(target, "w", newline="") as f, \
+                open(target + ".perm", "wb") as perm:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(header)
+            for _, position, row in merge_runs(runs, spill, batch):
+                writer.writerow(row)
+                permutation.append(position)
+                if len(permutation) == BATCH:
+                    permutation.tofile(perm)
+                    count += len(permutation)
+                    permutation = array('q')
+            permutation.tofile(perm)
+            count += len(permutation)
+    finally:
+        shutil.rmtree(spill, ignore_errors=True)
+    write_ranks(target + ".perm", target + ".rank", count)
+    return count
+
+
+def write_ranks(permutation: str, target: str, count: int) -> None:
+    """
+    Write the inverse of a permutation file.
+
+    Args:
+        permutation (str): The permutation file.
+        target (str): The rank file to write.
+        count (int): The number of entries.
+    """
+    with open(target, "wb") as f:
+        f.truncate(count * 8)
+    if not count:
+        return
+    with open(target, "r+b") as f, \
+            mmap.mmap(f.fileno(), 0) as mm:
+        ranks = memoryview(mm).cast('q')
+        for rank, position in enumerate(map_ints(permutation)):
+            ranks[position] = rank
+        ranks.release()
+
+
+def map_ints(path: str) -> Sequence[int]:
+    """
+    Memory-map a file of native 64-bit integers.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        Sequence[int]: The integers, read lazily from the file.
+    """
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return array('q')
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast('q')
+
+
+class SortedFile:
+    """
+    A dataset sorted by one column, with its permutation and ranks.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a sorted file written by ``sort_rows``.
+
+        Args:
+            path (str): The sorted CSV file.
+        """
+        self.path = path
+        self.rows = MmapDataset(path)
+        self.permutation = map_ints(path + ".perm")
+        self.ranks = map_ints(path + ".rank")
+
+    def __len__(self) -> int:
+        """
+        Return the number of sorted rows.
+        """
+        return len(self.rows)
+
+
+class ExternalSortIndex:
+    """
+    Sorted views of a dataset, sorted on disk.
+
+    A drop-in replacement for SortIndex whose memory use does not grow
+    with the dataset. Each column is sorted on first use into a temporary
+    directory that is removed with the index.
+    """
+
+    def __init__(self, dataset, memory: Optional[int] = None,
+                 directory: Optional[str] = None):
+        """
+        Initializes the index over a dataset.
+
+        Args:
+            dataset: A dataset supporting ``len()`` and slicing.
+            memory (int): The bytes of rows buffered per sort run.
+            directory (str): Where to create the sorted files, ``SORT_DIR``
+            when omitted.
+        """
+        self.dataset = dataset
+        self.header = tuple(getattr(dataset, "header", HEADER))
+        self.memory = memory
+        self.directory = tempfile.mkdtemp(prefix="pagination-sort-",
+                                          dir=directory or SORT_DIR)
+        self.files: Dict[int, SortedFile] = {}
+        self.__lock = threading.Lock()
+        weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def sorted_file(self, column: int) -> SortedFile:
+        """
+        Return the dataset sorted by a column, sorting it if needed.
+
+        Args:
+            column (int): The position of the column.
+
+        Returns:
+            SortedFile: The sorted rows, permutation and ranks.
+        """
+        if column not in self.files:
+            with self.__lock:
+                if column not in self.files:
+                    path = os.path.join(self.directory,
+                                        "by-{}.csv".format(column))
+                    dataset = self.dataset
+                    rows = (row for start in range(0, len(dataset), BATCH)
+                            for row in dataset[start:start + BATCH])
+                    sort_rows(rows, column, path, self.header, self.memory,
+                              self.directory)
+                    self.files[column] = SortedFile(path)
+        return self.files[column]
+
+    def rows(self, order_by: str, start: int, end: int) -> List[List]:
+        """
+        Return the rows ranked ``start`` to ``end - 1`` in the sorted view.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            start (int): The first rank wanted.
+            end (int): The rank after the last one wanted.
+
+        Returns:
+            List[List]: The rows, in view order.
+        """
+        column, descending = parse_order(order_by, self.header)
+        rows = self.sorted_file(column).rows
+        size = len(rows)
+        start, end = min(start, size), min(end, size)
+        if not descending:
+            return rows[start:end]
+        return rows[size - end:size - start][::-1]
+
+    def select_range(self, order_by: str, start: int,
+                     end: int) -> List[int]:
+        """
+        Return the positions of the rows ranked ``start`` to ``end - 1`` in
+        the sorted view.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            start (int): The first rank wanted.
+            end (int): The rank after the last one wanted.
+
+        Returns:
+            List[int]: Row positions, in view order.
+        """
+        column, descending = parse_order(order_by, self.header)
+        permutation = self.sorted_file(column).permutation
+        size = len(permutation)
+        start, end = min(start, size), min(end, size)
+        if not descending:
+            return list(permutation[start:end])
+        return [permutation[size - 1 - rank] for rank in range(start, end)]
+
+    def sort(self, order_by: str, positions: Iterable[int]) -> List[int]:
+        """
+        Sort a subset of row positions, e.g. the rows matching a filter.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            positions (Iterable[int]): Row positions in ascending order.
+
+        Returns:
+            List[int]: The positions in view order, ties in the same order
+            as in the full sorted view.
+        """
+        column, descending = parse_order(order_by, self.header)
+        ranks = self.sorted_file(column).ranks
+        return sorted(positions, key=ranks.__getitem__, reverse=descending)
+
+    def filtered(self, order_by: str,
+                 matches: Bitmap) -> Callable[[int, int], List[int]]:
+        """
+        Return the sorted view of the rows of a filter, as
+        ``SortIndex.filtered`` does, walking the sorted file's permutation.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            matches (Bitmap): The rows of the filter.
+
+        Returns:
+            Callable[[int, int], List[int]]: A function returning the
+            positions of the rows ranked ``start`` to ``end - 1``.
+        """
+        column, descending = parse_order(order_by, self.header)
+        if len(matches) * SPARSE < len(self.dataset):
+            positions = self.sort(order_by, matches)
+            return lambda start, end: positions[start:end]
+        return walk(self.sorted_file(column).permutation, matches,
+                    descending)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Write a copy of a CSV file sorted by a column.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(
+        description="Sort a CSV file by a column with bounded memory")
+    parser.add_argument("source")
+    parser.add_argument("--order-by", required=True,
+                        help="a sortable column or alias, e.g. count")
+    parser.add_argument("--output")
+    parser.add_argument("--memory", type=int, default=SORT_MEMORY,
+                        help="bytes of rows held in memory per run")
+    args = parser.parse_args(argv)
+    if args.order_by.startswith("-"):
+        parser.error("the sorted file is ascending; descending views read "
+                     "it backwards")
+    dataset = MmapDataset(args.source)
+    with open(args.source, newline="") as f:
+        header = next(csv.reader(f), None) or list(HEADER)
+    column, _ = parse_order(args.order_by, header)
+    target = args.output or "{}.by-{}.csv".format(
+        os.path.splitext(args.source)[0], args.order_by)
+    count = sort_rows(iter(dataset), column, target, header, args.memory)
+    print("{}: {} rows sorted by {}".format(target, count, header[column]))
+
+
+if __name__ == "__main__":
+    main()
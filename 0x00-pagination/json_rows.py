@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Pre-encoded JSON rows
+
+This module keeps the JSON encoding of every row of a dataset in a single
+bytes buffer, each row followed by the list separator. A run of
+consecutive rows is then one slice of the buffer, and any other selection
+of rows a join of slices, so serializing a page no longer encodes a row.
+The encoding is byte for byte what ``json.dumps`` produces for the row.
+
+Projected pages use the encoding of each column instead, kept apart so a
+row can be cut down to any of its columns by joining their values.
+
+The encodings of a dataset with appended rows are those of the rows
+already encoded, extended with the encoding of just the new rows.
+"""
+import copy
+import json
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from columnar_dataset import ColumnarDataset, DictColumn, scan_column
+
+
+class JsonRows:
+    """
+    The JSON encoding of every row of a dataset.
+
+    Row ``i`` is ``buffer[offsets[i]:offsets[i + 1] - len(SEPARATOR)]``.
+    """
+
+    SEPARATOR = b", "
+
+    def __init__(self, dataset, batch: int = 65536):
+        """
+        Encode every row of a dataset.
+
+        Args:
+            dataset: A dataset supporting ``len()`` and slicing.
+            batch (int): The number of rows decoded per slice.
+        """
+        buffer = bytearray()
+        offsets = array('q', [0])
+        self._encode(dataset, buffer, offsets, batch)
+        self.buffer = bytes(buffer)
+        self.offsets = offsets
+
+    def _encode(self, dataset, buffer: bytearray, offsets: array,
+                batch: int = 65536) -> None:
+        """
+        Append the encoding of every row of a dataset to ``buffer`` and
+        their end offsets to ``offsets``.
+        """
+        encode = json.JSONEncoder().encode
+        separator = self.SEPARATOR
+        for start in range(0, len(dataset), batch):
+            for row in dataset[start:start + batch]:
+                buffer += encode(row).encode("utf-8")
+                buffer += separator
+                offsets.append(len(buffer))
+
+    def appended(self, dataset, tail: ColumnarDataset) -> 'JsonRows':
+        """
+        Return the encoding of ``dataset``: the rows of this encoding
+        followed by the rows of ``tail``.
+
+        Only the rows of ``tail`` are encoded, after a copy of this
+        encoding, which is left unchanged.
+
+        Args:
+            dataset: The rows of this encoding followed by those of
+            ``tail``.
+            tail (ColumnarDataset): The appended rows.
+
+        Returns:
+            JsonRows: The encoding of ``dataset``.
+        """
+        buffer = bytearray(self.buffer)
+        offsets = array('q', self.offsets)
+        self._encode(tail, buffer, offsets)
+        rows = copy.copy(self)
+        rows.buffer = bytes(buffer)
+        rows.offsets = offsets
+        return rows
+
+    def __len__(self) -> int:
+        """
+        Return the number of encoded rows.
+        """
+        return len(self.offsets) - 1
+
+    def span(self, start: int, end: int) -> bytes:
+        """
+        Return the encoded rows in ``[start, end)``, comma separated.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+
+        Returns:
+            bytes: The body of a JSON array holding the rows.
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return b""
+        return self.buffer[self.offsets[start]:
+                           self.offsets[end] - len(self.SEPARATOR)]
+
+    def join(self, positions: Iterable[int]) -> bytes:
+        """
+        Return the encoded rows at ``positions``, comma separated.
+
+        Args:
+            positions (Iterable[int]): Row positions, in output order.
+
+        Returns:
+            bytes: The body of a JSON array holding the rows.
+        """
+        view = memoryview(self.buffer)
+        offsets = self.offsets
+        cut = len(self.SEPARATOR)
+        return self.SEPARATOR.join([view[offsets[i]:offsets[i + 1] - cut]
+                                    for i in positions])
+
+
+class JsonColumns:
+    """
+    The JSON encoding of every value of a dataset, column by column.
+
+    Columns are encoded on first use, so projected pages only ever pay for
+    the columns they ask for. Each distinct value of a column is encoded
+    once, and rows hold the code of theirs, so a page of a column is two
+    lookups per row; dictionary columns of a ColumnarDataset reuse their
+    own codes. A column is encoded once, even under concurrent requests.
+
+    The encoding of a dataset with appended rows (see ``appended``) extends
+    the columns of the encoding it was derived from.
+    """
+
+    SEPARATOR = JsonRows.SEPARATOR
+
+    def __init__(self, dataset):
+        """
+        Initializes the encoding of a dataset, no column encoded yet.
+
+        Args:
+            dataset: A dataset supporting ``len()`` and slicing.
+        """
+        self.dataset = dataset
+        self.columns: Dict[int, Tuple[List[bytes], Sequence[int]]] = {}
+        self.__prior: Optional['JsonColumns'] = None
+        self.__tail: Optional[ColumnarDataset] = None
+        self.__lock = threading.Lock()
+
+    def appended(self, dataset, tail: ColumnarDataset) -> 'JsonColumns':
+        """
+        Return the encoding of ``dataset``: the rows of this encoding
+        followed by the rows of ``tail``.
+
+        Its columns are encoded on first use too, from the same column of
+        this encoding and the rows of ``tail``.
+
+        Args:
+            dataset: The rows of this encoding followed by those of
+            ``tail``.
+            tail (ColumnarDataset): The appended rows.
+
+        Returns:
+            JsonColumns: The encoding of ``dataset``.
+        """
+        columns = copy.copy(self)
+        columns.dataset = dataset
+        columns.columns = {}
+        columns.__prior = self
+        columns.__tail = tail
+        columns.__lock = threading.Lock()
+        return columns
+
+    def encoding(self, column: int) -> Tuple[List[bytes], Sequence[int]]:
+        """
+        Return the encoding of a column, encoding it first if needed.
+
+        Args:
+            column (int): The position of the column.
+
+        Returns:
+            Tuple[List[bytes], Sequence[int]]: The encoding of each
+            distinct value, and the code of each row's value in that list.
+        """
+        if column not in self.columns:
+            with self.__lock:
+                if column not in self.columns:
+                    self.columns[column] = self._encode(column)
+        return self.columns[column]
+
+    def take(self, column: int, positions: Sequence[int]) -> List[bytes]:
+        """
+        Return the encoded values of a column at ``positions``, encoding
+        the column first if needed.
+
+        Args:
+            column (int): The position of the column.
+            positions (Sequence[int]): Row positions, in output order.
+
+        Returns:
+            List[bytes]: The encoded values.
+        """
+        encoded, codes = self.encoding(column)
+        picked: Iterable[int]
+        if isinstance(positions, range):
+            picked = codes[positions.start:positions.stop:positions.step]
+        else:
+            picked = map(codes.__getitem__, positions)
+        return list(map(encoded.__getitem__, picked))
+
+    def _encode(self, column: int) -> Tuple[List[bytes], Sequence[int]]:
+        """
+        Encode a column: the encoding of each of its distinct values, and
+        the code of each row's value in that list.
+        """
+        if self.__prior is not None and self.__tail is not None:
+            return self.__extend(column, self.__prior, self.__tail)
+        encode = json.JSONEncoder().encode
+        source = getattr(self.dataset, "columns", None)
+        if source is not None and isinstance(source[column], DictColumn):
+            return ([encode(text).encode("utf-8")
+                     for text in source[column].values],
+                    source[column].codes)
+        values: Iterable[str]
+        if source is not None:
+            values = map(source[column].get, range(len(self.dataset)))
+        else:
+            values = scan_column(self.dataset, column)
+        known: Dict[str, int] = {}
+        encoded: List[bytes] = []
+        codes = array('I')
+        for text in values:
+            code = known.get(text)
+            if code is None:
+                code = known[text] = len(encoded)
+                encoded.append(encode(text).encode("utf-8"))
+            codes.append(code)
+        return encoded, codes
+
+    def __extend(self, column: int, prior: 'JsonColumns',
+                 tail: ColumnarDataset) -> Tuple[List[bytes], Sequence[int]]:
+        """
+        Encode a column from its encoding in ``prior`` and the rows of
+        ``tail``.
+        """
+        encode = json.JSONEncoder().encode
+        encoded, codes = prior.encoding(column)
+        encoded = list(encoded)
+        known = {value: code for code, value in enumerate(encoded)}
+        extended = array('I', codes)
+        for text in scan_column(tail, column):
+            value = encode(text).encode("utf-8")
+            code = known.get(value)
+            if code is None:
+                code = known[value] = len(encoded)
+                encoded.append(value)
+            extended.append(code)
+        return encoded, extended
+
+    def join(self, columns: Sequence[int],
+             positions: Sequence[int]) -> bytes:
+        """
+        Return the encoded rows at ``positions``, cut down to ``columns``
+        and comma separated.
+
+        Args:
+            columns (Sequence[int]): The column positions, in output order.
+            positions (Sequence[int]): Row positions, in output order, e.g.
+            a range for consecutive rows.
+
+        Returns:
+            bytes: The body of a JSON array holding the rows.
+        """
+        if not positions:
+            return b""
+        values = [self.take(column, positions) for column in columns]
+        separator = self.SEPARATOR
+        return b"[" + (b"]" + separator + b"[").join(
+            map(separator.join, zip(*values))) + b"]"
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Lazy, file-backed dataset
+
+This module defines a row byte-offset index for a CSV file and a dataset
+that memory-maps the file and decodes only the rows a page asks for. The
+offset index is cached in a sidecar file next to the CSV so later processes
+can reuse it without rescanning the data.
+
+The index splits rows on newlines, so quoted fields spanning several lines
+are not supported; the baby names dataset has none.
+"""
+import csv
+import io
+import mmap
+import os
+import struct
+from array import array
+from typing import List, Optional, Sequence, Union
+
+
+class RowOffsetIndex:
+    """
+    Byte offsets of every data row of a CSV file.
+
+    ``offsets[i]`` is where row ``i`` starts and ``offsets[len(self)]`` is
+    where the last row ends, so row ``i`` spans
+    ``offsets[i]:offsets[i + 1]``. The header line is not indexed.
+    """
+
+    MAGIC = b"PGIX"
+    VERSION = 1
+    SUFFIX = ".idx"
+    # magic, format version, source size, source mtime (ns), row count
+    HEADER = struct.Struct("<4sIqqq")
+
+    def __init__(self, offsets: Sequence[int]):
+        """
+        Initializes the index from a sequence of offsets.
+
+        Args:
+            offsets (Sequence[int]): Row start offsets followed by the end
+            offset of the last row.
+        """
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        """
+        Return the number of indexed rows.
+        """
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def scan(data: Union[bytes, mmap.mmap], start: int = 0,
+             skip_header: bool = True,
+             offsets: Optional[array] = None) -> array:
+        """
+        Collect the start offset of every line in ``data``.
+
+        Args:
+            data (Union[bytes, mmap.mmap]): The file contents, usually an
+            mmap.
+            start (int): Where to start scanning.
+            skip_header (bool): Whether the first line is a header to skip.
+            offsets (array): An existing ``array('q')`` to append to.
+
+        Returns:
+            array: Row start offsets followed by the end offset.
+        """
+        if offsets is None:
+            offsets = array('q')
+        size = len(data)
+        pos = start
+        if skip_header and pos < size:
+            newline = data.find(b"\n", pos)
+            pos = size if newline < 0 else newline + 1
+        find = data.find
+        append = offsets.append
+        while pos < size:
+            append(pos)
+            newline = find(b"\n", pos)
+            if newline < 0:
+                pos = size
+                break
+            pos = newline + 1
+        append(pos)
+        return offsets
+
+    @classmethod
+    def build(cls, path: str) -> 'RowOffsetIndex':
+        """
+        Scan a CSV file and index its rows.
+
+        Args:
+            path (str): The CSV file to index.
+
+        Returns:
+            RowOffsetIndex: The index of the file's data rows.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(array('q', [0]))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return cls(cls.scan(mm))
+
+    @classmethod
+    def sidecar_path(cls, path: str) -> str:
+        """
+        Return the path of the sidecar index file for a CSV file.
+
+        Args:
+            path (str): The CSV file path.
+
+        Returns:
+            str: The sidecar file path.
+        """
+        return path + cls.SUFFIX
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to the sidecar file of a CSV file.
+
+        The file is written under a temporary name and renamed into place,
+        so concurrent readers never see a partial index.
+
+        Args:
+            path (str): The CSV file the index describes.
+        """
+        stat = os.stat(path)
+        target = self.sidecar_path(path)
+        tmp = "{}.{}.tmp".format(target, os.getpid())
+        offsets = self.offsets
+        if not isinstance(offsets, array):
+            offsets = array('q', offsets)
+        with open(tmp, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_size,
+                                     stat.st_mtime_ns, len(self)))
+            offsets.tofile(f)
+        os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path: str) -> Union['RowOffsetIndex', None]:
+        """
+        Memory-map the sidecar index of a CSV file if it is still valid.
+
+        Args:
+            path (str): The CSV file path.
+
+        Returns:
+            RowOffsetIndex: The index, or None when the sidecar is missing or
+            was built for a different version of the CSV file.
+        """
+        stat = os.stat(path)
+        try:
+            f = open(cls.sidecar_path(path), "rb")
+        except OSError:
+            return None
+        with f:
+            header = f.read(cls.HEADER.size)
+            if len(header) != cls.HEADER.size:
+                return None
+            magic, version, size, mtime, rows = cls.HEADER.unpack(header)
+            if (magic, version, size, mtime) != \
+                    (cls.MAGIC, cls.VERSION, stat.st_size, stat.st_mtime_ns):
+                return None
+            expected = cls.HEADER.size + (rows + 1) * 8
+            if os.fstat(f.fileno()).st_size != expected:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mm)[cls.HEADER.size:].cast('q'))
+
+    @classmethod
+    def load_or_build(cls, path: str) -> 'RowOffsetIndex':
+        """
+        Load the sidecar index of a CSV file, rebuilding it when stale.
+
+        Args:
+            path (str): The CSV file path.
+
+        Returns:
+            RowOffsetIndex: A valid index for the current file contents.
+        """
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        return index
+
+
+class MmapDataset:
+    """
+    A read-only dataset that decodes CSV rows on demand.
+
+    Only the byte range covering the requested rows is touched, so the
+    memory and time spent grow with the pages served rather than with the
+    size of the file.
+    """
+
+    def __init__(self, path: str, index: Optional[RowOffsetIndex] = None):
+        """
+        Initializes the dataset over a CSV file.
+
+        Args:
+            path (str): The CSV file path.
+            index (RowOffsetIndex): A prebuilt row index; loaded from (or
+            saved to) the sidecar file when omitted.
+        """
+        self.path = path
+        if index is None:
+            index = RowOffsetIndex.load_or_build(path)
+        self.index = index
+        self.__file = open(path, "rb")
+        self.__mm: Union[mmap.mmap, bytes]
+        if len(self.index):
+            self.__mm = mmap.mmap(self.__file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self.__mm = b""
+
+    def rows(self, start: int, end: int) -> List[List[str]]:
+        """
+        Decode the rows in ``[start, end)``.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return []
+        offsets = self.index.offsets
+        chunk = self.__mm[offsets[start]:offsets[end]].decode("utf-8")
+        return list(csv.reader(io.StringIO(chunk, newline="")))
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows in the dataset.
+        """
+        return len(self.index)
+
+    def __getitem__(self, key: Union[int, slice]):
+        """
+        Return a row, or a list of rows for a slice.
+
+        Args:
+            key (Union[int, slice]): A row position or a slice of positions.
+
+        Returns:
+            The decoded row or rows.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.rows(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("dataset index out of range")
+        return self.rows(key, key + 1)[0]
+
+    def __iter__(self):
+        """
+        Iterate over the decoded rows.
+        """
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        """
+        Release the memory map and the underlying file.
+        """
+        if isinstance(self.__mm, mmap.mmap):
+            self.__mm.close()
+        self.__file.close()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Order-statistic index over live rows
+
+This module defines a Fenwick (binary indexed) tree that tracks which row
+keys of a dataset are still present. It answers "how many live rows come
+before key k" and "which key is the n-th live row" in O(log n), which is
+what deletion-resilient pagination needs to return full pages after rows
+have been removed.
+
+It also defines LiveRows, a mapping from keys to rows that leaves the rows
+in their dataset and only remembers deletions and inserts, for datasets
+too large to copy into a dict.
+"""
+from array import array
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from columnar_dataset import Dataset
+
+
+class LiveIndex:
+    """
+    Fenwick tree over the keys ``0 .. capacity - 1`` of a dataset.
+
+    A key is live until it is deleted. New keys are appended at the end,
+    so keys are never reused and the order of live rows never changes.
+    """
+
+    def __init__(self, capacity: int = 0):
+        """
+        Initializes the index with every key in ``range(capacity)`` live.
+
+        Args:
+            capacity (int): The number of keys to track.
+        """
+        self.__live = bytearray(b"\x01") * capacity
+        self.__count = capacity
+        # tree[i] holds the number of live keys in (i - lowbit(i), i],
+        # which for a fully live range is simply lowbit(i).
+        self.__tree = array('l', (i & -i for i in range(capacity + 1)))
+
+    def __len__(self) -> int:
+        """
+        Return the number of live keys.
+        """
+        return self.__count
+
+    @property
+    def capacity(self) -> int:
+        """
+        Return the number of keys ever tracked, deleted ones included.
+        """
+        return len(self.__live)
+
+    def __contains__(self, key: int) -> bool:
+        """
+        Tell whether ``key`` is live.
+        """
+        return 0 <= key < len(self.__live) and self.__live[key] == 1
+
+    def _add(self, key: int, delta: int) -> None:
+        """
+        Add ``delta`` to the count of ``key`` in the tree.
+        """
+        tree = self.__tree
+        i = key + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def rank(self, key: int) -> int:
+        """
+        Count the live keys strictly smaller than ``key``.
+
+        Args:
+            key (int): The key to rank.
+
+        Returns:
+            int: The number of live keys before ``key``.
+        """
+        tree = self.__tree
+        i = min(key, len(tree) - 1)
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, n: int) -> Optional[int]:
+        """
+        Find the key of the ``n``-th live row (0-based).
+
+        Args:
+            n (int): The position of the row among the live rows.
+
+        Returns:
+            Optional[int]: The key, or None when fewer than ``n + 1`` rows
+            are live.
+        """
+        if n < 0 or n >= self.__count:
+            return None
+        return self._find(n)
+
+    def _find(self, n: int) -> int:
+        """
+        Find the key of the ``n``-th live row, which must exist.
+        """
+        tree = self.__tree
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= n:
+                pos = nxt
+                n -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def next_live(self, key: int) -> Optional[int]:
+        """
+        Find the first live key greater than or equal to ``key``.
+
+        Args:
+            key (int): Where to start looking.
+
+        Returns:
+            Optional[int]: The key, or None when no live key follows.
+        """
+        return self.select(self.rank(max(key, 0)))
+
+    def page(self, key: int, size: int) -> List[int]:
+        """
+        Return up to ``size`` live keys, starting at the first live key at
+        or after ``key``.
+
+        The first key is found with ``select(rank(key))``. Each following
+        key is the next one when that is live, and is otherwise found with
+        ``select`` too, so a page costs at most O(size log n) however many
+        deleted keys it skips.
+
+        Args:
+            key (int): The first key of the page, live or not.
+            size (int): The number of keys wanted.
+
+        Returns:
+            List[int]: The live keys of the page, in order.
+        """
+        live = self.__live
+        first = self.rank(max(key, 0))
+        keys: List[int] = []
+        pos = -1
+        for n in range(first, min(first + size, self.__count)):
+            if keys and pos + 1 < len(live) and live[pos + 1]:
+                pos += 1
+            else:
+                pos = self._find(n)
+            keys.append(pos)
+        return keys
+
+    def delete(self, key: int) -> bool:
+        """
+        Mark ``key`` as deleted.
+
+        Args:
+            key (int): The key to delete.
+
+        Returns:
+            bool: True if the key was live, False otherwise.
+        """
+        if key not in self:
+            return False
+        self.__live[key] = 0
+        self.__count -= 1
+        self._add(key, -1)
+        return True
+
+    def restore(self, key: int) -> bool:
+        """
+        Mark a previously deleted ``key`` as live again.
+
+        Args:
+            key (int): The key to restore.
+
+        Returns:
+            bool: True if the key was deleted, False otherwise.
+        """
+        if not 0 <= key < len(self.__live) or self.__live[key] == 1:
+            return False
+        self.__live[key] = 1
+        self.__count += 1
+        self._add(key, 1)
+        return True
+
+    def append(self) -> int:
+        """
+        Track a new live key after the current last one.
+
+        Returns:
+            int: The new key.
+        """
+        key = len(self.__live)
+        i = key + 1
+        # The new node covers (i - lowbit(i), i]: the new key itself plus
+        # the live keys in (i - lowbit(i), i - 1].
+        covered = self.rank(key) - self.rank(i - (i & -i))
+        self.__live.append(1)
+        self.__tree.append(covered + 1)
+        self.__count += 1
+        return key
+
+
+class LiveRows(MutableMapping):
+    """
+    The rows of a dataset keyed by position, deletable and extensible.
+
+    Behaves like ``dict(enumerate(dataset))`` without reading a single
+    row up front: deleted keys are kept in a set and inserted or replaced
+    rows in a dict, so memory grows with the changes only.
+    """
+
+    def __init__(self, dataset: Dataset):
+        """
+        Initializes the mapping over every row of ``dataset``.
+
+        Args:
+            dataset (Dataset): A dataset supporting ``len()`` and slicing.
+        """
+        self.dataset = dataset
+        self.__size = len(dataset)
+        self.__deleted: Set[int] = set()
+        self.__changed: Dict[int, List] = {}
+
+    def __contains__(self, key: object) -> bool:
+        """
+        Tell whether ``key`` holds a row.
+        """
+        if key in self.__changed:
+            return True
+        return isinstance(key, int) and 0 <= key < self.__size and \
+            key not in self.__deleted
+
+    def __getitem__(self, key: int) -> List:
+        """
+        Return the row at ``key``.
+
+        Raises:
+            KeyError: If no row has this key.
+        """
+        row = self.__changed.get(key)
+        if row is not None:
+            return row
+        if key not in self:
+            raise KeyError(key)
+        return self.dataset[key]
+
+    def __setitem__(self, key: int, row: List) -> None:
+        """
+        Insert or replace the row at ``key``.
+        """
+        self.__changed[key] = row
+        self.__deleted.discard(key)
+
+    def __delitem__(self, key: int) -> None:
+        """
+        Delete the row at ``key``.
+
+        Raises:
+            KeyError: If no row has this key.
+        """
+        if key not in self:
+            raise KeyError(key)
+        self.__changed.pop(key, None)
+        if 0 <= key < self.__size:
+            self.__deleted.add(key)
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterate over the keys, dataset rows first.
+        """
+        for key in range(self.__size):
+            if key not in self.__deleted:
+                yield key
+        for key in self.__changed:
+            if not 0 <= key < self.__size:
+                yield key
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows.
+        """
+        added = sum(1 for key in self.__changed
+                    if not 0 <= key < self.__size)
+        return self.__size - len(self.__deleted) + added
+
+    def select(self, keys: Sequence[int]) -> List[List]:
+        """
+        Return the rows of several keys, reading runs of consecutive
+        dataset rows with one slice each.
+
+        Args:
+            keys (Sequence[int]): Keys that hold rows, in ascending order.
+
+        Returns:
+            List[List]: The rows, in the order of ``keys``.
+        """
+        rows = []
+        i = 0
+        while i < len(keys):
+            key = keys[i]
+            if key in self.__changed or not 0 <= key < self.__size:
+                rows.append(self[key])
+                i += 1
+                continue
+            end = i + 1
+            while end < len(keys) and keys[end] == key + end - i and \
+                    keys[end] < self.__size and \
+                    keys[end] not in self.__changed:
+                end += 1
+            rows.extend(self.dataset[key:key + end - i])
+            i = end
+        return rows
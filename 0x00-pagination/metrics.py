@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Pagination metrics
+
+This module collects the metrics of the pagination servers: how long the
+dataset takes to load and how large it is, and the latency and page size
+distributions of every page method. Metrics are kept in a Metrics
+registry, exported in the Prometheus text format, and forwarded to any
+hooks registered on it, e.g. to feed another monitoring system.
+
+Servers are instrumented only when given a registry; without one, an
+instrumented method costs a single attribute check. Servers sharing a
+registry each get a ``labeled`` view of it, so their series stay apart.
+"""
+import copy
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Hooks receive the metric name, the observed value and its labels.
+Hook = Callable[[str, float, Dict[str, str]], None]
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PAGE_SIZE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+
+class Histogram:
+    """
+    Observations counted into fixed buckets, Prometheus style.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Initializes an empty histogram.
+
+        Args:
+            buckets (Sequence[float]): The ascending upper bounds of the
+            buckets; an implicit last bucket holds everything larger.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    A thread-safe registry of pagination metrics.
+    """
+
+    def __init__(self, prefix: str = "pagination"):
+        """
+        Initializes an empty registry.
+
+        Args:
+            prefix (str): Prepended to every exported metric name.
+        """
+        self.prefix = prefix
+        self.labels: Dict[str, str] = {}
+        self.hooks: List[Hook] = []
+        self.__gauges: Dict[Tuple, float] = {}
+        self.__counters: Dict[Tuple, float] = {}
+        self.__histograms: Dict[Tuple, Histogram] = {}
+        self.__help: Dict[str, str] = {}
+        self.__lock = threading.Lock()
+
+    def labeled(self, **labels: str) -> 'Metrics':
+        """
+        Return a view of this registry that adds labels to every update.
+
+        The view shares the registry's metrics and hooks, so they are
+        exported and forwarded together.
+
+        Args:
+            **labels (str): The labels, e.g. ``server="hyper"``.
+
+        Returns:
+            Metrics: The labeled view.
+        """
+        view = copy.copy(self)
+        view.labels = dict(self.labels, **labels)
+        return view
+
+    def add_hook(self, hook: Hook) -> None:
+        """
+        Call ``hook`` with every metric update.
+
+        Args:
+            hook (Hook): Receives the metric name, value and labels.
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """
+        Stop calling a hook added with ``add_hook``.
+
+        Args:
+            hook (Hook): The hook to remove.
+        """
+        self.hooks.remove(hook)
+
+    def _emit(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        """
+        Forward an update to the hooks.
+        """
+        for hook in self.hooks:
+            hook(name, value, labels)
+
+    def set_gauge(self, name: str, value: float, help: str = "",
+                  **labels: str) -> None:
+        """
+        Set a gauge to a value.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            value (float): The new value.
+            help (str): The metric description, for the export.
+            **labels (str): The metric labels.
+        """
+        labels = dict(self.labels, **labels)
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__help.setdefault(name, help)
+            self.__gauges[key] = value
+        self._emit(name, value, labels)
+
+    def inc(self, name: str, value: float = 1, help: str = "",
+            **labels: str) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            value (float): The increment.
+            help (str): The metric description, for the export.
+            **labels (str): The metric labels.
+        """
+        labels = dict(self.labels, **labels)
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__help.setdefault(name, help)
+            self.__counters[key] = self.__counters.get(key, 0) + value
+        self._emit(name, value, labels)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float],
+                help: str = "", **labels: str) -> None:
+        """
+        Record an observation in a histogram.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            value (float): The observed value.
+            buckets (Sequence[float]): The bucket bounds, used when the
+            histogram is created.
+            help (str): The metric description, for the export.
+            **labels (str): The metric labels.
+        """
+        labels = dict(self.labels, **labels)
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                self.__help.setdefault(name, help)
+                histogram = self.__histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+        self._emit(name, value, labels)
+
+    def request(self, method: str, seconds: float, page_size: int,
+                failed: bool = False) -> None:
+        """
+        Record a call to a page method.
+
+        Args:
+            method (str): The method name.
+            seconds (float): How long the call took.
+            page_size (int): The page size requested.
+            failed (bool): Whether the call raised an exception.
+        """
+        self.observe("request_duration_seconds", seconds, LATENCY_BUCKETS,
+                     "Latency of the page methods.", method=method)
+        self.observe("page_size", page_size, PAGE_SIZE_BUCKETS,
+                     "Page sizes requested from the page methods.",
+                     method=method)
+        if failed:
+            self.inc("request_errors_total", 1,
+                     "Page method calls that raised an exception.",
+                     method=method)
+
+    def dataset_loaded(self, dataset, seconds: float, kind: str = "full",
+                       version: Optional[int] = None) -> None:
+        """
+        Record a dataset load and the size of the loaded dataset.
+
+        Args:
+            dataset: The loaded dataset.
+            seconds (float): How long the load took.
+            kind (str): "full" for a complete load, "append" for rows
+            added to a loaded dataset.
+            version (int): The dataset version, when the server has one.
+        """
+        self.set_gauge("dataset_load_seconds", seconds,
+                       "Duration of the last dataset load.", kind=kind)
+        self.inc("dataset_loads_total", 1, "Dataset loads.", kind=kind)
+        self.set_gauge("dataset_rows", len(dataset), "Rows in the dataset.")
+        nbytes = dataset_nbytes(dataset)
+        if nbytes is not None:
+            self.set_gauge("dataset_bytes", nbytes,
+                           "Memory held by the dataset's column buffers.")
+        if version is not None:
+            self.set_gauge("dataset_version", version,
+                           "Version of the published dataset.")
+
+    def render(self) -> str:
+        """
+        Export every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, one sample per line.
+        """
+        with self.__lock:
+            gauges = sorted(self.__gauges.items())
+            counters = sorted(self.__counters.items())
+            histograms = sorted(
+                (key, (h.buckets, list(h.counts), h.sum, h.count))
+                for key, h in self.__histograms.items())
+            helps = dict(self.__help)
+        lines = []
+        seen = set()
+
+        def header(name: str, kind: str) -> str:
+            full = "{}_{}".format(self.prefix, name)
+            if name not in seen:
+                seen.add(name)
+                if helps.get(name):
+                    lines.append("# HELP {} {}".format(full, helps[name]))
+                lines.append("# TYPE {} {}".format(full, kind))
+            return full
+
+        for (name, labels), value in gauges:
+            lines.append(_sample(header(name, "gauge"), labels, value))
+        for (name, labels), value in counters:
+            lines.append(_sample(header(name, "counter"), labels, value))
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            full = header(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket
+                lines.append(_sample(full + "_bucket", labels + (
+                    ("le", _format(bound)),), cumulative))
+            lines.append(_sample(full + "_sum", labels, total))
+            lines.append(_sample(full + "_count", labels, count))
+        return "\n".join(lines) + "\n"
+
+
+def _format(value: float) -> str:
+    """
+    Format a sample value the way Prometheus expects.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sample(name: str, labels: Tuple, value: float) -> str:
+    """
+    Format one exposition line.
+    """
+    if not labels:
+        return "{} {}".format(name, _format(value))
+    text = ",".join('{}="{}"'.format(key, str(val).replace("\\", "\\\\")
+                                     .replace('"', '\\"')
+                                     .replace("\n", "\\n"))
+                    for key, val in labels)
+    return "{}{{{}}} {}".format(name, text, _format(value))
+
+
+def dataset_nbytes(dataset) -> Optional[int]:
+    """
+    Return the memory held by a dataset's buffers, if it can tell.
+
+    Args:
+        dataset: A dataset; concatenated datasets add up their parts.
+
+    Returns:
+        Optional[int]: The number of bytes, or None when unknown.
+    """
+    nbytes = getattr(dataset, "nbytes", None)
+    if nbytes is not None:
+        return nbytes()
+    parts = [dataset_nbytes(part) for part in getattr(dataset, "parts", ())
+             if part is not None]
+    sizes = [size for size in parts if size is not None]
+    return sum(sizes) if sizes else None
+
+
+def instrumented(method: Callable) -> Callable:
+    """
+    Time a page method of a server whose ``metrics`` may be a Metrics.
+
+    The page size is read from the call's ``page_size`` argument.
+
+    Args:
+        method (Callable): The method to instrument.
+
+    Returns:
+        Callable: The wrapped method.
+    """
+    signature = inspect.signature(method)
+    default_size = signature.parameters["page_size"].default
+    position = list(signature.parameters).index("page_size") - 1
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        page_size = kwargs.get("page_size", args[position]
+                               if len(args) > position else default_size)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            metrics.request(name, time.perf_counter() - start,
+                            page_size if isinstance(page_size, int) else 0,
+                            failed)
+    return wrapper
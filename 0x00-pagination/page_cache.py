@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Page result cache
+
+This module defines a bounded, thread-safe LRU cache for hypermedia page
+responses, and the strong ETags that identify them. Cache keys include the
+dataset version, and servers clear the cache whenever that version moves,
+so a cached page is never served for data that has changed.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+from columnar_dataset import resolve_field, resolve_fields
+
+
+def filters_key(filters: Optional[Dict] = None) -> Tuple:
+    """
+    Normalize filters into a hashable, order-independent cache key.
+
+    Column aliases are resolved, so ``{"year": 2016}`` and
+    ``{"Year of Birth": "2016"}`` share a key.
+
+    Args:
+        filters (Dict): Column to value filters, or None.
+
+    Returns:
+        Tuple: Sorted ``(column position, value text)`` pairs.
+    """
+    if not filters:
+        return ()
+    return tuple(sorted((resolve_field(name), str(value))
+                        for name, value in filters.items()))
+
+
+def fields_key(
+        fields: Optional[Sequence[str]] = None) -> Optional[Tuple[int, ...]]:
+    """
+    Normalize a column projection into the positions of its columns.
+
+    Args:
+        fields (Sequence[str]): Column names or aliases, or None.
+
+    Returns:
+        Optional[Tuple[int, ...]]: The column positions in output order,
+        or None when every column is wanted.
+    """
+    if not fields:
+        return None
+    return tuple(resolve_fields(fields))
+
+
+def make_etag(*parts: Hashable) -> str:
+    """
+    Build a strong ETag from the values that determine a response.
+
+    Args:
+        *parts (Hashable): The dataset fingerprint and version, and the
+        request parameters.
+
+    Returns:
+        str: A quoted entity tag.
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return '"{}"'.format(digest[:24])
+
+
+class PageCache:
+    """
+    Least Recently Used cache of page responses.
+
+    Rows are stored as tuples and handed out as new lists, so callers may
+    modify the responses they get without altering the cached ones.
+    """
+
+    def __init__(self, max_items: int = 256):
+        """
+        Initializes the cache.
+
+        Args:
+            max_items (int): The number of responses kept; 0 disables it.
+        """
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Return the number of cached responses.
+        """
+        return len(self.__data)
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        """
+        Retrieve a response by key.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Optional[Dict]: A copy of the cached response, or None.
+        """
+        with self.__lock:
+            value = self.__data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.__data.move_to_end(key)
+            self.hits += 1
+        return dict(value, data=[list(row) for row in value["data"]])
+
+    def put(self, key: Hashable, value: Dict) -> None:
+        """
+        Add a response to the cache, evicting the least recently used one
+        when full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Dict): The response; a copy is stored.
+        """
+        if self.max_items <= 0:
+            return
+        with self.__lock:
+            self.__data[key] = dict(
+                value, data=tuple(tuple(row) for row in value["data"]))
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.max_items:
+                self.__data.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop every cached response.
+        """
+        with self.__lock:
+            self.__data.clear()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Prefix index over first names
+
+This module defines a sorted-array prefix index for typeahead search on
+the "Child's First Name" column. Distinct names are case-folded once at
+build time and kept sorted, and the positions of their rows are grouped
+name by name in a single array, so every name starting with a prefix maps
+to one contiguous slice of that array found with two binary searches.
+Rows appended to a dataset are merged into the groups already built.
+"""
+import copy
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from columnar_dataset import (
+    HEADER, ColumnarDataset, DictColumn, resolve_field, scan_column,
+)
+
+
+class PrefixIndex:
+    """
+    Case-insensitive prefix search over a text column.
+
+    Matches are ordered by case-folded name, then by row position.
+    """
+
+    COLUMN = "Child's First Name"
+    # Sorts after every real character, closing a prefix range.
+    HIGHEST = "\U0010ffff"
+
+    def __init__(self, dataset, column: str = COLUMN):
+        """
+        Build the index for a column of a dataset.
+
+        Args:
+            dataset: A ColumnarDataset, or any dataset supporting ``len()``
+            and slicing.
+            column (str): The column to index, by CSV name or alias.
+        """
+        position = resolve_field(column, getattr(dataset, "header", HEADER))
+        source = None
+        if isinstance(dataset, ColumnarDataset):
+            source = dataset.columns[position]
+        if isinstance(source, DictColumn):
+            values = source.values
+            codes = source.codes
+        else:
+            encoded = DictColumn()
+            for value in scan_column(dataset, position):
+                encoded.append(value)
+            values, codes = encoded.values, encoded.codes
+
+        folded = sorted({value.casefold() for value in values})
+        slot = {name: i for i, name in enumerate(folded)}
+        code_slot = array('I', (slot[value.casefold()] for value in values))
+
+        counts = array('I', bytes(4 * (len(folded) + 1)))
+        for code in codes:
+            counts[code_slot[code] + 1] += 1
+        starts = array('I', [0])
+        for count in counts[1:]:
+            starts.append(starts[-1] + count)
+
+        rows = array('I', bytes(4 * len(codes)))
+        cursor = array('I', starts[:-1])
+        for i, code in enumerate(codes):
+            s = code_slot[code]
+            rows[cursor[s]] = i
+            cursor[s] += 1
+
+        self.column = position
+        self.names = folded
+        self.starts = starts
+        self.rows = rows
+
+    def appended(self, dataset, tail: ColumnarDataset) -> 'PrefixIndex':
+        """
+        Return the index of ``dataset``: the rows of this index followed by
+        the rows of ``tail``.
+
+        Only the names of ``tail`` are read; its rows are added at the end
+        of the groups of their names, new names getting groups of their
+        own, and this index is left unchanged.
+
+        Args:
+            dataset: The rows of this index followed by those of ``tail``.
+            tail (ColumnarDataset): The appended rows.
+
+        Returns:
+            PrefixIndex: The index of ``dataset``.
+        """
+        offset = len(self.rows)
+        added: Dict[str, List[int]] = {}
+        for i, value in enumerate(scan_column(tail, self.column)):
+            added.setdefault(value.casefold(), []).append(offset + i)
+
+        slot = {name: i for i, name in enumerate(self.names)}
+        names = sorted(slot.keys() | added.keys())
+        starts = array('I', [0])
+        rows = array('I')
+        for name in names:
+            s = slot.get(name)
+            if s is not None:
+                rows.extend(self.rows[self.starts[s]:self.starts[s + 1]])
+            rows.extend(added.get(name, ()))
+            starts.append(len(rows))
+
+        index = copy.copy(self)
+        index.names = names
+        index.starts = starts
+        index.rows = rows
+        return index
+
+    def span(self, prefix: str) -> Tuple[int, int]:
+        """
+        Locate the matches of a prefix.
+
+        Args:
+            prefix (str): The beginning of the names to find, in any case.
+
+        Returns:
+            Tuple[int, int]: The slice of ``rows`` holding the matches.
+        """
+        prefix = prefix.casefold()
+        lo = bisect_left(self.names, prefix)
+        hi = bisect_left(self.names, prefix + self.HIGHEST, lo)
+        return self.starts[lo], self.starts[hi]
+
+    def count(self, prefix: str) -> int:
+        """
+        Count the rows whose name starts with ``prefix``.
+
+        Args:
+            prefix (str): The beginning of the names to find, in any case.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        lo, hi = self.span(prefix)
+        return hi - lo
+
+    def select_range(self, prefix: str, start: int, end: int) -> List[int]:
+        """
+        Return the positions of the matches ranked ``start`` to ``end - 1``.
+
+        Args:
+            prefix (str): The beginning of the names to find, in any case.
+            start (int): The rank of the first match wanted.
+            end (int): The rank after the last match wanted.
+
+        Returns:
+            List[int]: Row positions of the matches.
+        """
+        lo, hi = self.span(prefix)
+        return list(self.rows[min(lo + start, hi):min(lo + end, hi)])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Row count estimates
+
+This module estimates the number of rows of a CSV file from its size and
+the mean length of lines sampled across it, and reads the first rows of
+the file directly, so that the first pages can be answered before the
+dataset has been loaded. Reading a sample costs the same however large
+the file is.
+
+Files small enough to be read whole by the sampling are counted exactly.
+"""
+import csv
+import io
+import os
+from typing import List, Tuple
+
+# Evenly spaced windows read to measure the mean line length.
+SAMPLES = 16
+WINDOW = 1 << 16
+
+
+def estimate_rows(path: str, samples: int = SAMPLES,
+                  window: int = WINDOW) -> Tuple[int, bool]:
+    """
+    Estimate the number of data rows of a CSV file.
+
+    Args:
+        path (str): The CSV file, header line included.
+        samples (int): The number of windows sampled.
+        window (int): The size of each window, in bytes.
+
+    Returns:
+        Tuple[int, bool]: The row count and whether it is exact.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = len(f.readline())
+        if size - start <= samples * window:
+            data = f.read()
+            partial = bool(data) and not data.endswith(b"\n")
+            return data.count(b"\n") + partial, True
+        lines = spanned = 0
+        step = (size - start) // samples
+        for i in range(samples):
+            f.seek(start + i * step)
+            data = f.read(window)
+            first = data.find(b"\n") if i else -1
+            last = data.rfind(b"\n")
+            if last > first:
+                lines += data.count(b"\n", first + 1, last + 1)
+                spanned += last - first
+    if not lines:
+        return (size - start) // window + 1, False
+    return round((size - start) * lines / spanned), False
+
+
+def read_head(path: str, rows: int) -> Tuple[List[List[str]], bool]:
+    """
+    Parse the first data rows of a CSV file.
+
+    Args:
+        path (str): The CSV file, header line included.
+        rows (int): The number of rows wanted.
+
+    Returns:
+        Tuple[List[List[str]], bool]: The rows, and whether the end of the
+        file was reached, in which case they are all of its rows.
+    """
+    lines = []
+    with open(path, "rb") as f:
+        f.readline()
+        for line in f:
+            lines.append(line)
+            if len(lines) > rows:
+                break
+    text = io.StringIO(b"".join(lines[:rows]).decode("utf-8"), newline="")
+    return list(csv.reader(text)), len(lines) <= rows
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Sharded dataset
+
+This module federates several CSV shards, e.g. one file per year, into a
+single dataset. Rows are numbered across the shards in path order, and a
+global range of rows is mapped to the shards that hold it, so only the
+shards a page touches are ever opened. The same concatenation also serves
+in-memory parts, such as rows appended to a file after it was loaded.
+
+Row counts come from each shard's sidecar index (the row offset index of a
+CSV file, the block index of a compressed one), which records the count in
+its header and is only rebuilt when the shard changes. The length of the
+dataset, and hence ``total_pages``, is known without loading any shard.
+"""
+import glob
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from compressed_dataset import BlockIndex, codec_for
+from lazy_dataset import RowOffsetIndex
+
+Source = Union[str, Sequence[str]]
+
+
+def is_sharded(source: Source) -> bool:
+    """
+    Tell whether a data source names several shards.
+
+    Args:
+        source (Source): A file path, a glob pattern, or a list of paths.
+
+    Returns:
+        bool: True for lists of paths and glob patterns.
+    """
+    return not isinstance(source, str) or glob.has_magic(source)
+
+
+def shard_paths(source: Source) -> List[str]:
+    """
+    Expand a data source into its shard paths.
+
+    Args:
+        source (Source): A file path, a glob pattern (matches are sorted),
+        or a list of paths (kept in order).
+
+    Returns:
+        List[str]: The shard paths.
+
+    Raises:
+        ValueError: If the source names no file.
+    """
+    if isinstance(source, str):
+        paths = sorted(glob.glob(source)) if glob.has_magic(source) \
+            else [source]
+    else:
+        paths = list(source)
+    if not paths:
+        raise ValueError("No dataset shard matches {!r}.".format(source))
+    return paths
+
+
+def fingerprint(source: Source) -> Tuple:
+    """
+    Identify the current version of a data source.
+
+    Args:
+        source (Source): A file path, a glob pattern, or a list of paths.
+
+    Returns:
+        Tuple: ``(size, mtime_ns)`` of a single file, or the
+        ``(path, size, mtime_ns)`` of every shard.
+    """
+    if isinstance(source, str) and not is_sharded(source):
+        stat = os.stat(source)
+        return stat.st_size, stat.st_mtime_ns
+    stats = [(path, os.stat(path)) for path in shard_paths(source)]
+    return tuple((path, stat.st_size, stat.st_mtime_ns)
+                 for path, stat in stats)
+
+
+def shard_rows(path: str) -> int:
+    """
+    Return the number of data rows of a shard from its sidecar index.
+
+    Args:
+        path (str): The shard path, a CSV file or a block-compressed copy.
+
+    Returns:
+        int: The row count.
+    """
+    if codec_for(path):
+        return BlockIndex.load_or_build(path).rows
+    return len(RowOffsetIndex.load_or_build(path))
+
+
+class ConcatDataset:
+    """
+    A read-only dataset made of several datasets laid end to end.
+
+    ``starts[i]`` is the global position of the first row of part ``i``
+    and ``starts[len(parts)]`` is the total row count.
+    """
+
+    def __init__(self, parts: Sequence, sizes: Optional[Sequence[int]] = None):
+        """
+        Initializes the dataset over a list of parts.
+
+        Args:
+            parts (Sequence): Datasets supporting ``len()`` and slicing, or
+            placeholders when ``part`` is overridden to open them lazily.
+            sizes (Sequence[int]): The row count of every part, taken from
+            the parts themselves when omitted.
+        """
+        self.parts = list(parts)
+        if sizes is None:
+            sizes = [len(part) for part in self.parts]
+        starts = array('q', [0])
+        for size in sizes:
+            starts.append(starts[-1] + size)
+        self.starts = starts
+
+    def part(self, number: int):
+        """
+        Return the dataset of a part.
+
+        Args:
+            number (int): The part number.
+
+        Returns:
+            The part's dataset.
+        """
+        return self.parts[number]
+
+    def rows(self, start: int, end: int) -> List[List[str]]:
+        """
+        Return the rows in ``[start, end)``, touching only their parts.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return []
+        starts = self.starts
+        number = bisect_right(starts, start, 0, len(self.parts)) - 1
+        result = []
+        while start < end:
+            base = starts[number]
+            stop = min(end, starts[number + 1])
+            if stop > start:
+                result.extend(self.part(number)[start - base:stop - base])
+                start = stop
+            number += 1
+        return result
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows across all parts.
+        """
+        return self.starts[-1]
+
+    def __getitem__(self, key: Union[int, slice]):
+        """
+        Return a row, or a list of rows for a slice.
+
+        Args:
+            key (Union[int, slice]): A row position or a slice of positions.
+
+        Returns:
+            The row or rows.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.rows(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("dataset index out of range")
+        return self.rows(key, key + 1)[0]
+
+    def __iter__(self):
+        """
+        Iterate over the rows, one part at a time.
+        """
+        for number in range(len(self.parts)):
+            yield from self.part(number)
+
+
+class ShardedDataset(ConcatDataset):
+    """
+    A read-only dataset spanning several shard files.
+
+    Shards are opened on first access, once each, even under concurrent
+    requests.
+    """
+
+    def __init__(self, paths: Sequence[str],
+                 open_shard: Callable[[str], object]):
+        """
+        Initializes the dataset over a list of shards.
+
+        Args:
+            paths (Sequence[str]): The shard paths, in row order.
+            open_shard (Callable[[str], object]): Opens one shard as a
+            dataset supporting ``len()`` and slicing.
+        """
+        self.paths = list(paths)
+        self.open_shard = open_shard
+        super().__init__([None] * len(self.paths),
+                         [shard_rows(path) for path in self.paths])
+        self.__lock = threading.Lock()
+
+    def part(self, number: int):
+        """
+        Return a shard's dataset, opening it on first use.
+
+        Args:
+            number (int): The shard number.
+
+        Returns:
+            The shard's dataset.
+        """
+        shard = self.parts[number]
+        if shard is None:
+            with self.__lock:
+                shard = self.parts[number]
+                if shard is None:
+                    shard = self.open_shard(self.paths[number])
+                    self.parts[number] = shard
+        return shard
+
+    @property
+    def loaded(self) -> int:
+        """
+        Return the number of shards opened so far.
+        """
+        return sum(shard is not None for shard in self.parts)
+
+    def close(self) -> None:
+        """
+        Close the shards that were opened and support closing.
+        """
+        for shard in self.parts:
+            if hasattr(shard, "close"):
+                shard.close()
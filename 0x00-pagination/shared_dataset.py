@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Shared dataset for pre-forked workers
+
+This module places the dataset snapshot in a shared, RAM-backed directory
+(``/dev/shm`` when available) so that every worker process serving the
+same CSV file maps the same physical pages. One process builds the
+snapshot and the others only attach to it: attaching is a stat, a small
+JSON header read and an mmap, and N workers cost roughly one dataset's
+worth of memory.
+
+The stdlib ``multiprocessing.shared_memory`` module needs Python 3.8, so a
+shared memory-mapped file is used instead; a parent process that calls
+``attach`` before forking also hands the mapping to its children for free.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+import snapshot
+from columnar_dataset import ColumnarDataset
+
+
+SHARED_DIR = os.environ.get("PAGINATION_SHARED_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+
+def shared_path(path: str, directory: Optional[str] = None) -> str:
+    """
+    Return the shared snapshot path of a CSV file.
+
+    The name is derived from the absolute CSV path, so all workers serving
+    the same file agree on it without any coordination.
+
+    Args:
+        path (str): The CSV file path.
+        directory (str): The shared directory, ``SHARED_DIR`` by default.
+
+    Returns:
+        str: The shared snapshot path.
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8"))
+    return os.path.join(directory or SHARED_DIR, "pagination-{}{}".format(
+        digest.hexdigest()[:16], snapshot.SUFFIX))
+
+
+def attach(path: str, directory: Optional[str] = None) -> ColumnarDataset:
+    """
+    Map the shared snapshot of a CSV file, building it if needed.
+
+    Args:
+        path (str): The CSV file path.
+        directory (str): The shared directory, ``SHARED_DIR`` by default.
+
+    Returns:
+        ColumnarDataset: A read-only dataset backed by shared pages.
+    """
+    return snapshot.load_or_build(path, shared_path(path, directory))
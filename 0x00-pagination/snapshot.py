@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Binary dataset snapshots
+
+This module persists a parsed ColumnarDataset next to its CSV file so that
+later processes can start without re-running ``csv.reader`` over the whole
+file. A snapshot is a small JSON header followed by the raw column buffers;
+loading it memory-maps the file and wraps each buffer in a typed
+memoryview, so no per-row work happens at startup.
+
+The snapshot also carries the dataset's extras, such as the sort
+permutations, which are added to it the first time they are computed.
+
+Snapshots record the size, mtime and SHA-256 digest of the CSV they were
+built from and are rebuilt automatically once the CSV changes. A CSV file
+touched without changing its contents keeps its snapshot, whose recorded
+size and mtime are then updated.
+"""
+import fcntl
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Union
+
+import parallel_loader
+from columnar_dataset import Column, ColumnarDataset, DictColumn, IntColumn
+
+
+MAGIC = b"PGSN"
+VERSION = 2
+SUFFIX = ".snap"
+ALIGN = 8
+# magic, format version, length of the JSON metadata that follows
+PREAMBLE = struct.Struct("<4sII")
+
+
+def snapshot_path(path: str) -> str:
+    """
+    Return the snapshot file path for a CSV file.
+
+    Args:
+        path (str): The CSV file path.
+
+    Returns:
+        str: The snapshot file path.
+    """
+    return path + SUFFIX
+
+
+def file_digest(path: str) -> str:
+    """
+    Compute the SHA-256 digest of a file.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(
+        path: str, digest: Optional[str] = None) -> Dict[str, Union[int, str]]:
+    """
+    Describe the version of a CSV file a snapshot is built from.
+
+    Args:
+        path (str): The CSV file path.
+        digest (str): A precomputed SHA-256 digest of the file.
+
+    Returns:
+        Dict: The file's size, mtime in nanoseconds and digest.
+    """
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest or file_digest(path),
+    }
+
+
+def _padding(offset: int) -> bytes:
+    """
+    Return the zero bytes needed to align ``offset`` to ``ALIGN``.
+    """
+    return b"\0" * (-offset % ALIGN)
+
+
+def save(dataset: ColumnarDataset, path: str, source: Dict) -> None:
+    """
+    Write a snapshot of a dataset.
+
+    The snapshot is written under a temporary name and renamed into place,
+    so concurrent readers only ever see complete files.
+
+    Args:
+        dataset (ColumnarDataset): The dataset to persist.
+        path (str): The snapshot file path.
+        source (Dict): The ``source_key`` of the CSV file.
+    """
+    buffers: List[bytes] = []
+
+    def add(data, entry: Dict) -> Dict:
+        """
+        Queue a typed buffer for writing and describe it in ``entry``.
+        """
+        offset = sum(len(raw) for raw in buffers)
+        raw = bytes(data)
+        typecode = getattr(data, "typecode", None) or data.format
+        entry.update(typecode=typecode, offset=offset, length=len(data))
+        buffers.append(raw + _padding(len(raw)))
+        return entry
+
+    columns = []
+    for column in dataset.columns:
+        if isinstance(column, IntColumn):
+            columns.append(add(column.values, {"kind": "int"}))
+        else:
+            columns.append(add(column.codes, {
+                "kind": "dict", "values": list(column.values),
+            }))
+    extras = {name: add(data, {}) for name, data in dataset.extras.items()}
+
+    meta = json.dumps({
+        "source": source,
+        "header": list(dataset.header),
+        "rows": len(dataset),
+        "columns": columns,
+        "extras": extras,
+    }).encode("utf-8")
+    head = PREAMBLE.pack(MAGIC, VERSION, len(meta)) + meta
+    head += _padding(len(head))
+
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(head)
+        for raw in buffers:
+            f.write(raw)
+    os.replace(tmp, path)
+
+
+def load(path: str) -> Union[ColumnarDataset, None]:
+    """
+    Memory-map a snapshot and return the dataset it holds.
+
+    Column buffers are exposed as typed memoryviews over the mapping, so
+    the pages are shared with every other process mapping the same file.
+
+    Args:
+        path (str): The snapshot file path.
+
+    Returns:
+        ColumnarDataset: The dataset, with its source key stored in the
+        ``source`` attribute, or None when the file is not a readable
+        snapshot of the current format version.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            return None
+        magic, version, meta_size = PREAMBLE.unpack(preamble)
+        if magic != MAGIC or version != VERSION:
+            return None
+        try:
+            meta = json.loads(f.read(meta_size).decode("utf-8"))
+        except ValueError:
+            return None
+        base = PREAMBLE.size + meta_size
+        base += -base % ALIGN
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mm)
+    buffers: List[memoryview] = []
+    for entry in meta["columns"] + list(meta["extras"].values()):
+        start = base + entry["offset"]
+        size = entry["length"] * struct.calcsize(entry["typecode"])
+        if start + size > len(view):
+            return None
+        buffers.append(view[start:start + size].cast(entry["typecode"]))
+
+    columns: List[Column] = []
+    for entry, data in zip(meta["columns"], buffers):
+        if entry["kind"] == "int":
+            columns.append(IntColumn(data))
+        else:
+            columns.append(DictColumn(entry["values"], data))
+    dataset = ColumnarDataset(meta["header"], columns)
+    dataset.extras = dict(zip(meta["extras"], buffers[len(columns):]))
+    dataset.source = meta["source"]
+    return dataset
+
+
+def is_current(dataset: ColumnarDataset, path: str,
+               target: Optional[str] = None) -> bool:
+    """
+    Tell whether a loaded snapshot still matches its CSV file.
+
+    Size and mtime are compared first; the content digest is only computed
+    when they differ, so an untouched file is validated with a single stat.
+    When the digest still matches, the file was only touched: the snapshot
+    at ``target``, if given, is rewritten with the new size and mtime, so
+    the next process validates it with a single stat again.
+
+    Args:
+        dataset (ColumnarDataset): A dataset returned by ``load``.
+        path (str): The CSV file path.
+        target (str): The snapshot file path, whose lock the caller must
+        not hold.
+
+    Returns:
+        bool: True when the snapshot reflects the current file contents.
+    """
+    source = dataset.source
+    if source is None:
+        return False
+    stat = os.stat(path)
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    if file_digest(path) != source["sha256"]:
+        return False
+    if target is not None:
+        _touch(dataset, target, dict(source, mtime_ns=stat.st_mtime_ns))
+    return True
+
+
+def _touch(dataset: ColumnarDataset, target: str, source: Dict) -> None:
+    """
+    Rewrite a snapshot with a new source key of the same contents, under
+    the lock ``_build`` takes.
+
+    The mtime recorded is the one stat'ed before the digest was computed,
+    so a file changed meanwhile still fails the next check. Nothing is
+    written when the snapshot was rebuilt from other contents meanwhile,
+    or cannot be written.
+    """
+    try:
+        with open(target + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stored = load(target)
+            if stored is None or stored.source is None or \
+                    stored.source["sha256"] != source["sha256"]:
+                return
+            save(stored, target, source)
+            dataset.source = source
+    except OSError:
+        pass
+
+
+def save_extras(dataset: ColumnarDataset, target: str) -> None:
+    """
+    Add the extras of a dataset to its snapshot.
+
+    The snapshot is rewritten with the extras it already holds, which
+    other processes may have added, plus the dataset's. Nothing is written
+    when the snapshot was rebuilt from another version of the CSV file
+    meanwhile, or cannot be written.
+
+    Args:
+        dataset (ColumnarDataset): A dataset from ``load_or_build``.
+        target (str): Its snapshot file path.
+    """
+    try:
+        with open(target + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stored = load(target)
+            source = dataset.source
+            if stored is None or source is None or stored.source != source \
+                    or stored.extras.keys() >= dataset.extras.keys():
+                return
+            dataset.extras = dict(stored.extras, **dataset.extras)
+            save(dataset, target, source)
+    except OSError:
+        pass
+
+
+def load_or_build(path: str, target: Optional[str] = None) -> ColumnarDataset:
+    """
+    Return the dataset of a CSV file, going through its snapshot.
+
+    A valid snapshot is memory-mapped; otherwise the CSV file is parsed
+    and a fresh snapshot is written for the next process. Rebuilds are
+    serialized across processes with a lock file, so a fleet of workers
+    starting together parses the CSV once and the others map the result.
+    Failing to write the snapshot (e.g. on a read-only directory) is not
+    an error. Extras added to the dataset later, such as sort
+    permutations, are written to the snapshot by its ``persist_extras``.
+
+    Args:
+        path (str): The CSV file path.
+        target (str): Where the snapshot lives, ``snapshot_path(path)`` by
+        default.
+
+    Returns:
+        ColumnarDataset: The dataset of the current file contents.
+    """
+    if target is None:
+        target = snapshot_path(path)
+    dataset = load(target)
+    if dataset is None or not is_current(dataset, path, target):
+        dataset = _build(path, target)
+    dataset.persist_extras = functools.partial(save_extras, dataset, target)
+    return dataset
+
+
+def _build(path: str, target: str) -> ColumnarDataset:
+    """
+    Parse a CSV file and write its snapshot, one process at a time.
+    """
+    try:
+        lock = open(target + ".lock", "a")
+    except OSError:
+        lock = None
+    try:
+        if lock is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have rebuilt it while we were waiting.
+            dataset = load(target)
+            if dataset is not None and is_current(dataset, path):
+                return dataset
+
+        source = source_key(path)
+        dataset = parallel_loader.load_csv(path)
+        dataset.source = source
+        if lock is not None:
+            try:
+                save(dataset, target, source)
+            except OSError:
+                pass
+        return dataset
+    finally:
+        if lock is not None:
+            lock.close()
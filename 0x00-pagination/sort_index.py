@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Sort permutations for ordered pagination
+
+This module precomputes, for each sortable column, the permutation of row
+positions that lists the dataset in ascending order of that column. Once a
+permutation exists, any page of the sorted view is a slice of it, so
+ordered pages cost O(page_size) instead of a sort per request.
+
+Permutations are built the first time a column is ordered by. Those of a
+ColumnarDataset are then stored in its ``extras`` and, when it came from a
+snapshot, persisted in it, so later processes memory-map them instead.
+
+Filtered views walk the permutation and keep the rows of the filter, and
+only as far as the page asked for, so they cost no sort per request.
+
+When rows are appended to a dataset, the permutations of the rows already
+indexed are extended by inserting just the new rows into them.
+"""
+import copy
+import threading
+from array import array
+from itertools import compress, islice
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple,
+)
+
+from bitmap_index import Bitmap
+from columnar_dataset import (
+    HEADER, ColumnarDataset, DictColumn, IntBuffer, resolve_field,
+    scan_column,
+)
+
+
+SORTABLE = ("Count", "Rank", "Child's First Name")
+EXTRA_PREFIX = "sort:"
+# Filters matching fewer than one row in SPARSE are sorted instead, which
+# beats walking a permutation that holds so few of their rows.
+SPARSE = 64
+
+
+def parse_order(order_by: str,
+                header: Sequence[str] = HEADER) -> Tuple[int, bool]:
+    """
+    Parse an ``order_by`` expression.
+
+    Args:
+        order_by (str): A sortable column name or alias, prefixed with "-"
+        for descending order, e.g. "-count" or "name".
+        header (Sequence[str]): The CSV column names.
+
+    Returns:
+        Tuple[int, bool]: The column position and whether the order is
+        descending.
+
+    Raises:
+        ValueError: If the column does not exist or is not sortable.
+    """
+    descending = order_by.startswith("-")
+    column = resolve_field(order_by.lstrip("-"), header)
+    if header[column] not in SORTABLE:
+        raise ValueError("Cannot order by {!r}.".format(order_by))
+    return column, descending
+
+
+def sort_key(dataset, column: int) -> Callable[[int], Any]:
+    """
+    Return a function mapping a row position to its sort key.
+
+    Counts and ranks sort numerically; names sort case-insensitively, with
+    the exact spelling as a tie-breaker.
+
+    Args:
+        dataset: A ColumnarDataset, or any dataset supporting slicing.
+        column (int): The position of the column to sort by.
+
+    Returns:
+        Callable[[int], Any]: The key function.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        source = dataset.columns[column]
+        if isinstance(source, DictColumn):
+            ordered = sorted(range(len(source.values)),
+                             key=lambda code: _text_key(source.values[code]))
+            code_rank = array('I', bytes(4 * len(ordered)))
+            for position, code in enumerate(ordered):
+                code_rank[code] = position
+            codes = source.codes
+            return lambda i: code_rank[codes[i]]
+        return source.values.__getitem__
+
+    key = value_key(getattr(dataset, "header", HEADER), column)
+    keys = [key(value) for value in scan_column(dataset, column)]
+    return keys.__getitem__
+
+
+def value_key(header: Sequence[str],
+              column: int) -> Callable[[str], object]:
+    """
+    Return a function mapping a CSV value of a column to its sort key.
+
+    Args:
+        header (Sequence[str]): The CSV column names.
+        column (int): The position of the column to sort by.
+
+    Returns:
+        Callable[[str], object]: The key function.
+    """
+    if header[column] == "Child's First Name":
+        return _text_key
+    return int
+
+
+def _text_key(value: str) -> Tuple[str, str]:
+    """
+    Return the case-insensitive sort key of a text value.
+    """
+    return value.casefold(), value
+
+
+def column_value(dataset, column: int) -> Callable[[int], str]:
+    """
+    Return a function mapping a row position to its CSV value in a column.
+
+    Args:
+        dataset: A ColumnarDataset, or any dataset supporting indexing.
+        column (int): The position of the column.
+
+    Returns:
+        Callable[[int], str]: The value function.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        return dataset.columns[column].get
+    return lambda i: dataset[i][column]
+
+
+def build_permutation(dataset, column: int) -> array:
+    """
+    Compute the ascending, stable sort permutation of a column.
+
+    Args:
+        dataset: A ColumnarDataset, or any dataset supporting slicing.
+        column (int): The position of the column to sort by.
+
+    Returns:
+        array: Row positions in ascending order of the column, ties kept
+        in file order.
+    """
+    order = sorted(range(len(dataset)), key=sort_key(dataset, column))
+    return array('I', order)
+
+
+def extend_permutation(permutation: IntBuffer,
+                       key: Callable[[int], Any],
+                       tail_keys: Sequence[Any]) -> array:
+    """
+    Extend a sort permutation with rows appended after the rows it sorts.
+
+    The appended rows are sorted on their own, then each is inserted after
+    the rows sorting equal to it, found by a binary search of the
+    permutation; the result is the permutation ``build_permutation``
+    computes over all the rows.
+
+    Args:
+        permutation (IntBuffer): The ascending, stable permutation of
+        the first ``len(permutation)`` rows, as an array or memoryview.
+        key (Callable[[int], Any]): Maps a position of those rows to its
+        sort key.
+        tail_keys (Sequence[Any]): The sort keys of the appended rows.
+
+    Returns:
+        array: The permutation of all the rows.
+    """
+    offset = len(permutation)
+    merged = array('I')
+    width = merged.itemsize
+    view = memoryview(permutation).cast('B')
+    low = start = 0
+    for t in sorted(range(len(tail_keys)), key=tail_keys.__getitem__):
+        wanted, high = tail_keys[t], offset
+        while low < high:
+            middle = (low + high) // 2
+            if wanted < key(permutation[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        merged.frombytes(view[start * width:low * width])
+        merged.append(offset + t)
+        start = low
+    merged.frombytes(view[start * width:])
+    return merged
+
+
+def walk(permutation: Sequence[int], matches: Bitmap,
+         descending: bool = False) -> Callable[[int, int], List[int]]:
+    """
+    Return a view of the rows of a bitmap, in the order of a permutation.
+
+    The permutation is walked lazily, in the view's direction, keeping the
+    positions of the bitmap: a page ranked ``start`` to ``end - 1`` only
+    walks until ``end`` rows of the bitmap are found, and later pages of
+    the same view resume where the walk stopped.
+
+    Args:
+        permutation (Sequence[int]): Row positions in ascending order of
+        the column, e.g. from ``build_permutation``.
+        matches (Bitmap): The rows to keep.
+        descending (bool): Whether to walk the permutation backwards.
+
+    Returns:
+        Callable[[int, int], List[int]]: A function returning the positions
+        of the rows ranked ``start`` to ``end - 1`` in the view.
+    """
+    if descending:
+        permutation = permutation[::-1]
+    mask = matches.mask(len(permutation))
+    found = compress(permutation, map(mask.__getitem__, permutation))
+    positions: List[int] = []
+
+    def select(start: int, end: int) -> List[int]:
+        """
+        Return the positions ranked ``start`` to ``end - 1``.
+        """
+        if end > len(positions):
+            positions.extend(islice(found, end - len(positions)))
+        return positions[start:end]
+
+    return select
+
+
+def build_permutations(dataset: ColumnarDataset) -> Dict[str, array]:
+    """
+    Compute the permutations of every sortable column of a dataset.
+
+    Args:
+        dataset (ColumnarDataset): The dataset to sort.
+
+    Returns:
+        Dict[str, array]: The permutations, keyed as dataset extras.
+    """
+    return {
+        EXTRA_PREFIX + name: build_permutation(dataset, column)
+        for column, name in enumerate(dataset.header) if name in SORTABLE
+    }
+
+
+class SortIndex:
+    """
+    Sorted views of a dataset.
+
+    Permutations are taken from the dataset's extras when they were loaded
+    from a snapshot, and computed on first use otherwise, then added to the
+    extras and persisted, once each, even under concurrent requests.
+    Descending views walk the ascending permutation backwards.
+
+    The index of a dataset with appended rows (see ``appended``) builds its
+    permutations from those of the index it extends instead.
+    """
+
+    def __init__(self, dataset):
+        """
+        Initializes the index over a dataset.
+
+        Args:
+            dataset: A ColumnarDataset, or any dataset supporting slicing.
+        """
+        self.dataset = dataset
+        self.header = tuple(getattr(dataset, "header", HEADER))
+        self.permutations = {}
+        self.keys = {}
+        for name, data in getattr(dataset, "extras", {}).items():
+            if name.startswith(EXTRA_PREFIX) and len(data) == len(dataset):
+                column = self.header.index(name[len(EXTRA_PREFIX):])
+                self.permutations[column] = data
+        self.__prior: Optional['SortIndex'] = None
+        self.__tail: Optional[ColumnarDataset] = None
+        self.__lock = threading.Lock()
+
+    def appended(self, dataset, tail: ColumnarDataset) -> 'SortIndex':
+        """
+        Return the index of ``dataset``: the rows of this index followed by
+        the rows of ``tail``.
+
+        Its permutations are those of this index with the rows of ``tail``
+        inserted, and are kept in memory only.
+
+        Args:
+            dataset: The rows of this index followed by those of ``tail``.
+            tail (ColumnarDataset): The appended rows.
+
+        Returns:
+            SortIndex: The index of ``dataset``.
+        """
+        index = copy.copy(self)
+        index.dataset = dataset
+        index.permutations = {}
+        index.keys = {}
+        index.__prior = self
+        index.__tail = tail
+        index.__lock = threading.Lock()
+        return index
+
+    def permutation(self, column: int) -> Sequence[int]:
+        """
+        Return the ascending permutation of a column, building it if needed.
+
+        Args:
+            column (int): The position of the column.
+
+        Returns:
+            Sequence[int]: Row positions in ascending column order.
+        """
+        if column not in self.permutations:
+            with self.__lock:
+                if column not in self.permutations:
+                    self.__build(column)
+        return self.permutations[column]
+
+    def __build(self, column: int) -> None:
+        """
+        Build the permutation of a column, add it to the dataset's extras
+        and persist them.
+        """
+        if self.__prior is not None and self.__tail is not None:
+            key = value_key(self.header, column)
+            value = column_value(self.__prior.dataset, column)
+            tail = column_value(self.__tail, column)
+            self.permutations[column] = extend_permutation(
+                self.__prior.permutation(column), lambda i: key(value(i)),
+                [key(tail(t)) for t in range(len(self.__tail))])
+            return
+        permutation = build_permutation(self.dataset, column)
+        extras = getattr(self.dataset, "extras", None)
+        if extras is not None:
+            extras[EXTRA_PREFIX + self.header[column]] = permutation
+            persist = getattr(self.dataset, "persist_extras", None)
+            if persist is not None:
+                persist()
+        self.permutations[column] = permutation
+
+    def select_range(self, order_by: str, start: int,
+                     end: int) -> List[int]:
+        """
+        Return the positions of the rows ranked ``start`` to ``end - 1`` in
+        the sorted view.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            start (int): The first rank wanted.
+            end (int): The rank after the last one wanted.
+
+        Returns:
+            List[int]: Row positions, in view order.
+        """
+        column, descending = parse_order(order_by, self.header)
+        permutation = self.permutation(column)
+        size = len(permutation)
+        start, end = min(start, size), min(end, size)
+        if not descending:
+            return list(permutation[start:end])
+        return [permutation[size - 1 - rank] for rank in range(start, end)]
+
+    def sort(self, order_by: str, positions: Iterable[int]) -> List[int]:
+        """
+        Sort a subset of row positions, e.g. the rows matching a filter.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            positions (Iterable[int]): Row positions in ascending order.
+
+        Returns:
+            List[int]: The positions in view order, ties in the same order
+            as in the full sorted view.
+        """
+        column, descending = parse_order(order_by, self.header)
+        if column not in self.keys:
+            self.keys[column] = self.__sort_key(column)
+        positions = list(positions)
+        if descending:
+            positions.reverse()
+        return sorted(positions, key=self.keys[column], reverse=descending)
+
+    def __sort_key(self, column: int) -> Callable[[int], Any]:
+        """
+        Return a function mapping a row position to its sort key.
+        """
+        if self.__prior is None or self.__tail is None:
+            return sort_key(self.dataset, column)
+        key = value_key(self.header, column)
+        offset = len(self.__prior.dataset)
+        value = column_value(self.__prior.dataset, column)
+        tail = column_value(self.__tail, column)
+        return lambda i: key(value(i) if i < offset else tail(i - offset))
+
+    def filtered(self, order_by: str,
+                 matches: Bitmap) -> Callable[[int, int], List[int]]:
+        """
+        Return the sorted view of the rows of a filter.
+
+        The column's permutation is walked against the bitmap (see
+        ``walk``), unless the filter keeps fewer than one row in
+        ``SPARSE``, whose rows are then sorted.
+
+        Args:
+            order_by (str): The ordering, as accepted by ``parse_order``.
+            matches (Bitmap): The rows of the filter.
+
+        Returns:
+            Callable[[int, int], List[int]]: A function returning the
+            positions of the rows ranked ``start`` to ``end - 1``.
+        """
+        column, descending = parse_order(order_by, self.header)
+        if len(matches) * SPARSE < len(self.dataset):
+            positions = self.sort(order_by, matches)
+            return lambda start, end: positions[start:end]
+        return walk(self.permutation(column), matches, descending)
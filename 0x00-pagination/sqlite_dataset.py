@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed dataset
+
+This module imports the baby names CSV once into a SQLite database next to
+it and reads pages back with range queries on the table's primary key, the
+row position. Pages come from disk through SQLite's page cache, so memory
+use stays flat however large the dataset grows.
+
+The database is a sidecar like the row offset index: it records the size
+and mtime of the CSV file it was imported from, together with the row
+count, and is imported again when the CSV file changes.
+"""
+import csv
+import fcntl
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Iterator, List, Union
+
+from columnar_dataset import HEADER
+
+
+class SqliteDataset:
+    """
+    A read-only dataset stored in a SQLite table.
+
+    Row ``i`` of the CSV file is the table row whose ``pos`` is ``i``, so
+    a page is the keyset query ``pos >= start AND pos < end``.
+    """
+
+    SUFFIX = ".sqlite"
+    VERSION = 1
+    # Rows fetched per query while iterating.
+    BATCH = 4096
+    # SQLite page cache per connection, in KiB.
+    CACHE_KIB = 2048
+
+    def __init__(self, path: str):
+        """
+        Open the database of a CSV file, importing the file if needed.
+
+        Args:
+            path (str): The CSV file path.
+        """
+        self.path = path
+        self.database = self.sidecar_path(path)
+        if not self.is_current(path):
+            self.build(path)
+        self.__local = threading.local()
+        self.__connections: List[sqlite3.Connection] = []
+        self.__lock = threading.Lock()
+        meta = dict(self.connection().execute("SELECT key, value FROM meta"))
+        self.__rows = int(meta["rows"])
+        self.__select = "SELECT {} FROM rows WHERE pos >= ? AND pos < ? " \
+            "ORDER BY pos".format(", ".join(
+                "c{}".format(i) for i in range(int(meta["columns"]))))
+
+    @classmethod
+    def sidecar_path(cls, path: str) -> str:
+        """
+        Return the path of the database of a CSV file.
+
+        Args:
+            path (str): The CSV file path.
+
+        Returns:
+            str: The sidecar database path.
+        """
+        return path + cls.SUFFIX
+
+    @classmethod
+    def is_current(cls, path: str) -> bool:
+        """
+        Tell whether the database of a CSV file matches the file.
+
+        Args:
+            path (str): The CSV file path.
+
+        Returns:
+            bool: False when the database is missing, was imported from a
+            different version of the file, or by another format version.
+        """
+        stat = os.stat(path)
+        try:
+            connection = sqlite3.connect(
+                "file:{}?mode=ro".format(cls.sidecar_path(path)), uri=True)
+        except sqlite3.Error:
+            return False
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            return False
+        finally:
+            connection.close()
+        return meta.get("version") == str(cls.VERSION) and \
+            meta.get("size") == str(stat.st_size) and \
+            meta.get("mtime_ns") == str(stat.st_mtime_ns)
+
+    @classmethod
+    def build(cls, path: str) -> None:
+        """
+        Import a CSV file into its sidecar database, one builder at a time.
+
+        Builders, threads and processes alike, take turns on a lock file
+        next to the database; one that waited reuses the database the
+        previous one imported if it matches the file.
+
+        Args:
+            path (str): The CSV file path, header line included.
+        """
+        target = cls.sidecar_path(path)
+        try:
+            lock = open(target + ".lock", "a")
+        except OSError:
+            lock = None
+        try:
+            if lock is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another builder may have imported it while we were waiting.
+                if cls.is_current(path):
+                    return
+            cls._import(path, target)
+        finally:
+            if lock is not None:
+                lock.close()
+
+    @classmethod
+    def _import(cls, path: str, target: str) -> None:
+        """
+        Write the database of a CSV file to ``target``.
+
+        The database is written to a temporary file of its own and renamed
+        into place, so readers never see a partial import.
+        """
+        stat = os.stat(path)
+        fd, tmp = tempfile.mkstemp(
+            dir=os.path.dirname(target) or ".",
+            prefix=os.path.basename(target) + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            cls._write(path, stat, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def _write(cls, path: str, stat: os.stat_result, tmp: str) -> None:
+        """
+        Import a CSV file into an empty database file.
+        """
+        connection = sqlite3.connect(tmp)
+        try:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            with open(path, newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None) or list(HEADER)
+                columns = ["c{}".format(i) for i in range(len(header))]
+                connection.execute("CREATE TABLE meta "
+                                   "(key TEXT PRIMARY KEY, value TEXT)")
+                connection.execute(
+                    "CREATE TABLE rows (pos INTEGER PRIMARY KEY, {})".format(
+                        ", ".join(c + " TEXT" for c in columns)))
+                connection.executemany(
+                    "INSERT INTO rows VALUES (?, {})".format(
+                        ", ".join("?" * len(columns))),
+                    ((pos, *row) for pos, row in enumerate(reader)))
+            rows = connection.execute(
+                "SELECT COUNT(*) FROM rows").fetchone()[0]
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(cls.VERSION)),
+                ("size", str(stat.st_size)),
+                ("mtime_ns", str(stat.st_mtime_ns)),
+                ("rows", str(rows)),
+                ("columns", str(len(columns))),
+            ])
+            connection.commit()
+        finally:
+            connection.close()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return this thread's read-only connection to the database.
+        """
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                "file:{}?mode=ro".format(self.database), uri=True,
+                check_same_thread=False)
+            connection.execute(
+                "PRAGMA cache_size = -{}".format(self.CACHE_KIB))
+            self.__local.connection = connection
+            with self.__lock:
+                self.__connections.append(connection)
+        return connection
+
+    def rows(self, start: int, end: int) -> List[List[str]]:
+        """
+        Read the rows in ``[start, end)``.
+
+        Args:
+            start (int): The first row position.
+            end (int): The position after the last row.
+
+        Returns:
+            List[List[str]]: The requested rows.
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return []
+        return [list(row) for row in
+                self.connection().execute(self.__select, (start, end))]
+
+    def __len__(self) -> int:
+        """
+        Return the number of rows, as recorded at import time.
+        """
+        return self.__rows
+
+    def __getitem__(self, key: Union[int, slice]):
+        """
+        Return a row, or a list of rows for a slice.
+
+        Args:
+            key (Union[int, slice]): A row position or a slice of positions.
+
+        Returns:
+            The row or rows.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.rows(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("dataset index out of range")
+        return self.rows(key, key + 1)[0]
+
+    def __iter__(self) -> Iterator[List[str]]:
+        """
+        Iterate over the rows, a batch of ``BATCH`` rows at a time.
+        """
+        for start in range(0, len(self), self.BATCH):
+            yield from self.rows(start, start + self.BATCH)
+
+    def close(self) -> None:
+        """
+        Close every connection opened by the dataset.
+        """
+        with self.__lock:
+            connections, self.__connections = self.__connections, []
+        for connection in connections:
+            connection.close()
+        self.__local = threading.local()
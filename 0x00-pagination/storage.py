@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Dataset storage backends
+
+This module maps backend names to the loaders that turn the baby names CSV
+file into a dataset object. Every dataset supports ``len()`` and slicing,
+which is all the pagination servers rely on.
+"""
+from typing import Callable, Dict
+
+import parallel_loader
+import shared_dataset
+import snapshot
+from columnar_dataset import ColumnarDataset, Dataset
+from compressed_dataset import CompressedDataset
+from lazy_dataset import MmapDataset
+from sqlite_dataset import SqliteDataset
+from sharded_dataset import (  # noqa: F401
+    ShardedDataset, Source, fingerprint, is_sharded, shard_paths,
+)
+
+
+BACKENDS: Dict[str, Callable] = {
+    "memory": snapshot.load_or_build,
+    "csv": ColumnarDataset.from_csv,
+    "parallel": parallel_loader.load,
+    "mmap": MmapDataset,
+    "shared": shared_dataset.attach,
+    "compressed": CompressedDataset,
+    "sqlite": SqliteDataset,
+}
+# Backends that keep rows on disk; servers read their rows page by page
+# instead of copying or pre-encoding the whole dataset.
+DISK_BACKENDS = frozenset(("sqlite",))
+# Backends that decode rows on demand rather than holding them in memory;
+# servers don't pre-encode their whole dataset either, and sort it on disk.
+LAZY_BACKENDS = DISK_BACKENDS | frozenset(("mmap", "compressed"))
+
+
+def open_dataset(path: Source, backend: str = "memory") -> Dataset:
+    """
+    Open the dataset stored at ``path`` with the given backend.
+
+    A list of paths or a glob pattern opens a ShardedDataset, whose shards
+    are each opened with ``backend`` when first touched.
+
+    Args:
+        path (Source): The CSV file path, or for the "compressed" backend a
+        block-compressed ``.gz``, ``.bz2`` or ``.xz`` copy of it; or a list
+        or glob pattern of such shard files.
+        backend (str): One of ``BACKENDS``: "memory" loads a
+        ColumnarDataset through its binary snapshot, "csv" always parses
+        the file, "parallel" parses it with one process per CPU, "mmap"
+        indexes row offsets and decodes pages lazily, "shared" maps a
+        snapshot kept in shared memory by all workers, "compressed"
+        decompresses only the blocks covering a page, "sqlite" imports the
+        file once into a database and queries pages by row position.
+
+    Returns:
+        Dataset: A dataset supporting ``len()`` and slicing.
+    """
+    try:
+        loader = BACKENDS[backend]
+    except KeyError:
+        raise ValueError("Unknown dataset backend: {!r}".format(backend))
+    if is_sharded(path):
+        return ShardedDataset(shard_paths(path), loader)
+    return loader(path)
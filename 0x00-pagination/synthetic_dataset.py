@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Synthetic baby names datasets
+
+This module writes CSV files shaped like Popular_Baby_Names.csv at any
+size, for benchmarking the servers well beyond the 19k rows of the real
+file. A Profile is learned from a source file:
+
+- the (year, gender, ethnicity) groups and their share of the rows,
+  dirty ethnicity spellings included;
+- the names of each gender, weighted by how often they occur;
+- the distribution of the Count column.
+
+Every group of the output gets rows in proportion to its share. Its
+counts are drawn from the Count distribution and ranked densely in
+descending order, as in the source. Its names are distinct, drawn by
+weight from the gender's name pool, and the most popular ones get the
+highest counts. For groups larger than the real name pool, the pool is
+extended with blends of two real names, so the number of distinct names
+grows with the file.
+
+Generation is seeded and streamed group by group, so the output is
+reproducible and memory stays bounded by the largest group.
+
+Usage, to write a 1M row file:
+    python3 synthetic_dataset.py synthetic.csv --rows 1000000
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import random
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from columnar_dataset import HEADER
+
+# (year, gender, ethnicity)
+Group = Tuple[str, str, str]
+
+
+class Profile:
+    """
+    The statistics a synthetic dataset reproduces.
+    """
+
+    def __init__(self, groups: Sequence[Group], sizes: Sequence[int],
+                 names: Dict[str, Counter], counts: Sequence[int],
+                 header: Sequence[str] = HEADER):
+        """
+        Initializes a profile.
+
+        Args:
+            groups (Sequence[Group]): The row groups, in output order.
+            sizes (Sequence[int]): The number of rows of each group.
+            names (Dict[str, Counter]): The name frequencies per gender.
+            counts (Sequence[int]): Observed values of the Count column.
+            header (Sequence[str]): The CSV column names.
+        """
+        self.groups = list(groups)
+        self.sizes = list(sizes)
+        self.names = names
+        self.counts = list(counts)
+        self.header = list(header)
+        self.__pools: Dict[Tuple[str, int], Tuple[List, List]] = {}
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Profile":
+        """
+        Learn a profile from a baby names CSV file.
+
+        Args:
+            path (str): The CSV file, header line included.
+
+        Returns:
+            Profile: The statistics of the file.
+        """
+        sizes: Counter = Counter()
+        names: Dict[str, Counter] = {}
+        counts = []
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or HEADER
+            for year, gender, ethnicity, name, count, _ in reader:
+                sizes[(year, gender, ethnicity)] += 1
+                names.setdefault(gender, Counter())[name.capitalize()] += 1
+                counts.append(int(count))
+        groups = sorted(sizes, key=lambda group: (-int(group[0]),) + group[1:])
+        return cls(groups, [sizes[group] for group in groups], names, counts,
+                   header)
+
+    def name_pool(self, gender: str, size: int) -> Tuple[List, List]:
+        """
+        Return at least ``size`` names of a gender, with their weights.
+
+        Real names come first, most frequent first; blends of two real
+        names follow, each as rare as the rarest real name. The pool stops
+        short of ``size`` once every blend has been used.
+
+        Args:
+            gender (str): A gender of the source file.
+            size (int): The number of names wanted.
+
+        Returns:
+            Tuple[List, List]: The names and their weights.
+        """
+        frequencies = self.names[gender]
+        real = [name for name, _ in frequencies.most_common()]
+        size = max(size, len(real))
+        key = (gender, size)
+        if key not in self.__pools:
+            pool = list(real)
+            weights = [frequencies[name] for name in real]
+            seen = set(pool)
+            rarest = weights[-1]
+            for first, second in itertools.product(real, repeat=2):
+                if len(pool) >= size:
+                    break
+                blend = first[:(len(first) + 1) // 2] + \
+                    second[len(second) // 2:].lower()
+                if blend not in seen:
+                    seen.add(blend)
+                    pool.append(blend)
+                    weights.append(rarest)
+            self.__pools[key] = (pool, weights)
+        return self.__pools[key]
+
+
+def allocate(sizes: Sequence[int], rows: int) -> List[int]:
+    """
+    Split ``rows`` between groups in proportion to their sizes.
+
+    Args:
+        sizes (Sequence[int]): The group sizes of the source.
+        rows (int): The number of rows to split.
+
+    Returns:
+        List[int]: The rows of each group, adding up to ``rows``.
+    """
+    total = sum(sizes)
+    bounds = [rows * end // total for end in itertools.accumulate(sizes)]
+    return [end - start for start, end in zip([0] + bounds, bounds)]
+
+
+def sample(rng: random.Random, weights: Sequence[int],
+           size: int) -> List[int]:
+    """
+    Draw ``size`` distinct positions, weighted, without replacement.
+
+    Positions are drawn again, with replacement, only once all of them
+    have been used.
+
+    Args:
+        rng (random.Random): The random source.
+        weights (Sequence[int]): The weight of every position.
+        size (int): The number of positions wanted.
+
+    Returns:
+        List[int]: The positions, in ascending order.
+    """
+    if size >= len(weights):
+        positions = range(len(weights))
+        extra = rng.choices(positions, weights, k=size - len(weights))
+        return sorted(itertools.chain(positions, extra))
+    # Efraimidis-Spirakis: the largest keys u ** (1 / w) form the sample.
+    random_ = rng.random
+    keys = ((random_() ** (1.0 / weight), i)
+            for i, weight in enumerate(weights))
+    return sorted(i for _, i in heapq.nlargest(size, keys))
+
+
+def generate(profile: Profile, rows: int, seed: int = 0,
+             years: Optional[Sequence[int]] = None) -> Iterator[List]:
+    """
+    Yield the rows of a synthetic dataset.
+
+    Args:
+        profile (Profile): The statistics to reproduce.
+        rows (int): The number of rows.
+        seed (int): The random seed; equal seeds give equal datasets.
+        years (Sequence[int]): The years to spread the rows over, newest
+        first; each takes the groups of a source year in turn. Defaults
+        to the source years.
+
+    Yields:
+        List: The rows, grouped by year, gender and ethnicity like the
+        source.
+    """
+    rng = random.Random(seed)
+    source_years = sorted({group[0] for group in profile.groups},
+                          key=int, reverse=True)
+    if years is None:
+        years = [int(year) for year in source_years]
+    groups = []
+    sizes = []
+    for i, target_year in enumerate(years):
+        source_year = source_years[i % len(source_years)]
+        for group, size in zip(profile.groups, profile.sizes):
+            if group[0] == source_year:
+                groups.append((str(target_year),) + group[1:])
+                sizes.append(size)
+    counts = profile.counts
+    for (year, gender, ethnicity), size in zip(groups, allocate(sizes, rows)):
+        if not size:
+            continue
+        pool, weights = profile.name_pool(gender, size)
+        names = [pool[i] for i in sample(rng, weights, size)]
+        group_counts = sorted(rng.choices(counts, k=size), reverse=True)
+        rank = 0
+        previous = None
+        for name, count in zip(names, group_counts):
+            if count != previous:
+                rank += 1
+                previous = count
+            yield [year, gender, ethnicity, name, str(count), str(rank)]
+
+
+def write(path: str, rows: int, source: str = "Popular_Baby_Names.csv",
+          seed: int = 0, years: Optional[Sequence[int]] = None) -> int:
+    """
+    Write a synthetic dataset to a CSV file.
+
+    Args:
+        path (str): The output file, replaced if it exists.
+        rows (int): The number of data rows.
+        source (str): The CSV file the statistics are learned from.
+        seed (int): The random seed.
+        years (Sequence[int]): The years to spread the rows over.
+
+    Returns:
+        int: The size of the written file, in bytes.
+    """
+    profile = Profile.from_csv(source)
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(profile.header)
+        writer.writerows(generate(profile, rows, seed, years))
+    os.replace(temporary, path)
+    return os.path.getsize(path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Write a synthetic dataset.
+
+    Args:
+        argv (List[str]): Command line arguments, defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic baby names CSV file")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--source", default="Popular_Baby_Names.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--first-year", type=int,
+                        help="spread the rows over every year from this "
+                        "one to the newest source year")
+    args = parser.parse_args(argv)
+    years = None
+    if args.first_year is not None:
+        newest = max(int(group[0])
+                     for group in Profile.from_csv(args.source).groups)
+        if args.first_year > newest:
+            parser.error("--first-year is after {}".format(newest))
+        years = range(newest, args.first_year - 1, -1)
+    size = write(args.output, args.rows, args.source, args.seed, years)
+    print("{}: {} rows, {} bytes".format(args.output, args.rows, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Single-flight loading of the pagination servers
+
+Many threads hit a cold Server at the same moment; the dataset must be
+loaded exactly once and every thread must get the same page.
+
+Usage (from the 0x00-pagination directory):
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+from typing import Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dataset_version  # noqa: E402
+import storage  # noqa: E402
+
+DATA_FILE = os.path.join(ROOT, "Popular_Baby_Names.csv")
+MODULES = (
+    "1-simple_pagination",
+    "2-hypermedia_pagination",
+    "3-hypermedia_del_pagination",
+)
+THREADS = 32
+
+
+class SingleFlightTest(unittest.TestCase):
+    """
+    Concurrent first requests to a cold Server share one dataset load.
+    """
+
+    def setUp(self) -> None:
+        """
+        Count the calls to ``open_dataset`` made through every module that
+        imported it by name, the versioned datasets of Server 2 included.
+        """
+        self.loads: List[int] = []
+        open_dataset = storage.open_dataset
+
+        def counting_open(*args, **kwargs):
+            """
+            Record the load, then delegate to the real loader.
+            """
+            self.loads.append(threading.get_ident())
+            return open_dataset(*args, **kwargs)
+
+        for name in MODULES + ("dataset_version", "storage"):
+            module = sys.modules.get(name) or __import__(name)
+            if getattr(module, "open_dataset", None) is open_dataset:
+                setattr(module, "open_dataset", counting_open)
+                self.addCleanup(setattr, module, "open_dataset",
+                                open_dataset)
+
+    def hit(self, module_name: str, warm: bool) -> List[Any]:
+        """
+        Ask a cold server for the same page from ``THREADS`` threads at
+        once.
+
+        Args:
+            module_name (str): The task module whose Server is exercised.
+            warm (bool): Whether the server warms up in the background.
+
+        Returns:
+            List[Any]: The page each thread got.
+        """
+        # The module's Server, reading the bundled CSV file from any
+        # working directory.
+        server_class = type("Server", (__import__(module_name).Server,),
+                            {"DATA_FILE": DATA_FILE})
+        server = server_class("csv", warm=warm)
+        barrier = threading.Barrier(THREADS)
+        pages: List[Any] = []
+        errors: List[BaseException] = []
+
+        def request() -> None:
+            """
+            Wait for every thread, then ask for a page.
+            """
+            barrier.wait()
+            try:
+                if hasattr(server, "get_hyper_index"):
+                    pages.append(server.get_hyper_index(20, 10))
+                else:
+                    pages.append(server.get_page(3, 10))
+            except Exception as exc:
+                errors.append(exc)
+
+        workers = [threading.Thread(target=request) for _ in range(THREADS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return pages
+
+    def test_one_load(self) -> None:
+        """
+        Every server loads its dataset once and answers every thread alike.
+        """
+        for module_name in MODULES:
+            for warm in (False, True):
+                with self.subTest(module=module_name, warm=warm):
+                    del self.loads[:]
+                    pages = self.hit(module_name, warm)
+                    self.assertEqual(len(self.loads), 1)
+                    self.assertEqual(len(pages), THREADS)
+                    self.assertTrue(pages[0])
+                    for page in pages[1:]:
+                        self.assertEqual(page, pages[0])
+
+
+if __name__ == "__main__":
+    unittest.main()